@@ -1,3 +1,10 @@
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Sequence
+
+from sqlalchemy import any_, bindparam, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+
 from app_server.db import db
 from app_server.db.error import FMEntityNotFoundException
 from fmlib.db.base_model import BaseSoftDeleteModel, BaseTimestampModel, BaseUUIDPrimaryKeyModel
@@ -47,6 +54,89 @@ class BaseFMDataModel(BaseUUIDPrimaryKeyModel, BaseTimestampModel, BaseSoftDelet
         else:
             raise FMEntityNotFoundException(f"FM entity {cls.__name__} not found for id {fm_entity_id}")
 
+    @classmethod
+    def bulk_get(cls, fm_entity_ids: Iterable[str], include_soft_deleted: bool = False) -> List:
+        """
+        Retrieves the entities of many FM entity IDs, in a single query.
+
+        Args:
+            fm_entity_ids (Iterable[str]): The FM entity IDs.
+            include_soft_deleted (bool, optional): Whether to include soft deleted entities. Defaults to False.
+
+        Returns:
+            The entities found, in no particular order. IDs without an entity are skipped.
+        """
+        fm_entity_ids = list(fm_entity_ids)
+        if not fm_entity_ids:
+            return []
+        query = db.session.query(cls).filter(cls._id_in(fm_entity_ids))
+        if not include_soft_deleted:
+            query = query.filter(cls.deleted.is_(False))
+        return query.all()
+
+    @classmethod
+    def bulk_soft_delete(cls, fm_entity_ids: Iterable[str]) -> int:
+        """
+        Soft deletes the entities of many FM entity IDs, in a single UPDATE, without loading them.
+
+        Args:
+            fm_entity_ids (Iterable[str]): The FM entity IDs.
+
+        Returns:
+            int: The number of entities soft deleted. Entities not found or already soft deleted are not counted.
+        """
+        fm_entity_ids = list(fm_entity_ids)
+        if not fm_entity_ids:
+            return 0
+        statement = (
+            update(cls)
+            .where(cls._id_in(fm_entity_ids), cls.deleted.is_(False))
+            .values(deleted=True, deleted_at=datetime.utcnow())
+        )
+        return db.session.execute(statement).rowcount
+
+    @classmethod
+    def bulk_upsert(cls, rows: Sequence[Dict[str, Any]]) -> List:
+        """
+        Inserts or updates many entities, in a single INSERT ... ON CONFLICT (id) DO UPDATE.
+
+        Rows with an id of an existing entity update the columns given in the rows, along with updated_at. The other
+        rows are inserted, with the column defaults for the columns they do not give.
+
+        Args:
+            rows (Sequence[Dict[str, Any]]): The column values of every entity, all with the same columns.
+
+        Raises:
+            ValueError: If the rows do not all have the same columns, or if two rows have the same id.
+
+        Returns:
+            The IDs of the entities inserted or updated, in the order of the rows.
+        """
+        if not rows:
+            return []
+        columns = set(rows[0])
+        if any(set(row) != columns for row in rows):
+            raise ValueError(f"Rows to upsert into {cls.__name__} must all have the same columns")
+        if "id" in columns:
+            # PostgreSQL cannot update a row twice in one INSERT ... ON CONFLICT DO UPDATE
+            id_counts = Counter(str(row["id"]) for row in rows if row["id"] is not None)
+            duplicate_ids = sorted(fm_entity_id for fm_entity_id, count in id_counts.items() if count > 1)
+            if duplicate_ids:
+                raise ValueError(f"Rows to upsert into {cls.__name__} have duplicate ids: {duplicate_ids}")
+
+        statement = insert(cls)
+        updated_columns = {
+            column: statement.excluded[column] for column in columns if column not in ("id", "created_at")
+        }
+        updated_columns["updated_at"] = statement.excluded.updated_at
+        statement = statement.on_conflict_do_update(index_elements=[cls.id], set_=updated_columns)
+        return db.session.scalars(statement.returning(cls.id, sort_by_parameter_order=True), list(rows)).all()
+
+    @classmethod
+    def _id_in(cls, fm_entity_ids: List[str]):
+        # A single array parameter, id = ANY(:ids), rather than one parameter per ID as with IN
+        return cls.id == any_(bindparam("fm_entity_ids", fm_entity_ids, type_=ARRAY(cls.id.type)))
+
     def validate(self) -> None:
         """
         Validates the entity.
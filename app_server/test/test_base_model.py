@@ -0,0 +1,107 @@
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import Column, String
+
+from app_server.test import BaseTest
+
+
+@pytest.fixture(scope="module")
+def entity_model():
+    """
+    Creates the app, connected to the test database, and a table for a BaseFMDataModel, dropped once the tests are done.
+    """
+    BaseTest.get_app()
+
+    # base_model binds db on import, so it is imported once the app has initialised the DB
+    from app_server.db import db
+    from app_server.db.base_model import BaseFMDataModel
+
+    class BulkTestEntity(BaseFMDataModel):
+        __tablename__ = "bulk_test_entity"
+
+        name = Column(String, nullable=False)
+
+    BulkTestEntity.__table__.create(db.engine, checkfirst=True)
+    yield BulkTestEntity
+    db.session.remove()
+    BulkTestEntity.__table__.drop(db.engine, checkfirst=True)
+
+
+@pytest.fixture
+def session(entity_model):
+    """
+    The DB session, rolled back after every test.
+    """
+    from app_server.db import db
+
+    yield db.session
+    db.session.rollback()
+
+
+def add_entities(session, entity_model, *names):
+    entities = [entity_model(id=uuid.uuid4(), name=name) for name in names]
+    session.add_all(entities)
+    session.flush()
+    return entities
+
+
+def test_bulk_get(session, entity_model):
+    first, second, deleted = add_entities(session, entity_model, "first", "second", "deleted")
+    deleted.soft_delete()
+    session.flush()
+    ids = [first.id, second.id, deleted.id, uuid.uuid4()]
+
+    assert {entity.id for entity in entity_model.bulk_get(ids)} == {first.id, second.id}
+    assert {entity.id for entity in entity_model.bulk_get(ids, include_soft_deleted=True)} == {
+        first.id, second.id, deleted.id
+    }
+    assert entity_model.bulk_get([]) == []
+
+
+def test_bulk_soft_delete(session, entity_model):
+    active, deleted = add_entities(session, entity_model, "active", "deleted")
+    deleted_at = datetime(2023, 1, 1)
+    deleted.deleted = True
+    deleted.deleted_at = deleted_at
+    session.flush()
+
+    assert entity_model.bulk_soft_delete([active.id, deleted.id, uuid.uuid4()]) == 1
+    session.expire_all()
+    assert active.deleted is True
+    assert active.deleted_at is not None
+    # Entities already soft deleted keep their deletion time
+    assert deleted.deleted_at == deleted_at
+    assert entity_model.bulk_soft_delete([]) == 0
+
+
+def test_bulk_upsert(session, entity_model):
+    (existing,) = add_entities(session, entity_model, "before")
+    created_at, updated_at = existing.created_at, existing.updated_at
+    new_id = uuid.uuid4()
+
+    ids = entity_model.bulk_upsert([{"id": new_id, "name": "inserted"}, {"id": existing.id, "name": "after"}])
+
+    assert ids == [new_id, existing.id]
+    session.expire_all()
+    assert session.get(entity_model, new_id).name == "inserted"
+    assert existing.name == "after"
+    assert existing.created_at == created_at
+    assert existing.updated_at >= updated_at
+    assert entity_model.bulk_upsert([]) == []
+
+
+def test_bulk_upsert_without_ids(session, entity_model):
+    ids = entity_model.bulk_upsert([{"name": "first"}, {"name": "second"}])
+
+    assert [session.get(entity_model, fm_entity_id).name for fm_entity_id in ids] == ["first", "second"]
+
+
+def test_bulk_upsert_rejects_invalid_rows(session, entity_model):
+    fm_entity_id = uuid.uuid4()
+
+    with pytest.raises(ValueError, match="duplicate ids"):
+        entity_model.bulk_upsert([{"id": fm_entity_id, "name": "first"}, {"id": fm_entity_id, "name": "second"}])
+    with pytest.raises(ValueError, match="same columns"):
+        entity_model.bulk_upsert([{"id": uuid.uuid4(), "name": "first"}, {"id": uuid.uuid4()}])
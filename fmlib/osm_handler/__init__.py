@@ -1,2 +1,13 @@
+from .haversine_distance import haversine_dist_array, haversine_dist_wsgi_points, haversine_distance, pairwise_haversine
 from .osm_utils import OSMUtils
-from .trip_segments import BaseSegment
+from .trip_segments import BaseSegment, TripSegmenter
+from .trail_array import TrailArray
+from .prepared_trip import PreparedTrip
+from .event_index import EventIndex
+from .frozen import FrozenDict, FrozenList, freeze
+from .spatial_index import TrailSpatialIndex
+from .segmentation_pool import SegmentationPool
+from .stream import StreamStats, iter_ndjson, open_trip_stream, segment_ndjson
+from .live_segmenter import LiveTripSegmenter
+from .simplify import douglas_peucker, simplify_trail
+from .trail_codec import decode_datapoint_trail, decode_trail, encode_datapoint_trail, encode_trail
@@ -0,0 +1,122 @@
+"""
+Parity check and benchmark of the compiled segmentation core against the pure Python path of BaseSegment.
+Synthetic trips are segmented with the compiled core, with TripSegmenter on the pure Python path, and segment by
+segment with BaseSegment. Both TripSegmenter paths must return the same datapoints (or segmentation errors), and
+match BaseSegment up to float rounding, as BaseSegment interpolates one point at a time. Exits with status 1 on any
+mismatch.
+
+Usage:
+    python -m fmlib.osm_handler.benchmarks.core_parity [--trips 50] [--trail-points 2000]
+"""
+import argparse
+import math
+import sys
+import timeit
+from typing import Any, Dict, List, Text, Tuple, Union
+
+from .. import segment_core
+from ..prepared_trip import PreparedTrip
+from ..trip_segments import BaseSegment, TripSegmenter
+from .synthetic import make_trip
+
+THRESHOLDS = ((0.0, 0.0), (0.01, 1.0), (0.05, 5.0), (0.2, 30.0))
+
+
+def matches(value: Any, expected: Any, rel_tol: float = 1e-9) -> bool:
+    """
+    This method compares two datapoints, or errors, with floats compared up to rel_tol.
+    """
+    if isinstance(value, float) and isinstance(expected, float):
+        return math.isclose(value, expected, rel_tol=rel_tol)
+    if isinstance(value, dict) and isinstance(expected, dict):
+        return value.keys() == expected.keys() and all(matches(value[key], expected[key]) for key in value)
+    if isinstance(value, list) and isinstance(expected, list):
+        return len(value) == len(expected) and all(matches(a, b) for a, b in zip(value, expected))
+    return type(value) is type(expected) and value == expected
+
+
+def split(segmenter: TripSegmenter, prepared_trip: PreparedTrip, boundaries: List[Tuple[int, int]],
+          accelerated: bool) -> Union[List[Dict[Text, Any]], Text]:
+    """
+    This method segments a trip on the given path, and returns the datapoints, or the error raised.
+    """
+    segment_core.set_accelerated_core(accelerated)
+    try:
+        return segmenter.split(prepared_trip, boundaries)
+    except Exception as e:
+        return repr(e)
+
+
+def split_by_segment(segmenter: TripSegmenter, prepared_trip: PreparedTrip, boundaries: List[Tuple[int, int]]
+                     ) -> Union[List[Dict[Text, Any]], Text]:
+    """
+    This method segments a trip one BaseSegment at a time, and returns the datapoints, or the error raised.
+    """
+    try:
+        return [
+            BaseSegment(
+                prepared_trip.parent_datapoint, segment_timestamp, segment_timestamp_end, i == 0,
+                i == len(boundaries) - 1, segmenter.minimum_distance_km_to_interpolate,
+                segmenter.minimum_seconds_to_interpolate, prepared_trip=prepared_trip
+            ).get_updated_trip_datapoint()
+            for i, (segment_timestamp, segment_timestamp_end) in enumerate(boundaries)
+        ]
+    except Exception as e:
+        return repr(e)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trips", type=int, default=50)
+    parser.add_argument("--trail-points", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if not segment_core.ACCELERATED_CORE_AVAILABLE:
+        print("numba is not installed, the compiled core is not available", file=sys.stderr)
+        sys.exit(1)
+
+    accelerated_core_enabled = segment_core.is_accelerated_core_enabled()
+    count_checked = count_mismatches = 0
+    for seed in range(args.trips):
+        parent_datapoint, _ = make_trip(
+            args.trail_points, events_per_hour=30 + 10 * (seed % 10), jitter_ms=100 * (seed % 5), seed=seed
+        )
+        prepared_trip = PreparedTrip(parent_datapoint)
+        for count_segments in (1, 3, 10, 50):
+            # Boundaries drawn at random, so that some segments fall between trail points or cannot be located
+            _, boundaries = make_trip(
+                args.trail_points, count_segments=count_segments, jitter_ms=900, seed=seed + 1000 * count_segments
+            )
+            for minimum_distance_km_to_interpolate, minimum_seconds_to_interpolate in THRESHOLDS:
+                segmenter = TripSegmenter(minimum_distance_km_to_interpolate, minimum_seconds_to_interpolate)
+                expected = split_by_segment(segmenter, prepared_trip, boundaries)
+                compiled = split(segmenter, prepared_trip, boundaries, accelerated=True)
+                pure_python = split(segmenter, prepared_trip, boundaries, accelerated=False)
+                count_checked += 1
+                if compiled != pure_python or not matches(compiled, expected):
+                    count_mismatches += 1
+                    print(
+                        f"Mismatch: seed {seed}, {count_segments} segments, thresholds "
+                        f"{minimum_distance_km_to_interpolate} km / {minimum_seconds_to_interpolate} s",
+                        file=sys.stderr
+                    )
+    print(f"parity: {count_checked - count_mismatches}/{count_checked} trip segmentations match")
+
+    parent_datapoint, boundaries = make_trip(args.trail_points, count_segments=100)
+    prepared_trip = PreparedTrip(parent_datapoint)
+    segmenter = TripSegmenter(0.01, 1.0)
+    for accelerated in (True, False):
+        segment_core.set_accelerated_core(accelerated)
+        segmenter.get_segments(prepared_trip, boundaries)
+        seconds = min(timeit.repeat(
+            lambda: segmenter.get_segments(prepared_trip, boundaries), number=10, repeat=args.repeat
+        )) / 10
+        print(f"{'compiled' if accelerated else 'pure Python'} get_segments, 100 segments: {seconds * 1e3:.3f} ms")
+    segment_core.set_accelerated_core(accelerated_core_enabled)
+    if count_mismatches > 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark of the segment boundary lookups: linear scans over the parent trail and events, as BaseSegment used to do,
+against the binary search lookups of BaseSegment.get_trail_window / get_event_window and EventIndex.spanning.
+
+Usage:
+    python -m fmlib.osm_handler.benchmarks.segment_lookup [--trail-points 50000] [--events 5000] [--segments 50]
+"""
+import argparse
+import timeit
+from typing import Any, Dict, List, Text, Tuple
+
+from ..prepared_trip import PreparedTrip
+from ..trip_segments import BaseSegment
+from .synthetic import make_trip
+
+
+def linear_lookup(parent_datapoint: Dict[Text, Any], segment_timestamp: int, segment_timestamp_end: int
+                  ) -> Tuple[List[int], int, List[int], int]:
+    """
+    This method locates a segment with full scans of the parent trail and events, as BaseSegment used to do.
+    """
+    trail_idx = [
+        i for i, t in enumerate(parent_datapoint["trail"])
+        if segment_timestamp <= t["timestamp"] <= segment_timestamp_end
+    ]
+    start_trail_point_idx = max(
+        i for i, t in enumerate(parent_datapoint["trail"]) if segment_timestamp >= t["timestamp"]
+    )
+    event_idx = [
+        i for i, t in enumerate(parent_datapoint["events"])
+        if segment_timestamp <= t["timestamp"] <= segment_timestamp_end
+    ]
+    count_spanning = sum(
+        1 for event in parent_datapoint["events"]
+        if event["timestamp"] < segment_timestamp < event["timestampEnd"]
+        or event["timestamp"] < segment_timestamp_end < event["timestampEnd"]
+    )
+    return trail_idx, start_trail_point_idx, event_idx, count_spanning
+
+
+def indexed_lookup(segment: BaseSegment) -> Tuple[Tuple[int, int], Tuple[int, int], List[int], List[int]]:
+    """
+    This method locates a segment with the binary search lookups of BaseSegment.
+    """
+    return (
+        segment.get_trail_window(),
+        segment.get_event_window(),
+        segment.event_index.spanning(segment.segment_timestamp),
+        segment.event_index.spanning(segment.segment_timestamp_end),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trail-points", type=int, default=50000)
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--segments", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # A trail point every second, so the trip lasts trail_points seconds
+    parent_datapoint, _ = make_trip(args.trail_points, events_per_hour=args.events * 3600 / args.trail_points)
+    prepared_trip = PreparedTrip(parent_datapoint)
+    start, end = parent_datapoint["trail"][0]["timestamp"], parent_datapoint["trail"][-1]["timestamp"]
+    step = (end - start) // args.segments
+    segments = [
+        BaseSegment(
+            parent_datapoint, start + i * step, start + (i + 1) * step, False, False, 0.0, 0.0,
+            prepared_trip=prepared_trip
+        )
+        for i in range(args.segments)
+    ]
+
+    linear_s = min(timeit.repeat(
+        lambda: [linear_lookup(parent_datapoint, s.segment_timestamp, s.segment_timestamp_end) for s in segments],
+        number=1, repeat=args.repeat
+    )) / args.segments
+    indexed_s = min(timeit.repeat(
+        lambda: [indexed_lookup(s) for s in segments], number=1, repeat=args.repeat
+    )) / args.segments
+
+    print(f"trail points: {args.trail_points}, events: {args.events}, segments: {args.segments}")
+    print(f"linear scan lookup:   {linear_s * 1e6:12.1f} us/segment")
+    print(f"binary search lookup: {indexed_s * 1e6:12.1f} us/segment")
+    print(f"speedup:              {linear_s / indexed_s:12.1f}x")
+
+
+if __name__ == "__main__":
+    main()
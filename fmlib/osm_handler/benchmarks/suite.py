@@ -0,0 +1,180 @@
+"""
+Benchmark suite of fmlib.osm_handler: segmentation, trail distances, projections and tile math, over synthetic trips.
+Every benchmark reports its ops/sec, p50 and p99 latencies and peak traced memory. Results are printed as JSON, and
+can be saved as a baseline and compared against one, failing on regressions.
+
+Usage:
+    python -m fmlib.osm_handler.benchmarks.suite [--trail-points 5000] [--output results.json]
+    python -m fmlib.osm_handler.benchmarks.suite --save-baseline baseline.json
+    python -m fmlib.osm_handler.benchmarks.suite --baseline baseline.json [--tolerance 0.25]
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Text
+
+import numpy as np
+
+from ..haversine_distance import haversine_dist_wsgi_points
+from ..osm_utils import OSMUtils
+from ..prepared_trip import PreparedTrip
+from ..trip_segments import BaseSegment, TripSegmenter
+from .synthetic import make_trip
+
+TILE_ZOOM = 16
+
+
+def get_benchmarks(parent_datapoint: Dict[Text, Any], boundaries: List[tuple]) -> Dict[Text, Callable[[], Any]]:
+    """
+    This method returns the benchmarked operations over a trip, by name.
+    """
+    trail = parent_datapoint["trail"]
+    latitudes = np.array([point["location"]["latitude"] for point in trail])
+    longitudes = np.array([point["location"]["longitude"] for point in trail])
+    wsgi_points = list(zip(latitudes.tolist(), longitudes.tolist()))
+    prepared_trip = PreparedTrip(parent_datapoint)
+    segmenter = TripSegmenter(minimum_distance_km_to_interpolate=0.01, minimum_seconds_to_interpolate=1)
+    middle = len(boundaries) // 2
+    segment_timestamp, segment_timestamp_end = boundaries[middle]
+
+    def base_segment() -> Dict[Text, Any]:
+        return BaseSegment(
+            parent_datapoint, segment_timestamp, segment_timestamp_end, False, False, 0.01, 1,
+            prepared_trip=prepared_trip
+        ).get_updated_trip_datapoint()
+
+    return {
+        "prepared_trip": lambda: PreparedTrip(parent_datapoint),
+        "base_segment": base_segment,
+        "trip_segmenter_split": lambda: segmenter.split(prepared_trip, boundaries),
+        "haversine_dist_wsgi_points": lambda: haversine_dist_wsgi_points(wsgi_points),
+        "get_cartesian_point": lambda: OSMUtils.get_cartesian_point(latitude=latitudes[0], longitude=longitudes[0]),
+        "to_cartesian_many": lambda: OSMUtils.to_cartesian_many(latitudes, longitudes),
+        "to_spherical_many": lambda: OSMUtils.to_spherical_many(*OSMUtils.to_cartesian_many(latitudes, longitudes)),
+        "deg2num_many": lambda: OSMUtils.deg2num_many(latitudes, longitudes, TILE_ZOOM),
+        "tiles_for_trail": lambda: OSMUtils.tiles_for_trail(prepared_trip.trail_array, TILE_ZOOM),
+    }
+
+
+def measure(operation: Callable[[], Any], min_runs: int, min_time_s: float) -> Dict[Text, float]:
+    """
+    This method times an operation over at least min_runs runs and min_time_s seconds, then traces the peak memory
+    allocated by a single run.
+    """
+    operation()
+    latencies = []
+    start = time.perf_counter()
+    while len(latencies) < min_runs or time.perf_counter() - start < min_time_s:
+        run_start = time.perf_counter()
+        operation()
+        latencies.append(time.perf_counter() - run_start)
+    latencies = np.array(latencies)
+
+    tracemalloc.start()
+    try:
+        operation()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "runs": len(latencies),
+        "ops_per_s": float(len(latencies) / latencies.sum()),
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "peak_memory_kb": peak_memory / 1024,
+    }
+
+
+def run(args: argparse.Namespace) -> Dict[Text, Any]:
+    """
+    This method runs the benchmarks selected by the arguments, and returns the results along with the parameters.
+    """
+    parent_datapoint, boundaries = make_trip(
+        count_trail_points=args.trail_points,
+        events_per_hour=args.events_per_hour,
+        count_segments=args.segments,
+        jitter_ms=args.jitter_ms,
+        seed=args.seed,
+    )
+    benchmarks = get_benchmarks(parent_datapoint, boundaries)
+    names = args.only or list(benchmarks)
+    return {
+        "parameters": {
+            "trail_points": args.trail_points,
+            "events_per_hour": args.events_per_hour,
+            "segments": args.segments,
+            "jitter_ms": args.jitter_ms,
+            "seed": args.seed,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "projection_backend": OSMUtils.backend,
+        },
+        "results": {name: measure(benchmarks[name], args.min_runs, args.min_time) for name in names},
+    }
+
+
+def compare(results: Dict[Text, Any], baseline: Dict[Text, Any], tolerance: float) -> List[Text]:
+    """
+    This method compares results against a baseline, and returns a description of every regression: throughput
+    lower, or p99 latency or peak memory higher, than the baseline by more than the tolerance.
+    """
+    if results["parameters"] != baseline["parameters"]:
+        raise ValueError(
+            f"Baseline was run with {baseline['parameters']}, not comparable with {results['parameters']}"
+        )
+    regressions = []
+    for name, result in results["results"].items():
+        if name not in baseline["results"]:
+            continue
+        expected = baseline["results"][name]
+        if result["ops_per_s"] < expected["ops_per_s"] * (1 - tolerance):
+            regressions.append(f"{name}: {result['ops_per_s']:.1f} ops/s, baseline {expected['ops_per_s']:.1f}")
+        if result["p99_ms"] > expected["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p99 {result['p99_ms']:.3f} ms, baseline {expected['p99_ms']:.3f}")
+        if result["peak_memory_kb"] > expected["peak_memory_kb"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: peak memory {result['peak_memory_kb']:.1f} KB, baseline {expected['peak_memory_kb']:.1f}"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trail-points", type=int, default=5000)
+    parser.add_argument("--events-per-hour", type=float, default=60.0)
+    parser.add_argument("--segments", type=int, default=10)
+    parser.add_argument("--jitter-ms", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-runs", type=int, default=20)
+    parser.add_argument("--min-time", type=float, default=0.5, help="Minimum time in seconds per benchmark")
+    parser.add_argument("--only", nargs="+", help="Names of the benchmarks to run")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--save-baseline", help="Write the results to this JSON file, to compare later runs with")
+    parser.add_argument("--baseline", help="Compare the results against this baseline JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Relative slack allowed against the baseline")
+    args = parser.parse_args()
+
+    results = run(args)
+    print(json.dumps(results, indent=2))
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Synthetic trips for the benchmarks: a random walk trail sampled about every second, events with a duration, and
+segment boundaries spread over the trip.
+"""
+import random
+from typing import Any, Dict, List, Text, Tuple
+
+from ..haversine_distance import haversine_dist_wsgi_points
+
+START_TIMESTAMP = 1_700_000_000_000
+
+
+def make_trip(
+        count_trail_points: int,
+        events_per_hour: float = 60.0,
+        count_segments: int = 10,
+        jitter_ms: int = 0,
+        seed: int = 0
+) -> Tuple[Dict[Text, Any], List[Tuple[int, int]]]:
+    """
+    This method generates a synthetic parent datapoint, along with the boundaries of its segments.
+    param count_trail_points: Number of trail points
+    param events_per_hour: Average number of events per hour of trip
+    param count_segments: Number of segments to split the trip into
+    param jitter_ms: Largest deviation of the sampling interval from a second, in ms
+    param seed: Seed of the random generator, so the same trip is generated on every run
+    """
+    rng = random.Random(seed)
+    timestamp, latitude, longitude = START_TIMESTAMP, 37.77, -122.42
+    trail = []
+    for _ in range(count_trail_points):
+        timestamp += 1000 + rng.randint(-jitter_ms, jitter_ms)
+        latitude += rng.uniform(-1e-4, 1e-4)
+        longitude += rng.uniform(-1e-4, 1e-4)
+        trail.append({
+            "timestamp": timestamp,
+            "location": {"latitude": latitude, "longitude": longitude, "accuracy": rng.uniform(3, 30)},
+            "speed": rng.uniform(0, 30),
+            "bearing": rng.uniform(0, 360),
+        })
+    first_timestamp, last_timestamp = trail[0]["timestamp"], trail[-1]["timestamp"]
+    wsgi_points = [(point["location"]["latitude"], point["location"]["longitude"]) for point in trail]
+
+    count_events = round(events_per_hour * (last_timestamp - first_timestamp) / 3_600_000)
+    event_timestamps = sorted(rng.uniform(first_timestamp, last_timestamp) for _ in range(count_events))
+    events = [
+        {"timestamp": event_timestamp, "timestampEnd": event_timestamp + rng.uniform(0, 60000),
+         "eventType": rng.randint(1, 5)}
+        for event_timestamp in event_timestamps
+    ]
+
+    step = (last_timestamp - first_timestamp) / count_segments
+    cuts = [first_timestamp + round(i * step) for i in range(count_segments)] + [last_timestamp]
+    boundaries = [(cuts[i], cuts[i + 1]) for i in range(count_segments)]
+
+    parent_datapoint = {
+        "trip": {
+            "distance": haversine_dist_wsgi_points(wsgi_points) * 1000,
+            "driveTime": (last_timestamp - first_timestamp) / 1000,
+            "averageSpeed": 0.0,
+            "startLocation": trail[0]["location"],
+            "endLocation": trail[-1]["location"],
+        },
+        "trail": trail,
+        "events": events,
+    }
+    return parent_datapoint, boundaries
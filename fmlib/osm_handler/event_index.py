@@ -0,0 +1,51 @@
+from typing import Any, Dict, List, Sequence, Text, Tuple
+
+import numpy as np
+
+
+class EventIndex:
+    """
+    This class indexes the events of a trip by timestamp, so that the events of a segment are located by binary search.
+    The events are held sorted by timestamp, events sharing a timestamp keeping their order.
+    Events with a duration (timestamp < timestampEnd) are also held in an interval index, to find the events spanning
+    a given timestamp.
+    """
+    def __init__(self, events: Sequence[Dict[Text, Any]]):
+        """
+        This method initializes the index.
+        param events: Events of the trip, as in the parent datapoint, in any order
+        """
+        self.events = sorted(events, key=lambda x: x["timestamp"])
+        self.timestamps = np.array([event["timestamp"] for event in self.events], dtype=np.float64)
+
+        timestamps_end = np.array([event["timestampEnd"] for event in self.events], dtype=np.float64)
+        duration_idx = np.flatnonzero(self.timestamps < timestamps_end)
+        order = np.argsort(self.timestamps[duration_idx], kind="stable")
+        self._interval_idx = duration_idx[order]
+        self._interval_starts = self.timestamps[self._interval_idx]
+        self._interval_ends = timestamps_end[self._interval_idx]
+        # Running max of the interval ends: no interval before the first position exceeding t can span t
+        self._interval_max_ends = np.maximum.accumulate(self._interval_ends)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def window(self, start: float, end: float) -> Tuple[int, int]:
+        """
+        This method returns the indices of the first and the last events with start <= timestamp <= end.
+        The window is empty (first > last) if there are no such events.
+        """
+        first = int(np.searchsorted(self.timestamps, start, side="left"))
+        last = int(np.searchsorted(self.timestamps, end, side="right")) - 1
+        return first, last
+
+    def spanning(self, timestamp: float) -> List[int]:
+        """
+        This method returns the indices, in event order, of the events with timestamp < given timestamp < timestampEnd.
+        """
+        lo = int(np.searchsorted(self._interval_max_ends, timestamp, side="right"))
+        hi = int(np.searchsorted(self._interval_starts, timestamp, side="left"))
+        if lo >= hi:
+            return []
+        candidates = np.flatnonzero(self._interval_ends[lo:hi] > timestamp) + lo
+        return sorted(self._interval_idx[candidates].tolist())
@@ -0,0 +1,148 @@
+"""Read-only views over datapoints that share their sub-objects with other datapoints."""
+from copy import deepcopy
+from typing import Any
+
+
+def _read_only(self, *args, **kwargs):
+    raise TypeError(f"{type(self).__name__} is read-only")
+
+
+def freeze(value: Any) -> Any:
+    """
+    This method returns a read-only view of a dict or a list. Nested dicts and lists are wrapped lazily, when accessed.
+    Other values are returned as is.
+    """
+    if isinstance(value, (FrozenDict, FrozenList)):
+        return value
+    if isinstance(value, dict):
+        return FrozenDict(value)
+    if isinstance(value, list):
+        return FrozenList(value)
+    return value
+
+
+def _freeze_child(frozen_children: dict, key: Any, value: Any) -> Any:
+    """
+    This method returns the read-only view of a nested value, wrapped on first access only, so reading the same nested
+    dict or list again does not wrap it again.
+    """
+    if not isinstance(value, (dict, list)):
+        return value
+    frozen = frozen_children.get(key)
+    if frozen is None:
+        frozen = frozen_children[key] = freeze(value)
+    return frozen
+
+
+class FrozenDict(dict):
+    """
+    A read-only dict. Nested dicts and lists are returned as read-only views, so the wrapped datapoint cannot be
+    mutated through it. It is still a dict, so it serializes to JSON as is. The views of nested values are built once,
+    on first access, and reused.
+    Copying it returns a plain, mutable dict, of read-only views of the nested dicts and lists.
+    """
+    __slots__ = ("_frozen_children",)
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __init__(self, *args, **kwargs):
+        dict.__init__(self, *args, **kwargs)
+        self._frozen_children = {}
+
+    def __getitem__(self, key):
+        return _freeze_child(self._frozen_children, key, dict.__getitem__(self, key))
+
+    def __iter__(self):
+        # Overridden so that dict(view) and {**view} copy through __getitem__, rather than the nested values as is
+        return dict.__iter__(self)
+
+    def get(self, key, default=None):
+        if not dict.__contains__(self, key):
+            return default
+        return self[key]
+
+    def values(self):
+        return [self[key] for key in dict.keys(self)]
+
+    def items(self):
+        return [(key, self[key]) for key in dict.keys(self)]
+
+    def copy(self):
+        return dict(self.items())
+
+    __copy__ = copy
+
+    def __or__(self, other):
+        if not isinstance(other, dict):
+            return NotImplemented
+        merged = self.copy()
+        dict.update(merged, other)
+        return merged
+
+    def __ror__(self, other):
+        if not isinstance(other, dict):
+            return NotImplemented
+        merged = dict(other)
+        dict.update(merged, self.items())
+        return merged
+
+    def __deepcopy__(self, memo):
+        return {key: deepcopy(value, memo) for key, value in dict.items(self)}
+
+    def __reduce__(self):
+        return dict, (dict(dict.items(self)),)
+
+
+class FrozenList(list):
+    """
+    A read-only list. Nested dicts and lists are returned as read-only views, so the wrapped datapoint cannot be
+    mutated through it. It is still a list, so it serializes to JSON as is. The views of nested values are built once,
+    on first access, and reused.
+    Copying it, adding it to a list or multiplying it returns a plain, mutable list, of read-only views of the nested
+    dicts and lists.
+    """
+    __slots__ = ("_frozen_children",)
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only
+
+    def __init__(self, *args):
+        list.__init__(self, *args)
+        self._frozen_children = {}
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return FrozenList(self[i] for i in range(*idx.indices(len(self))))
+        value = list.__getitem__(self, idx)
+        return _freeze_child(self._frozen_children, idx + len(self) if idx < 0 else idx, value)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __reversed__(self):
+        return (self[i] for i in range(len(self) - 1, -1, -1))
+
+    def copy(self):
+        return list(self)
+
+    __copy__ = copy
+
+    def __add__(self, other):
+        if not isinstance(other, list):
+            return NotImplemented
+        return self.copy() + list(other)
+
+    def __radd__(self, other):
+        if not isinstance(other, list):
+            return NotImplemented
+        return list(other) + self.copy()
+
+    def __mul__(self, count):
+        return self.copy() * count
+
+    __rmul__ = __mul__
+
+    def __deepcopy__(self, memo):
+        return [deepcopy(value, memo) for value in list.__iter__(self)]
+
+    def __reduce__(self):
+        return list, (list(list.__iter__(self)),)
@@ -1,7 +1,11 @@
 """Geography utilities."""
-from typing import List, Tuple
+from typing import List, Sequence, Tuple
 import math
 
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+
 
 def old_div(x, y):
     return 0 if y == 0 else x / y
@@ -17,7 +21,7 @@ def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     :return: Distance in kms.
     :rtype: float
     """
-    radius = 6371  # km
+    radius = EARTH_RADIUS_KM  # km
 
     dlat = math.radians(lat2 - lat1)
     dlon = math.radians(lon2 - lon1)
@@ -30,10 +34,56 @@ def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     return d
 
 
+def pairwise_haversine(lat1: Sequence[float], lon1: Sequence[float], lat2: Sequence[float],
+                       lon2: Sequence[float]) -> np.ndarray:
+    """
+    Vectorized haversine distance between two equally sized sets of points.
+    :param lat1: Latitudes in degrees of the first points.
+    :param lon1: Longitudes in degrees of the first points.
+    :param lat2: Latitudes in degrees of the second points.
+    :param lon2: Longitudes in degrees of the second points.
+    :return: Distance in kms between each pair of points.
+    :rtype: numpy.ndarray
+    """
+    lat1 = np.asarray(lat1, dtype=np.float64)
+    lon1 = np.asarray(lon1, dtype=np.float64)
+    lat2 = np.asarray(lat2, dtype=np.float64)
+    lon2 = np.asarray(lon2, dtype=np.float64)
+
+    sin_dlat = np.sin(np.radians(lat2 - lat1) / 2)
+    sin_dlon = np.sin(np.radians(lon2 - lon1) / 2)
+    a = sin_dlat * sin_dlat + np.cos(np.radians(lat1)) * np.cos(np.radians(lat2)) * sin_dlon * sin_dlon
+    # Guard against rounding pushing `a` marginally outside [0, 1] for (near) antipodal points
+    a = np.clip(a, 0.0, 1.0)
+    return 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def haversine_dist_array(latitudes: Sequence[float], longitudes: Sequence[float]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Haversine distances along a trail of points, computed in a single pass.
+    :param latitudes: Latitudes in degrees of the trail points, in trail order.
+    :param longitudes: Longitudes in degrees of the trail points, in trail order.
+    :return: Tuple of (per leg distances in kms of length n - 1, cumulative distances in kms of length n,
+             starting at 0).
+    :rtype: Tuple[numpy.ndarray, numpy.ndarray]
+    """
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    if latitudes.shape != longitudes.shape:
+        raise ValueError("latitudes and longitudes must have the same shape")
+
+    legs = pairwise_haversine(latitudes[:-1], longitudes[:-1], latitudes[1:], longitudes[1:])
+    cumulative = np.zeros(latitudes.shape[0], dtype=np.float64)
+    np.cumsum(legs, out=cumulative[1:])
+    return legs, cumulative
+
+
 def haversine_dist_wsgi_points(wsgi_points: List[Tuple[float, float]]) -> float:
-    dist = 0
-    for i in range(len(wsgi_points) - 1):
-        p1 = wsgi_points[i]
-        p2 = wsgi_points[i + 1]
-        dist += haversine_distance(lat1=p1[0], lon1=p1[1], lat2=p2[0], lon2=p2[1])
-    return dist
+    """
+    Total haversine distance in kms along a list of (latitude, longitude) points.
+    """
+    if len(wsgi_points) < 2:
+        return 0
+    points = np.asarray(wsgi_points, dtype=np.float64)
+    _, cumulative = haversine_dist_array(points[:, 0], points[:, 1])
+    return float(cumulative[-1])
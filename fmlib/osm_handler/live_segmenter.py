@@ -0,0 +1,255 @@
+import logging
+from bisect import bisect_left, bisect_right
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence, Text, Tuple
+
+from .haversine_distance import pairwise_haversine
+from .prepared_trip import PreparedTrip
+from .trail_array import TrailArray
+from .trip_segments import BaseSegment
+
+log = logging.getLogger(__name__)
+
+
+class LiveTripSegmenter:
+    """
+    This class segments a trip while it is live. Trail points, events and segment boundaries are fed as they arrive,
+    and every segment is emitted as soon as it is complete, instead of re-segmenting the whole trip on each update.
+    The running trail distance is kept up to date as points arrive, and only the trail points and events that later
+    segments can still need are retained.
+
+    A segment is complete once the next segment is known (so it is not the last segment of the trip) and a trail point
+    past its end has arrived (the point to interpolate its end with). The last segment is emitted by finish.
+    Every segment datapoint matches the one TripSegmenter.split returns for the whole trip, except for the trip
+    distance adjustment, which uses the trip distance and the trail received when the segment is emitted.
+    Trail points and events arriving after the segment they belong to was emitted are late: they are counted in
+    late_trail_points and late_events, and logged. A trail point is late if it would have changed an emitted segment,
+    i.e. it is older than the point its end was interpolated with, and an event is late if it starts before its end.
+    Late trail points older than the retained trail (i.e. before the previous segment boundary) are dropped, the other
+    late trail points and events are still used for the segments left to emit.
+
+    Example Usage:
+        segmenter = LiveTripSegmenter(minimum_distance_km_to_interpolate=0.05, minimum_seconds_to_interpolate=5)
+        segmenter.add_segment(segment_timestamp, segment_timestamp_end)
+        datapoints = segmenter.update(partial_datapoint)
+        ...
+        datapoints = segmenter.finish()
+    """
+    def __init__(self, minimum_distance_km_to_interpolate: float, minimum_seconds_to_interpolate: float,
+                 share_parent: bool = False, read_only: bool = False, simplify_tolerance_m: Optional[float] = None):
+        """
+        This method initializes the segmenter for a new trip.
+        param minimum_distance_km_to_interpolate: Minimum distance in kms between two trail points to interpolate
+        param minimum_seconds_to_interpolate: Minimum duration in seconds between two trail points to interpolate
+        param share_parent: If True, the segment datapoints share their unchanged sub-objects with the parent datapoint
+        param read_only: If True, the segment datapoints are returned as read-only views
+        param simplify_tolerance_m: If set, the segment trails are simplified with this tolerance in metres
+        """
+        self.minimum_distance_km_to_interpolate = minimum_distance_km_to_interpolate
+        self.minimum_seconds_to_interpolate = minimum_seconds_to_interpolate
+        self.share_parent = share_parent
+        self.read_only = read_only
+        self.simplify_tolerance_m = simplify_tolerance_m
+
+        # Latest values of the parent datapoint keys other than the trail and the events
+        self.parent_datapoint: Dict[Text, Any] = {}
+        # Retained trail, sorted by timestamp, with the haversine distance in kms from the first point of the trip
+        self._trail: List[Dict[Text, Any]] = []
+        self._timestamps: List[float] = []
+        self._latitudes: List[float] = []
+        self._longitudes: List[float] = []
+        self._cumulative_distances: List[float] = []
+        self._count_dropped_points = 0
+        # Retained events, sorted by timestamp
+        self._events: List[Dict[Text, Any]] = []
+        self._event_timestamps: List[float] = []
+
+        self._segments: Deque[Tuple[int, int]] = deque()
+        self.count_emitted_segments = 0
+        # End of the last emitted segment, and timestamp of the trail point it was interpolated with
+        self._emitted_segment_end: Optional[int] = None
+        self._emitted_trail_timestamp: Optional[float] = None
+        self.late_trail_points = 0
+        self.late_events = 0
+        self.is_finished = False
+
+    @property
+    def distance_km(self) -> float:
+        """
+        Haversine distance in kms along the trail received so far.
+        """
+        return self._cumulative_distances[-1] if len(self._cumulative_distances) > 0 else 0.0
+
+    def add_segment(self, segment_timestamp: int, segment_timestamp_end: int) -> None:
+        """
+        This method adds the next segment of the trip. Segments are added in trip order.
+        """
+        if self.is_finished:
+            raise ValueError("Trip is already finished")
+        if len(self._segments) > 0 and segment_timestamp < self._segments[-1][0]:
+            raise ValueError(f"Segment starting at {segment_timestamp} is added out of trip order")
+        self._segments.append((segment_timestamp, segment_timestamp_end))
+
+    def update(self, datapoint: Optional[Dict[Text, Any]] = None,
+               boundaries: Sequence[Tuple[int, int]] = ()) -> List[Dict[Text, Any]]:
+        """
+        This method feeds a partial parent datapoint of the trip, and returns the datapoints of the segments it
+        completes.
+        param datapoint: New trail points and events of the trip, along with the latest values of its other keys
+        (e.g. the trip)
+        param boundaries: (segment_timestamp, segment_timestamp_end) of the segments added since the last update
+        """
+        if self.is_finished:
+            raise ValueError("Trip is already finished")
+        for segment_timestamp, segment_timestamp_end in boundaries:
+            self.add_segment(segment_timestamp, segment_timestamp_end)
+        if datapoint is not None:
+            self._merge(datapoint)
+        datapoints = []
+        while len(self._segments) > 1 and len(self._timestamps) > 0 and self._timestamps[-1] > self._segments[0][1]:
+            datapoints.append(self._emit(is_last_segment=False))
+        return datapoints
+
+    def finish(self, datapoint: Optional[Dict[Text, Any]] = None,
+               boundaries: Sequence[Tuple[int, int]] = ()) -> List[Dict[Text, Any]]:
+        """
+        This method feeds the last partial parent datapoint of the trip, if any, and returns the datapoints of all the
+        remaining segments. The last segment added is the last segment of the trip.
+        """
+        datapoints = self.update(datapoint, boundaries)
+        self.is_finished = True
+        while len(self._segments) > 0:
+            datapoints.append(self._emit(is_last_segment=len(self._segments) == 1))
+        return datapoints
+
+    def _merge(self, datapoint: Dict[Text, Any]) -> None:
+        """
+        This method merges a partial parent datapoint into the retained trail and events.
+        """
+        self.parent_datapoint.update(
+            (key, value) for key, value in datapoint.items() if key not in ("trail", "events")
+        )
+        count_late_points, count_late_events = 0, 0
+        for event in sorted(datapoint.get("events") or [], key=lambda x: x["timestamp"]):
+            if self._emitted_segment_end is not None and event["timestamp"] <= self._emitted_segment_end:
+                count_late_events += 1
+            position = bisect_right(self._event_timestamps, event["timestamp"])
+            self._events.insert(position, event)
+            self._event_timestamps.insert(position, event["timestamp"])
+
+        first_changed_idx = len(self._trail)
+        for point in sorted(datapoint.get("trail") or [], key=lambda x: x["timestamp"]):
+            # Points sharing a timestamp keep their arrival order, as the stable sort of a whole trail does
+            position = bisect_right(self._timestamps, point["timestamp"])
+            is_dropped = position == 0 and self._count_dropped_points > 0
+            if is_dropped or (
+                    self._emitted_trail_timestamp is not None and point["timestamp"] < self._emitted_trail_timestamp
+            ):
+                count_late_points += 1
+            if is_dropped:
+                continue
+            self._trail.insert(position, point)
+            self._timestamps.insert(position, point["timestamp"])
+            self._latitudes.insert(position, point["location"]["latitude"])
+            self._longitudes.insert(position, point["location"]["longitude"])
+            first_changed_idx = min(first_changed_idx, position)
+        self._update_distances(first_changed_idx)
+
+        if count_late_points > 0 or count_late_events > 0:
+            self.late_trail_points += count_late_points
+            self.late_events += count_late_events
+            log.warning(
+                "%d trail points and %d events of the trip arrived after their segment was emitted",
+                count_late_points, count_late_events
+            )
+
+    def _update_distances(self, first_changed_idx: int) -> None:
+        """
+        This method recomputes the cumulative distances from the first point that changed. Legs are added in trail
+        order, so the distances match the ones computed over the whole trail at once.
+        """
+        del self._cumulative_distances[first_changed_idx:]
+        if first_changed_idx >= len(self._trail):
+            return
+        if first_changed_idx == 0:
+            self._cumulative_distances.append(0.0)
+            first_changed_idx = 1
+        legs = pairwise_haversine(
+            self._latitudes[first_changed_idx - 1:-1], self._longitudes[first_changed_idx - 1:-1],
+            self._latitudes[first_changed_idx:], self._longitudes[first_changed_idx:]
+        )
+        distance_km = self._cumulative_distances[-1]
+        for leg in legs.tolist():
+            distance_km += leg
+            self._cumulative_distances.append(distance_km)
+
+    def _emit(self, is_last_segment: bool) -> Dict[Text, Any]:
+        """
+        This method builds the datapoint of the oldest pending segment, then releases the trail points and events no
+        later segment can need.
+        """
+        segment_timestamp, segment_timestamp_end = self._segments.popleft()
+        is_first_segment = self.count_emitted_segments == 0
+        self.count_emitted_segments += 1
+        start_timestamp = segment_timestamp - 1 if is_first_segment else segment_timestamp
+
+        # Trail points within the segment, along with the points to interpolate its boundaries with
+        trail_start_idx = 0 if is_first_segment else max(bisect_left(self._timestamps, start_timestamp) - 1, 0)
+        trail_end_idx = (
+            len(self._trail) if is_last_segment
+            else min(bisect_right(self._timestamps, segment_timestamp_end) + 1, len(self._trail))
+        )
+        # Events within the segment, or spanning its start (events spanning its end start within it)
+        events_end_idx = len(self._events) if is_last_segment else bisect_right(self._event_timestamps,
+                                                                                 segment_timestamp_end)
+        events_start_idx = 0 if is_first_segment else bisect_left(self._event_timestamps, start_timestamp)
+        events = [
+            event for event in self._events[:events_start_idx] if event["timestampEnd"] > start_timestamp
+        ] + self._events[events_start_idx:events_end_idx]
+
+        parent_datapoint = dict(self.parent_datapoint, trail=None, events=events)
+        prepared_trip = PreparedTrip(
+            parent_datapoint,
+            # The running distances are passed on, so the segment distance matches the one over the whole trail
+            trail_array=TrailArray.from_trail(
+                self._trail[trail_start_idx:trail_end_idx],
+                cumulative_distances=self._cumulative_distances[trail_start_idx:trail_end_idx]
+            ),
+            distance_km=self.distance_km
+        )
+        segment = BaseSegment(
+            parent_datapoint=parent_datapoint,
+            segment_timestamp=segment_timestamp,
+            segment_timestamp_end=segment_timestamp_end,
+            is_first_segment=is_first_segment,
+            is_last_segment=is_last_segment,
+            minimum_distance_km_to_interpolate=self.minimum_distance_km_to_interpolate,
+            minimum_seconds_to_interpolate=self.minimum_seconds_to_interpolate,
+            prepared_trip=prepared_trip,
+            share_parent=self.share_parent,
+            read_only=self.read_only,
+            simplify_tolerance_m=self.simplify_tolerance_m
+        )
+        datapoint = segment.get_updated_trip_datapoint()
+        self._emitted_segment_end = segment_timestamp_end
+        self._emitted_trail_timestamp = self._timestamps[trail_end_idx - 1] if trail_end_idx > 0 else None
+        if len(self._segments) > 0:
+            self._release(self._segments[0][0])
+        return datapoint
+
+    def _release(self, segment_timestamp: int) -> None:
+        """
+        This method releases the trail points and events that no segment starting at or after segment_timestamp needs.
+        The trail point before the segment is kept, to interpolate the segment start with.
+        """
+        count_points = max(bisect_left(self._timestamps, segment_timestamp) - 1, 0)
+        if count_points > 0:
+            for column in (self._trail, self._timestamps, self._latitudes, self._longitudes,
+                           self._cumulative_distances):
+                del column[:count_points]
+            self._count_dropped_points += count_points
+        count_events = bisect_left(self._event_timestamps, segment_timestamp)
+        if count_events > 0:
+            spanning = [event for event in self._events[:count_events] if event["timestampEnd"] > segment_timestamp]
+            self._events[:count_events] = spanning
+            self._event_timestamps[:count_events] = [event["timestamp"] for event in spanning]
@@ -1,26 +1,92 @@
 import math
-from typing import Tuple
-from pyproj import Transformer
+from functools import lru_cache
+from typing import Any, Dict, Sequence, Text, Tuple, Union
+
+import numpy as np
+
+from .trail_array import TrailArray
+
+# Web Mercator (EPSG:3857) projects latitude/longitude (EPSG:4326) onto a sphere of the WGS84 semi-major axis
+WEB_MERCATOR_RADIUS = 6378137.0
+
+ANALYTIC_BACKEND = "analytic"
+PYPROJ_BACKEND = "pyproj"
+
+
+@lru_cache(maxsize=None)
+def _get_transformer(crs_from: int, crs_to: int):
+    """
+    This method builds the pyproj transformer between two CRS, on first use only.
+    """
+    from pyproj import Transformer
+
+    return Transformer.from_crs(crs_from, crs_to)
 
 
 class OSMUtils(object):
     """
     This class contains methods to convert between spherical and cartesian coordinates.
+    Web Mercator is computed with its closed form by default. Set the pyproj backend with OSMUtils.set_backend to
+    route conversions through pyproj instead.
     """
-    spherical_2_cartesian_transformer = Transformer.from_crs(4326, 3857)
-    cartesian_2_spherical_transformer = Transformer.from_crs(3857, 4326)
+    backend = ANALYTIC_BACKEND
+
+    @staticmethod
+    def set_backend(backend: str) -> None:
+        """
+        This method selects the backend used for the conversions, either "analytic" or "pyproj".
+        """
+        if backend not in (ANALYTIC_BACKEND, PYPROJ_BACKEND):
+            raise ValueError(f"Unsupported projection backend {backend}")
+        OSMUtils.backend = backend
 
     @staticmethod
     def get_cartesian_point(latitude:float, longitude:float) -> Tuple[float, float]:
-        x, y = OSMUtils.spherical_2_cartesian_transformer.transform(latitude, longitude)
+        if OSMUtils.backend == PYPROJ_BACKEND:
+            x, y = _get_transformer(4326, 3857).transform(latitude, longitude)
+            return x, y
+        x = WEB_MERCATOR_RADIUS * math.radians(longitude)
+        y = WEB_MERCATOR_RADIUS * math.log(math.tan(math.pi / 4 + math.radians(latitude) / 2))
         return x, y
 
     @staticmethod
     def get_spherical_point(point: Tuple[float, float]) -> Tuple[float, float]:
         x, y = point
-        latitude, longitude = OSMUtils.cartesian_2_spherical_transformer.transform(x, y)
+        if OSMUtils.backend == PYPROJ_BACKEND:
+            latitude, longitude = _get_transformer(3857, 4326).transform(x, y)
+            return latitude, longitude
+        latitude = math.degrees(2 * math.atan(math.exp(y / WEB_MERCATOR_RADIUS)) - math.pi / 2)
+        longitude = math.degrees(x / WEB_MERCATOR_RADIUS)
         return latitude, longitude
 
+    @staticmethod
+    def to_cartesian_many(latitudes: Sequence[float], longitudes: Sequence[float]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        This method converts arrays of latitudes and longitudes to cartesian x and y, in a single transform call.
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        if OSMUtils.backend == PYPROJ_BACKEND:
+            x, y = _get_transformer(4326, 3857).transform(latitudes, longitudes)
+            return np.asarray(x), np.asarray(y)
+        x = WEB_MERCATOR_RADIUS * np.radians(longitudes)
+        y = WEB_MERCATOR_RADIUS * np.log(np.tan(np.pi / 4 + np.radians(latitudes) / 2))
+        return x, y
+
+    @staticmethod
+    def to_spherical_many(x: Sequence[float], y: Sequence[float]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        This method converts arrays of cartesian x and y to latitudes and longitudes, in a single transform call.
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        if OSMUtils.backend == PYPROJ_BACKEND:
+            latitudes, longitudes = _get_transformer(3857, 4326).transform(x, y)
+            return np.asarray(latitudes), np.asarray(longitudes)
+        latitudes = np.degrees(2 * np.arctan(np.exp(y / WEB_MERCATOR_RADIUS)) - np.pi / 2)
+        longitudes = np.degrees(x / WEB_MERCATOR_RADIUS)
+        return latitudes, longitudes
+
     @staticmethod
     def num2deg(x_tile, y_tile, zoom):
         n = 2.0 ** zoom
@@ -36,3 +102,81 @@ class OSMUtils(object):
         x_tile = int((lon_deg + 180.0) / 360.0 * n)
         y_tile = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
         return x_tile, y_tile
+
+    @staticmethod
+    def num2deg_many(x_tiles: Sequence[float], y_tiles: Sequence[float], zoom: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        This method is the vectorized num2deg: it returns the latitudes and longitudes of the north-west corners of the
+        given tiles.
+        """
+        n = 2.0 ** zoom
+        lon_deg = np.asarray(x_tiles, dtype=np.float64) / n * 360.0 - 180.0
+        lat_rad = np.arctan(np.sinh(np.pi * (1 - 2 * np.asarray(y_tiles, dtype=np.float64) / n)))
+        return np.degrees(lat_rad), lon_deg
+
+    @staticmethod
+    def deg2num_fractional(lat_deg: Sequence[float], lon_deg: Sequence[float], zoom: int
+                           ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        This method returns the fractional tile coordinates of the given points, whose integer parts are the tiles.
+        """
+        lat_rad = np.radians(np.asarray(lat_deg, dtype=np.float64))
+        n = 2.0 ** zoom
+        x_tile = (np.asarray(lon_deg, dtype=np.float64) + 180.0) / 360.0 * n
+        y_tile = (1.0 - np.arcsinh(np.tan(lat_rad)) / np.pi) / 2.0 * n
+        return x_tile, y_tile
+
+    @staticmethod
+    def deg2num_many(lat_deg: Sequence[float], lon_deg: Sequence[float], zoom: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        This method is the vectorized deg2num: it returns the x and y tiles of the given points.
+        """
+        x_tile, y_tile = OSMUtils.deg2num_fractional(lat_deg, lon_deg, zoom)
+        return np.trunc(x_tile).astype(np.int64), np.trunc(y_tile).astype(np.int64)
+
+    @staticmethod
+    def tiles_for_trail(trail: Union[TrailArray, Sequence[Dict[Text, Any]]], zoom: int) -> np.ndarray:
+        """
+        This method returns the unique tiles a trail crosses, as an array of (x_tile, y_tile) rows sorted by x then y.
+        Besides the tiles of the trail points, the tiles crossed by the straight (Web Mercator) lines between
+        consecutive trail points are included, so sparse trails are covered without gaps. Legs crossing the antimeridian
+        go the short way round, across the seam.
+        param trail: Trail, as a TrailArray or a list of trail point dicts
+        param zoom: Zoom level of the tiles
+        """
+        trail_array = trail if isinstance(trail, TrailArray) else TrailArray.from_trail(trail)
+        x, y = OSMUtils.deg2num_fractional(trail_array.latitudes, trail_array.longitudes, zoom)
+        points_x, points_y = [x], [y]
+
+        # Every grid line a leg crosses splits it in two. The midpoints between consecutive crossings of a leg lie in
+        # the tiles the leg goes through.
+        n = 2 ** zoom
+        x0, y0, y1 = x[:-1], y[:-1], y[1:]
+        # The end of the legs longer than half the world is moved by a world width, so the leg crosses the seam rather
+        # than every tile between both ends. Points beyond the seam are wrapped back below.
+        x1 = x0 + np.mod(x[1:] - x0 + n / 2, n) - n / 2
+        crossings_leg, crossings_t = [], []
+        for start, end in ((x0, x1), (y0, y1)):
+            grid_start, grid_end = np.floor(start), np.floor(end)
+            count_crossings = np.abs(grid_end - grid_start).astype(np.int64)
+            leg = np.repeat(np.arange(len(start)), count_crossings)
+            offsets = np.arange(len(leg)) - np.repeat(np.cumsum(count_crossings) - count_crossings, count_crossings)
+            lines = np.minimum(grid_start, grid_end)[leg] + 1 + offsets
+            crossings_leg.append(leg)
+            crossings_t.append((lines - start[leg]) / (end - start)[leg])
+        legs = np.unique(np.concatenate(crossings_leg))
+        if len(legs) > 0:
+            leg = np.concatenate(crossings_leg + [legs, legs])
+            t = np.concatenate(crossings_t + [np.zeros(len(legs)), np.ones(len(legs))])
+            order = np.lexsort((t, leg))
+            leg, t = leg[order], t[order]
+            same_leg = leg[:-1] == leg[1:]
+            mid_leg = leg[:-1][same_leg]
+            mid_t = ((t[:-1] + t[1:]) / 2)[same_leg]
+            points_x.append(np.mod(x0[mid_leg] + mid_t * (x1 - x0)[mid_leg], n))
+            points_y.append(y0[mid_leg] + mid_t * (y1 - y0)[mid_leg])
+
+        x_tiles = np.clip(np.floor(np.concatenate(points_x)), 0, n - 1).astype(np.int64)
+        y_tiles = np.clip(np.floor(np.concatenate(points_y)), 0, n - 1).astype(np.int64)
+        keys = np.unique(x_tiles * n + y_tiles)
+        return np.stack([keys // n, keys % n], axis=1)
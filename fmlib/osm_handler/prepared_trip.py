@@ -0,0 +1,55 @@
+from typing import Any, Dict, List, Optional, Text
+
+import numpy as np
+
+from .event_index import EventIndex
+from .trail_array import TrailArray
+
+
+class PreparedTrip:
+    """
+    This class represents a parent datapoint prepared for segmentation. The trail and events are validated and sorted by
+    timestamp once, and the derived arrays are computed up front, so that every segment of the trip reuses them.
+    The parent datapoint is never mutated, and a prepared trip is read-only once built, so the segments of a trip can
+    be computed from several threads at once.
+    """
+    def __init__(self, parent_datapoint: Dict[Text, Any], trail_array: Optional[TrailArray] = None,
+                 distance_km: Optional[float] = None):
+        """
+        This method prepares the parent datapoint.
+        param parent_datapoint: Parent datapoint of the trip, with its trip, trail and events
+        param trail_array: Trail of the parent datapoint, if already in columnar form. The trail of the parent
+        datapoint is not read when provided.
+        param distance_km: Haversine distance in kms along the whole trail of the trip, when the trail array only holds
+        part of it. Computed from the trail array if not provided.
+        """
+        for key in ("trip", "trail", "events"):
+            if key not in parent_datapoint:
+                raise ValueError(f"Parent datapoint is missing {key}")
+        self.parent_datapoint = parent_datapoint
+        try:
+            self.trail_array = trail_array if trail_array is not None else TrailArray.from_trail(parent_datapoint["trail"])
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Invalid trail point in parent datapoint: {e!r}") from e
+        try:
+            self.event_index = EventIndex(parent_datapoint["events"])
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Invalid event in parent datapoint: {e!r}") from e
+        # Computed eagerly, so that segments never race to fill the cache
+        self.cumulative_distances = self.trail_array.cumulative_distances
+        self.leg_distances = self.trail_array.leg_distances
+        self.distance_km = self.trail_array.distance_km if distance_km is None else distance_km
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        """
+        Sorted timestamps of the trail points.
+        """
+        return self.trail_array.timestamps
+
+    @property
+    def events(self) -> List[Dict[Text, Any]]:
+        """
+        Events of the trip, sorted by timestamp.
+        """
+        return self.event_index.events
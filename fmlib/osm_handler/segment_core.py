@@ -0,0 +1,114 @@
+"""
+Optional compiled core of the trip segmentation. When numba is installed, TripSegmenter locates the trail bounds and
+the boundary interpolations of all the segments of a trip in a single numba compiled loop, instead of once per segment
+in Python, with the same results. numba is only looked up on import, it is imported and the loop compiled on the first
+segmentation. set_accelerated_core(False) turns the compiled core off.
+"""
+import importlib.util
+from typing import Tuple
+
+import numpy as np
+
+ACCELERATED_CORE_AVAILABLE = importlib.util.find_spec("numba") is not None
+
+# Enabled by default whenever numba is installed
+_enabled = ACCELERATED_CORE_AVAILABLE
+_compiled_locate_segments = None
+
+
+def set_accelerated_core(enabled: bool) -> None:
+    """
+    This method enables or disables the compiled core. It is enabled by default when numba is installed, enabling it
+    without numba raises a ValueError.
+    """
+    global _enabled
+    if enabled:
+        try:
+            import numba  # noqa: F401
+        except ImportError as e:
+            raise ValueError("The accelerated segmentation core requires numba") from e
+    _enabled = enabled
+
+
+def is_accelerated_core_enabled() -> bool:
+    return _enabled
+
+
+def _locate_segments(timestamps: np.ndarray, leg_distances: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+                     first_trail_idx: np.ndarray, last_trail_idx: np.ndarray, is_first: np.ndarray,
+                     is_last: np.ndarray, minimum_distance_km_to_interpolate: float,
+                     minimum_seconds_to_interpolate: float
+                     ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    This method is BaseSegment.locate_segment_trail over all the segments of a trip. It returns, for every segment, the
+    indices of the first and the last trail points in the segment, the indices of the trail points to interpolate the
+    start and the end with (-1 for none), and whether the segment could be located.
+    """
+    count_segments = len(starts)
+    count_trail_points = len(timestamps)
+    trail_start_idx = np.zeros(count_segments, dtype=np.int64)
+    trail_end_idx = np.full(count_segments, -1, dtype=np.int64)
+    start_request_idx = np.full(count_segments, -1, dtype=np.int64)
+    end_request_idx = np.full(count_segments, -1, dtype=np.int64)
+    is_located = np.zeros(count_segments, dtype=np.bool_)
+    for i in range(count_segments):
+        start_idx, end_idx = 0, -1
+        has_trail = False
+        if first_trail_idx[i] <= last_trail_idx[i]:
+            start_idx = 0 if is_first[i] else first_trail_idx[i]
+            end_idx = count_trail_points - 1 if is_last[i] else last_trail_idx[i]
+            has_trail = True
+        else:
+            # The segment lies between two trail points
+            previous_idx = np.searchsorted(timestamps, starts[i], side="right") - 1
+            if 0 <= previous_idx < count_trail_points - 1:
+                start_idx, end_idx = previous_idx + 1, previous_idx
+                has_trail = True
+        if has_trail:
+            duration_start_s = (timestamps[start_idx] - starts[i]) / 1000
+            if (
+                    start_idx > 0 and
+                    leg_distances[start_idx - 1] > minimum_distance_km_to_interpolate and
+                    duration_start_s > minimum_seconds_to_interpolate
+            ):
+                start_request_idx[i] = start_idx - 1
+            duration_end_s = (ends[i] - timestamps[end_idx]) / 1000
+            if (
+                    end_idx < count_trail_points - 1 and
+                    leg_distances[end_idx] > minimum_distance_km_to_interpolate and
+                    duration_end_s > minimum_seconds_to_interpolate
+            ):
+                end_request_idx[i] = end_idx
+        trail_start_idx[i] = start_idx
+        trail_end_idx[i] = end_idx
+        count_points = (end_idx - start_idx + 1) + (start_request_idx[i] >= 0) + (end_request_idx[i] >= 0)
+        is_located[i] = count_points >= 2
+    return trail_start_idx, trail_end_idx, start_request_idx, end_request_idx, is_located
+
+
+def locate_segments(timestamps: np.ndarray, leg_distances: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+                    first_trail_idx: np.ndarray, last_trail_idx: np.ndarray, is_first: np.ndarray,
+                    is_last: np.ndarray, minimum_distance_km_to_interpolate: float,
+                    minimum_seconds_to_interpolate: float
+                    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    This method runs the compiled _locate_segments. It is compiled on first use, and the compiled code is cached on
+    disk for the next processes.
+    """
+    global _compiled_locate_segments
+    if _compiled_locate_segments is None:
+        import numba
+
+        _compiled_locate_segments = numba.njit(cache=True, nogil=True)(_locate_segments)
+    return _compiled_locate_segments(
+        np.asarray(timestamps, dtype=np.float64),
+        np.asarray(leg_distances, dtype=np.float64),
+        np.asarray(starts, dtype=np.float64),
+        np.asarray(ends, dtype=np.float64),
+        np.asarray(first_trail_idx, dtype=np.int64),
+        np.asarray(last_trail_idx, dtype=np.int64),
+        np.asarray(is_first, dtype=np.bool_),
+        np.asarray(is_last, dtype=np.bool_),
+        float(minimum_distance_km_to_interpolate),
+        float(minimum_seconds_to_interpolate),
+    )
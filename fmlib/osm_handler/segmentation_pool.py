@@ -0,0 +1,130 @@
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Text, Tuple, Union
+
+from .prepared_trip import PreparedTrip
+from .trail_array import TrailArray
+from .trip_segments import TripSegmenter
+
+# Segmenter and post-processing of the worker process, configured once by the pool initializer
+_segmenter: Optional[TripSegmenter] = None
+_postprocess: Optional[Callable[[List[Dict[Text, Any]]], Any]] = None
+
+Payload = Tuple[Dict[Text, Any], Optional[TrailArray], Sequence[Tuple[int, int]]]
+
+
+def _init_worker(minimum_distance_km_to_interpolate: float, minimum_seconds_to_interpolate: float,
+                 share_parent: bool, postprocess: Optional[Callable[[List[Dict[Text, Any]]], Any]]) -> None:
+    global _segmenter, _postprocess
+    _segmenter = TripSegmenter(
+        minimum_distance_km_to_interpolate=minimum_distance_km_to_interpolate,
+        minimum_seconds_to_interpolate=minimum_seconds_to_interpolate,
+        share_parent=share_parent
+    )
+    _postprocess = postprocess
+
+
+def _split(payload: Payload) -> Any:
+    """
+    This method segments a trip in the worker process.
+    """
+    parent_datapoint, trail_array, boundaries = payload
+    datapoints = _segmenter.split(PreparedTrip(parent_datapoint, trail_array=trail_array), boundaries)
+    return datapoints if _postprocess is None else _postprocess(datapoints)
+
+
+def _to_payload(parent_datapoint: Union[Dict[Text, Any], PreparedTrip], boundaries: Sequence[Tuple[int, int]]
+                ) -> Payload:
+    """
+    This method returns the form a trip is sent to the workers in. A prepared trip is sent as its TrailArray, whose
+    typed columns pickle as flat buffers, along with the parent datapoint without its trail. A parent datapoint is sent
+    as is: converting its trail in the parent process costs more than pickling it, and would serialize the pool on it.
+    """
+    if isinstance(parent_datapoint, PreparedTrip):
+        return dict(parent_datapoint.parent_datapoint, trail=None), parent_datapoint.trail_array, boundaries
+    return parent_datapoint, None, boundaries
+
+
+class SegmentationPool:
+    """
+    This class segments trips in bulk over a pool of processes, for backfills. Results are streamed back in input
+    order, with a bounded number of trips in flight. Prepared trips are sent to the workers in compact form.
+    To keep the parent process off the critical path, pass a postprocess function that turns the segment datapoints
+    into what the caller needs (e.g. serialized bytes) in the worker, rather than sending the datapoints back.
+
+    Example Usage:
+        with SegmentationPool(minimum_distance_km_to_interpolate=0.05, minimum_seconds_to_interpolate=5) as pool:
+            for datapoints in pool.imap((parent_datapoint, boundaries) for parent_datapoint, boundaries in trips):
+                ...
+    """
+    def __init__(
+            self,
+            minimum_distance_km_to_interpolate: float,
+            minimum_seconds_to_interpolate: float,
+            processes: Optional[int] = None,
+            max_pending: Optional[int] = None,
+            share_parent: bool = False,
+            postprocess: Optional[Callable[[List[Dict[Text, Any]]], Any]] = None
+    ):
+        """
+        This method initializes the pool.
+        param minimum_distance_km_to_interpolate: Minimum distance in kms between two trail points to interpolate
+        param minimum_seconds_to_interpolate: Minimum duration in seconds between two trail points to interpolate
+        param processes: Number of worker processes. Defaults to the number of CPUs.
+        param max_pending: Maximum number of trips in flight, which bounds memory. Defaults to 4 per process.
+        param share_parent: If True, the segment datapoints share their unchanged sub-objects with the parent datapoint
+        param postprocess: Picklable function applied in the worker to the segment datapoints of each trip, whose
+        result is yielded instead of the datapoints
+        """
+        self.processes = processes or os.cpu_count() or 1
+        self.max_pending = max_pending or 4 * self.processes
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            initializer=_init_worker,
+            initargs=(minimum_distance_km_to_interpolate, minimum_seconds_to_interpolate, share_parent, postprocess)
+        )
+
+    def __enter__(self) -> "SegmentationPool":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        This method shuts the worker processes down, once the submitted trips are done.
+        """
+        self._executor.shutdown(wait=True)
+
+    def imap(self, trips: Iterable[Tuple[Union[Dict[Text, Any], PreparedTrip], Sequence[Tuple[int, int]]]],
+             return_exceptions: bool = False) -> Iterator[Any]:
+        """
+        This method segments the trips and yields the segment datapoints of each trip (or their postprocess result),
+        in input order. The trips iterable is consumed lazily, at most max_pending trips ahead of the results.
+        param trips: (parent_datapoint, boundaries) of every trip, where the parent datapoint may be a PreparedTrip and
+        boundaries are as in TripSegmenter.split
+        param return_exceptions: If True, a trip failing to segment yields its exception instead of raising it
+        """
+        pending: deque = deque()
+        trips = iter(trips)
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < self.max_pending:
+                try:
+                    parent_datapoint, boundaries = next(trips)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.append(self._executor.submit(_split, _to_payload(parent_datapoint, boundaries)))
+            if len(pending) == 0:
+                return
+            future: Future = pending.popleft()
+            try:
+                yield future.result()
+            except Exception as e:
+                if not return_exceptions:
+                    for future in pending:
+                        future.cancel()
+                    raise
+                yield e
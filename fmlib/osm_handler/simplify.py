@@ -0,0 +1,72 @@
+import math
+from typing import Optional, Sequence
+
+import numpy as np
+
+from .osm_utils import OSMUtils
+
+
+def douglas_peucker(x: Sequence[float], y: Sequence[float], tolerance: float,
+                    keep: Optional[Sequence[bool]] = None) -> np.ndarray:
+    """
+    This method simplifies a polyline with the Douglas-Peucker algorithm, and returns the mask of the points to keep.
+    The first and the last points are always kept, along with the points flagged in keep, which split the polyline
+    into parts simplified independently.
+    All the ranges left to split are processed at once, so the number of numpy passes grows with the depth of the
+    recursion rather than with the number of points kept.
+    param x: x coordinates of the points
+    param y: y coordinates of the points
+    param tolerance: Largest distance, in the units of x and y, from a dropped point to the simplified polyline
+    param keep: Mask of the points that must be kept
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    count = len(x)
+    mask = np.zeros(count, dtype=bool) if keep is None else np.array(keep, dtype=bool)
+    if count == 0:
+        return mask
+    mask[[0, -1]] = True
+
+    anchors = np.flatnonzero(mask)
+    starts, ends = anchors[:-1], anchors[1:]
+    while True:
+        splittable = ends - starts > 1
+        starts, ends = starts[splittable], ends[splittable]
+        if len(starts) == 0:
+            return mask
+        # Interior points of every range, grouped by range
+        lengths = ends - starts - 1
+        range_idx = np.repeat(np.arange(len(starts)), lengths)
+        point_idx = starts[range_idx] + 1 + np.arange(len(range_idx)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+        # Distance of every interior point to the chord of its range, or to its start if the chord is a point
+        x0, y0 = x[starts][range_idx], y[starts][range_idx]
+        dx, dy = (x[ends] - x[starts])[range_idx], (y[ends] - y[starts])[range_idx]
+        chord = np.hypot(dx, dy)
+        px, py = x[point_idx] - x0, y[point_idx] - y0
+        distances = np.where(chord > 0, np.abs(px * dy - py * dx) / np.where(chord > 0, chord, 1), np.hypot(px, py))
+
+        # Farthest point of every range
+        order = np.lexsort((-distances, range_idx))
+        farthest = order[np.cumsum(lengths) - lengths]
+        split = distances[farthest] > tolerance
+        split_idx = point_idx[farthest[split]]
+        mask[split_idx] = True
+        starts, ends = np.concatenate([starts[split], split_idx]), np.concatenate([split_idx, ends[split]])
+
+
+def simplify_trail(latitudes: Sequence[float], longitudes: Sequence[float], tolerance_m: float,
+                   keep: Optional[Sequence[bool]] = None) -> np.ndarray:
+    """
+    This method simplifies a trail with the Douglas-Peucker algorithm over its Web Mercator coordinates, and returns
+    the mask of the trail points to keep.
+    param latitudes: Latitudes of the trail points
+    param longitudes: Longitudes of the trail points
+    param tolerance_m: Largest distance in metres from a dropped trail point to the simplified trail
+    param keep: Mask of the trail points that must be kept
+    """
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    x, y = OSMUtils.to_cartesian_many(latitudes, np.asarray(longitudes, dtype=np.float64))
+    # Web Mercator stretches distances by 1 / cos(latitude), the tolerance is scaled for the latitudes of the trail
+    mean_latitude = float(np.mean(latitudes)) if len(latitudes) > 0 else 0.0
+    return douglas_peucker(x, y, tolerance_m / math.cos(math.radians(mean_latitude)), keep=keep)
@@ -0,0 +1,165 @@
+import math
+from typing import Any, Dict, Sequence, Text, Tuple, Union
+
+import numpy as np
+
+from .haversine_distance import pairwise_haversine
+from .osm_utils import WEB_MERCATOR_RADIUS, OSMUtils
+from .trail_array import TrailArray
+
+_CELL_OFFSET = 2 ** 31
+_METRES_PER_DEGREE_LATITUDE = 111320.0
+# Slack on the projected search extents, so that rounding never drops a point lying exactly on the boundary
+_EXTENT_MARGIN = 1.01
+# Web Mercator x of the antimeridian
+_HALF_WORLD_X = math.pi * WEB_MERCATOR_RADIUS
+
+
+class TrailSpatialIndex:
+    """
+    This class indexes trail points on a uniform grid over their cartesian (Web Mercator) coordinates, to find the
+    points near a location or within a bounding box without scanning the whole trail.
+    Candidates are looked up in the grid cells overlapping the query, then filtered with the exact haversine distance.
+    Queries crossing the antimeridian look the cells up on both sides of it.
+    Indices returned by the queries are positions in the indexed arrays, i.e. TrailArray positions for a trail.
+    """
+    def __init__(self, latitudes: Sequence[float], longitudes: Sequence[float], cell_size_m: float = 100.0):
+        """
+        This method builds the index.
+        param latitudes: Latitudes of the points to index
+        param longitudes: Longitudes of the points to index
+        param cell_size_m: Approximate size of a grid cell on the ground, in metres
+        """
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.x, self.y = OSMUtils.to_cartesian_many(self.latitudes, self.longitudes)
+        # Web Mercator stretches distances by 1 / cos(latitude), cells are sized for the latitudes of the points
+        mean_latitude = float(np.mean(self.latitudes)) if len(self.latitudes) > 0 else 0.0
+        self.cell_size = cell_size_m / math.cos(math.radians(mean_latitude))
+
+        keys = self._cell_keys(np.floor(self.x / self.cell_size), np.floor(self.y / self.cell_size))
+        self.order = np.argsort(keys, kind="stable")
+        cell_keys, starts, counts = np.unique(keys[self.order], return_index=True, return_counts=True)
+        self.cells: Dict[int, Tuple[int, int]] = {
+            key: (start, start + count) for key, start, count in zip(cell_keys.tolist(), starts.tolist(), counts.tolist())
+        }
+
+    @classmethod
+    def from_trail(cls, trail: Union[TrailArray, Sequence[Dict[Text, Any]]], cell_size_m: float = 100.0
+                   ) -> "TrailSpatialIndex":
+        """
+        This method builds the index over the points of a trail, given as a TrailArray or a list of trail point dicts.
+        """
+        trail_array = trail if isinstance(trail, TrailArray) else TrailArray.from_trail(trail)
+        return cls(trail_array.latitudes, trail_array.longitudes, cell_size_m=cell_size_m)
+
+    def __len__(self) -> int:
+        return len(self.latitudes)
+
+    @staticmethod
+    def _cell_keys(cell_x: np.ndarray, cell_y: np.ndarray) -> np.ndarray:
+        return (cell_x.astype(np.int64) + _CELL_OFFSET) * 2 ** 32 + (cell_y.astype(np.int64) + _CELL_OFFSET)
+
+    def _candidates(self, min_x: float, min_y: float, max_x: float, max_y: float) -> np.ndarray:
+        """
+        This method returns the indices of the points in the grid cells overlapping the given cartesian box. The box
+        may extend past the antimeridian (|x| > half the world width), the part past it is looked up on the other side.
+        """
+        if max_x - min_x >= 2 * _HALF_WORLD_X:
+            return self._candidates_within(-_HALF_WORLD_X, min_y, _HALF_WORLD_X, max_y)
+        if min_x < -_HALF_WORLD_X:
+            parts = [(min_x + 2 * _HALF_WORLD_X, _HALF_WORLD_X), (-_HALF_WORLD_X, max_x)]
+        elif max_x > _HALF_WORLD_X:
+            parts = [(min_x, _HALF_WORLD_X), (-_HALF_WORLD_X, max_x - 2 * _HALF_WORLD_X)]
+        else:
+            return self._candidates_within(min_x, min_y, max_x, max_y)
+        # The cell slack of the scan can find a point near the antimeridian in both parts
+        return np.unique(np.concatenate([
+            self._candidates_within(part_min_x, min_y, part_max_x, max_y) for part_min_x, part_max_x in parts
+        ]))
+
+    def _candidates_within(self, min_x: float, min_y: float, max_x: float, max_y: float) -> np.ndarray:
+        """
+        This method returns the indices of the points in the grid cells overlapping a cartesian box within the world.
+        """
+        cell_x = np.arange(math.floor(min_x / self.cell_size), math.floor(max_x / self.cell_size) + 1)
+        cell_y = np.arange(math.floor(min_y / self.cell_size), math.floor(max_y / self.cell_size) + 1)
+        if len(cell_x) * len(cell_y) > len(self.cells):
+            # The box covers more cells than are occupied, scanning the points is cheaper. A cell of slack keeps this a
+            # superset of the cell lookup.
+            inside = (
+                (min_x <= self.x + self.cell_size) & (self.x - self.cell_size <= max_x) &
+                (min_y <= self.y + self.cell_size) & (self.y - self.cell_size <= max_y)
+            )
+            return np.flatnonzero(inside)
+        keys = self._cell_keys(np.repeat(cell_x, len(cell_y)), np.tile(cell_y, len(cell_x)))
+        slices = [self.cells[key] for key in keys.tolist() if key in self.cells]
+        if len(slices) == 0:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([self.order[start:end] for start, end in slices])
+
+    def distances_m(self, latitude: float, longitude: float, idx: np.ndarray) -> np.ndarray:
+        """
+        This method returns the haversine distances in metres from a location to the indexed points at idx.
+        """
+        return pairwise_haversine(
+            np.full(len(idx), latitude), np.full(len(idx), longitude), self.latitudes[idx], self.longitudes[idx]
+        ) * 1000
+
+    def radius(self, latitude: float, longitude: float, radius_m: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        This method returns the indices of the points within radius_m metres of a location, nearest first, along with
+        their distances in metres.
+        """
+        # Largest Web Mercator stretch over the latitudes the radius can reach
+        max_abs_latitude = min(abs(latitude) + radius_m / _METRES_PER_DEGREE_LATITUDE, 89.9)
+        projected_radius = _EXTENT_MARGIN * radius_m / math.cos(math.radians(max_abs_latitude))
+        x, y = OSMUtils.get_cartesian_point(latitude=latitude, longitude=longitude)
+        idx = self._candidates(x - projected_radius, y - projected_radius, x + projected_radius, y + projected_radius)
+        distances = self.distances_m(latitude, longitude, idx)
+        within = distances <= radius_m
+        idx, distances = idx[within], distances[within]
+        order = np.argsort(distances, kind="stable")
+        return idx[order], distances[order]
+
+    def nearest(self, latitude: float, longitude: float, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        This method returns the indices of the k points nearest to a location, nearest first, along with their
+        distances in metres. The search radius starts at a cell and doubles until k points are found.
+        """
+        k = min(k, len(self))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        radius_m = self.cell_size * math.cos(math.radians(latitude))
+        while True:
+            idx, distances = self.radius(latitude, longitude, radius_m)
+            if len(idx) >= k:
+                return idx[:k], distances[:k]
+            # Half the circumference covers every point on the planet
+            if radius_m > math.pi * 6371000:
+                break
+            radius_m *= 2
+        idx = np.arange(len(self))
+        distances = self.distances_m(latitude, longitude, idx)
+        order = np.argsort(distances, kind="stable")[:k]
+        return idx[order], distances[order]
+
+    def bbox(self, min_latitude: float, min_longitude: float, max_latitude: float, max_longitude: float
+             ) -> np.ndarray:
+        """
+        This method returns the sorted indices of the points within a bounding box. A box whose min_longitude is
+        greater than its max_longitude crosses the antimeridian, from min_longitude eastwards to max_longitude.
+        """
+        min_x, min_y = OSMUtils.get_cartesian_point(latitude=min_latitude, longitude=min_longitude)
+        max_x, max_y = OSMUtils.get_cartesian_point(latitude=max_latitude, longitude=max_longitude)
+        crosses_antimeridian = min_longitude > max_longitude
+        if crosses_antimeridian:
+            max_x += 2 * _HALF_WORLD_X
+        idx = self._candidates(min_x, min_y, max_x, max_y)
+        latitudes, longitudes = self.latitudes[idx], self.longitudes[idx]
+        if crosses_antimeridian:
+            within_longitudes = (min_longitude <= longitudes) | (longitudes <= max_longitude)
+        else:
+            within_longitudes = (min_longitude <= longitudes) & (longitudes <= max_longitude)
+        inside = (min_latitude <= latitudes) & (latitudes <= max_latitude) & within_longitudes
+        return np.sort(idx[inside])
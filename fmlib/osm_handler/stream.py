@@ -0,0 +1,212 @@
+"""Streaming segmentation of NDJSON trip files."""
+import gzip
+import io
+import json
+import logging
+import resource
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Sequence, Text, Tuple, Union
+
+from .segmentation_pool import SegmentationPool
+from .trip_segments import TripSegmenter
+
+log = logging.getLogger(__name__)
+
+GZIP_MAGIC = b"\x1f\x8b"
+READ_BUFFER_SIZE = 1024 * 1024
+
+Boundaries = Sequence[Tuple[int, int]]
+
+
+def open_trip_stream(source: Union[str, BinaryIO, Any]) -> BinaryIO:
+    """
+    This method opens a binary stream of NDJSON trips, from a file path or any readable binary stream (e.g. the Body of
+    an S3 get_object response). Gzip compressed content is detected and decompressed transparently.
+    """
+    if isinstance(source, str):
+        stream = open(source, "rb", buffering=READ_BUFFER_SIZE)
+    elif hasattr(source, "readinto"):
+        # Binary file objects, e.g. open files or BytesIO, are buffered as they are
+        stream = io.BufferedReader(source, buffer_size=READ_BUFFER_SIZE)
+    else:
+        # Streams with only a read method, e.g. a botocore StreamingBody. Imported here, so that only S3 sources need
+        # the storage requirements
+        from ..storage.streaming import _S3BodyStream
+        stream = io.BufferedReader(_S3BodyStream(source), buffer_size=READ_BUFFER_SIZE)
+    if stream.peek(len(GZIP_MAGIC))[:len(GZIP_MAGIC)] == GZIP_MAGIC:
+        return io.BufferedReader(gzip.GzipFile(fileobj=stream, mode="rb"), buffer_size=READ_BUFFER_SIZE)
+    return stream
+
+
+def iter_ndjson(stream: BinaryIO) -> Iterator[Dict[Text, Any]]:
+    """
+    This method yields the JSON documents of an NDJSON stream, one line at a time. Blank lines are skipped.
+    """
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+@dataclass
+class StreamStats:
+    """
+    Statistics of a streaming segmentation run.
+    peak_rss_growth_mb is how much the run raised the peak RSS of the current process, which is 0 if it stayed below
+    the peak the process had already reached. worker_peak_rss_mb is the largest peak RSS of the worker processes, 0
+    when segmenting in the current process. It is read from the child processes waited for, so it is an upper bound
+    when an earlier child process of the caller peaked higher.
+    """
+    trips: int = 0
+    failed_trips: int = 0
+    segments: int = 0
+    bytes_written: int = 0
+    elapsed_s: float = 0.0
+    peak_rss_growth_mb: float = 0.0
+    worker_peak_rss_mb: float = 0.0
+
+    @property
+    def trips_per_s(self) -> float:
+        return self.trips / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+    @property
+    def segments_per_s(self) -> float:
+        return self.segments / self.elapsed_s if self.elapsed_s > 0 else 0.0
+
+
+def _peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    """
+    This method returns the peak resident set size, in MB, of the process since it started, or with
+    resource.RUSAGE_CHILDREN of the largest of its child processes waited for.
+    """
+    peak_rss = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak_rss / (1024 * 1024) if sys.platform == "darwin" else peak_rss / 1024
+
+
+def to_ndjson(datapoints: List[Dict[Text, Any]]) -> bytes:
+    """
+    This method serializes datapoints to NDJSON lines.
+    """
+    return b"".join(json.dumps(datapoint).encode() + b"\n" for datapoint in datapoints)
+
+
+def segment_ndjson(
+        source: Union[str, BinaryIO, Any],
+        sink: BinaryIO,
+        get_boundaries: Callable[[Dict[Text, Any]], Boundaries],
+        minimum_distance_km_to_interpolate: float,
+        minimum_seconds_to_interpolate: float,
+        processes: int = 1,
+        skip_errors: bool = False
+) -> StreamStats:
+    """
+    This method segments the trips of an NDJSON stream and writes the segment datapoints to the sink, as NDJSON.
+    Trips are read, segmented and written one at a time (or a bounded number at a time over processes), so memory does
+    not grow with the size of the file.
+
+    param source: File path or readable binary stream (e.g. an S3 object Body) of parent datapoints, optionally gzipped
+    param sink: Binary stream the segment datapoints are written to
+    param get_boundaries: Returns the (segment_timestamp, segment_timestamp_end) of the segments of a parent datapoint
+    param minimum_distance_km_to_interpolate: Minimum distance in kms between two trail points to interpolate
+    param minimum_seconds_to_interpolate: Minimum duration in seconds between two trail points to interpolate
+    param processes: Number of processes to segment with. Defaults to segmenting in the current process.
+    param skip_errors: If True, trips failing to parse, to get their boundaries or to segment are logged and counted
+    in failed_trips instead of raising
+    return: Counts, throughput and peak RSS growth of the run
+
+    Example Usage:
+        with open("segments.ndjson", "wb") as sink:
+            stats = segment_ndjson(
+                "trips.ndjson.gz", sink, get_boundaries=lambda trip: trip["segments"],
+                minimum_distance_km_to_interpolate=0.05, minimum_seconds_to_interpolate=5
+            )
+    """
+    stats = StreamStats()
+    start_time = time.monotonic()
+    start_peak_rss_mb = _peak_rss_mb()
+    stream = open_trip_stream(source)
+    try:
+        trips = _read_trips(stream, get_boundaries, skip_errors, stats)
+        for result in _segment_trips(
+            trips, minimum_distance_km_to_interpolate, minimum_seconds_to_interpolate, processes
+        ):
+            stats.trips += 1
+            if isinstance(result, Exception):
+                if not skip_errors:
+                    raise result
+                stats.failed_trips += 1
+                log.warning("Unable to segment a trip of the stream: %r", result)
+                continue
+            count_segments, lines = result
+            sink.write(lines)
+            stats.segments += count_segments
+            stats.bytes_written += len(lines)
+    finally:
+        stream.close()
+    stats.elapsed_s = time.monotonic() - start_time
+    stats.peak_rss_growth_mb = _peak_rss_mb() - start_peak_rss_mb
+    if processes > 1:
+        # The workers are waited for when the pool is closed, so their peak RSS is accounted for by now
+        stats.worker_peak_rss_mb = _peak_rss_mb(resource.RUSAGE_CHILDREN)
+    log.info(
+        "Segmented %d trips into %d segments in %.1fs (%.1f trips/s, %d failed), peak RSS growth %.1f MB, worker peak "
+        "RSS %.1f MB", stats.trips, stats.segments, stats.elapsed_s, stats.trips_per_s, stats.failed_trips,
+        stats.peak_rss_growth_mb, stats.worker_peak_rss_mb
+    )
+    return stats
+
+
+def _read_trips(
+        stream: BinaryIO,
+        get_boundaries: Callable[[Dict[Text, Any]], Boundaries],
+        skip_errors: bool,
+        stats: StreamStats
+) -> Iterator[Tuple[Dict[Text, Any], Boundaries]]:
+    """
+    This method yields the (parent datapoint, boundaries) of every trip of an NDJSON stream. With skip_errors, trips
+    failing to parse or to get their boundaries are logged and counted in the stats instead of raising.
+    """
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            parent_datapoint = json.loads(line)
+            boundaries = get_boundaries(parent_datapoint)
+        except Exception as e:
+            if not skip_errors:
+                raise
+            stats.trips += 1
+            stats.failed_trips += 1
+            log.warning("Unable to read the trip at line %d of the stream: %r", line_number, e)
+            continue
+        yield parent_datapoint, boundaries
+
+
+def _count_and_serialize(datapoints: List[Dict[Text, Any]]) -> Tuple[int, bytes]:
+    return len(datapoints), to_ndjson(datapoints)
+
+
+def _segment_trips(
+        trips: Iterable[Tuple[Dict[Text, Any], Boundaries]],
+        minimum_distance_km_to_interpolate: float,
+        minimum_seconds_to_interpolate: float,
+        processes: int
+) -> Iterator[Union[Tuple[int, bytes], Exception]]:
+    """
+    This method yields the (segment count, NDJSON lines) of every trip, or the exception it failed with, in order.
+    """
+    if processes > 1:
+        with SegmentationPool(
+            minimum_distance_km_to_interpolate, minimum_seconds_to_interpolate, processes=processes,
+            share_parent=True, postprocess=_count_and_serialize
+        ) as pool:
+            yield from pool.imap(trips, return_exceptions=True)
+        return
+    segmenter = TripSegmenter(minimum_distance_km_to_interpolate, minimum_seconds_to_interpolate, share_parent=True)
+    for parent_datapoint, boundaries in trips:
+        try:
+            yield _count_and_serialize(segmenter.split(parent_datapoint, boundaries))
+        except Exception as e:
+            yield e
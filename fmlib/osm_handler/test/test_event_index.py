@@ -0,0 +1,32 @@
+import json
+import random
+
+from fmlib.osm_handler import EventIndex, TripSegmenter
+from fmlib.osm_handler.benchmarks.synthetic import make_trip
+
+
+def test_events_are_sorted_by_timestamp_keeping_ties_in_order():
+    events = [
+        {"timestamp": 30, "timestampEnd": 30, "id": "c"},
+        {"timestamp": 10, "timestampEnd": 25, "id": "a"},
+        {"timestamp": 20, "timestampEnd": 40, "id": "b1"},
+        {"timestamp": 20, "timestampEnd": 20, "id": "b2"},
+    ]
+
+    event_index = EventIndex(events)
+
+    assert [event["id"] for event in event_index.events] == ["a", "b1", "b2", "c"]
+    assert event_index.timestamps.tolist() == [10, 20, 20, 30]
+    assert event_index.window(15, 30) == (1, 3)
+    assert event_index.window(31, 40) == (4, 3)
+    assert [event_index.events[i]["id"] for i in event_index.spanning(22)] == ["a", "b1"]
+    assert [event["id"] for event in events] == ["c", "a", "b1", "b2"]
+
+
+def test_split_does_not_depend_on_the_order_of_the_events():
+    parent_datapoint, boundaries = make_trip(300, events_per_hour=600, count_segments=4, seed=0)
+    shuffled = dict(parent_datapoint, events=list(parent_datapoint["events"]))
+    random.Random(0).shuffle(shuffled["events"])
+    segmenter = TripSegmenter(0.01, 1)
+
+    assert json.dumps(segmenter.split(shuffled, boundaries)) == json.dumps(segmenter.split(parent_datapoint, boundaries))
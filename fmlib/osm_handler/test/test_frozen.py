@@ -0,0 +1,118 @@
+import copy
+import json
+import pickle
+
+import pytest
+
+from fmlib.osm_handler import FrozenDict, FrozenList, TripSegmenter, freeze
+from fmlib.osm_handler.benchmarks.synthetic import make_trip
+
+
+def make_datapoint():
+    return {
+        "trip": {"id": "trip", "tags": ["a", "b"]},
+        "trail": [{"timestamp": i, "location": {"latitude": 1.0, "longitude": 2.0}} for i in range(3)],
+        "events": [],
+    }
+
+
+def nested_views(view):
+    """
+    This method returns the nested trail point and trail of a read-only datapoint, through every accessor.
+    """
+    trail = view["trail"]
+    return {
+        "getitem": view["trail"][0],
+        "negative index": trail[-1],
+        "get": view.get("trail")[1],
+        "values": view.values()[1][0],
+        "items": dict(view.items())["trail"][0],
+        "iter": next(iter(trail)),
+        "reversed": next(reversed(trail)),
+        "slice": trail[1:][0],
+        "dict copy": view.copy()["trail"][0],
+        "copy.copy": copy.copy(view)["trail"][0],
+        "dict()": dict(view)["trail"][0],
+        "unpacking": {**view}["trail"][0],
+        "or": (view | {})["trail"][0],
+        "ror": ({} | view)["trail"][0],
+        "list copy": trail.copy()[0],
+        "list copy.copy": copy.copy(trail)[0],
+        "list()": list(trail)[0],
+        "add": (trail + [])[0],
+        "radd": ([] + trail)[0],
+        "mul": (trail * 2)[0],
+        "rmul": (2 * trail)[0],
+        "location": trail[0]["location"],
+        "trip list": view["trip"]["tags"],
+    }
+
+
+@pytest.mark.parametrize("accessor", list(nested_views(freeze(make_datapoint()))))
+def test_nested_mutation_raises_through_every_accessor(accessor):
+    datapoint = make_datapoint()
+    nested = nested_views(freeze(datapoint))[accessor]
+
+    with pytest.raises(TypeError):
+        if isinstance(nested, list):
+            nested.append(1)
+        else:
+            nested["latitude"] = 0.0
+    assert datapoint == make_datapoint()
+
+
+def test_top_level_mutation_raises():
+    view = freeze(make_datapoint())
+    mutations = [
+        lambda: view.__setitem__("trip", None), lambda: view.pop("trip"), lambda: view.update({}),
+        lambda: view.setdefault("x", 1), lambda: view.clear(), lambda: view.__delitem__("trip"),
+        lambda: view["trail"].append(1), lambda: view["trail"].sort(), lambda: view["trail"].__setitem__(0, None),
+    ]
+    for mutation in mutations:
+        with pytest.raises(TypeError):
+            mutation()
+
+
+def test_nested_views_are_built_once():
+    view = freeze(make_datapoint())
+
+    assert view["trail"] is view["trail"]
+    assert view["trail"][1] is view["trail"][1] is view["trail"][-2]
+    assert isinstance(view["trail"], FrozenList)
+    assert isinstance(view["trail"][0], FrozenDict)
+
+
+def test_copies_are_mutable_at_the_top_level_only():
+    view = freeze(make_datapoint())
+
+    copied = view.copy()
+    copied["extra"] = 1
+    copied_trail = view["trail"].copy()
+    copied_trail.append(1)
+
+    assert "extra" not in view
+    assert len(view["trail"]) == 3
+
+
+def test_json_deepcopy_and_pickle():
+    datapoint = make_datapoint()
+    view = freeze(datapoint)
+
+    assert json.loads(json.dumps(view)) == datapoint
+    deep_copy = copy.deepcopy(view)
+    assert deep_copy == datapoint and type(deep_copy) is dict and type(deep_copy["trail"][0]) is dict
+    deep_copy["trail"][0]["location"]["latitude"] = 0.0
+    assert datapoint == make_datapoint()
+    unpickled = pickle.loads(pickle.dumps(view))
+    assert unpickled == datapoint and type(unpickled) is dict
+
+
+def test_read_only_segments_serialize_like_mutable_ones():
+    parent_datapoint, boundaries = make_trip(200, count_segments=3, seed=1)
+
+    expected = TripSegmenter(0.01, 1).split(parent_datapoint, boundaries)
+    read_only = TripSegmenter(0.01, 1, share_parent=True, read_only=True).split(parent_datapoint, boundaries)
+
+    assert json.dumps(read_only) == json.dumps(expected)
+    with pytest.raises(TypeError):
+        read_only[0]["trail"][0]["location"]["latitude"] = 0.0
@@ -0,0 +1,124 @@
+import json
+import logging
+
+import pytest
+
+from fmlib.osm_handler import LiveTripSegmenter, TripSegmenter
+from fmlib.osm_handler.benchmarks.synthetic import make_trip
+
+
+def without_trip_distance(datapoint):
+    """
+    This method returns a segment datapoint without the trip distance adjustment, which uses the trail received when
+    the segment is emitted.
+    """
+    return dict(datapoint, trip={
+        key: value for key, value in datapoint["trip"].items() if key not in ("distance", "averageSpeed")
+    })
+
+
+def feed(segmenter, parent_datapoint, boundaries, chunk_size):
+    """
+    This method feeds a trip in order, chunk_size trail points at a time, along with the events and the boundaries
+    starting up to the last of them, and returns the segment datapoints emitted after each update.
+    """
+    trail, events = parent_datapoint["trail"], parent_datapoint["events"]
+    other_keys = {key: value for key, value in parent_datapoint.items() if key not in ("trail", "events")}
+    emitted, count_boundaries, count_events = [], 0, 0
+    for i in range(0, len(trail), chunk_size):
+        chunk = trail[i:i + chunk_size]
+        last_timestamp = chunk[-1]["timestamp"]
+        start_boundaries, start_events = count_boundaries, count_events
+        while count_boundaries < len(boundaries) and boundaries[count_boundaries][0] <= last_timestamp:
+            count_boundaries += 1
+        while count_events < len(events) and events[count_events]["timestamp"] <= last_timestamp:
+            count_events += 1
+        emitted.append(segmenter.update(
+            dict(other_keys, trail=chunk, events=events[start_events:count_events]),
+            boundaries[start_boundaries:count_boundaries]
+        ))
+    emitted.append(segmenter.finish({"events": events[count_events:]}, boundaries[count_boundaries:]))
+    return emitted
+
+
+@pytest.mark.parametrize("seed, chunk_size", [(0, 1), (1, 7), (2, 50)])
+def test_in_order_feeds_match_split(seed, chunk_size):
+    parent_datapoint, boundaries = make_trip(400, events_per_hour=300, count_segments=5, seed=seed)
+    expected = json.loads(json.dumps(TripSegmenter(0.01, 1).split(parent_datapoint, boundaries)))
+    segmenter = LiveTripSegmenter(0.01, 1)
+
+    emitted = feed(segmenter, json.loads(json.dumps(parent_datapoint)), boundaries, chunk_size)
+
+    datapoints = json.loads(json.dumps([datapoint for datapoints in emitted for datapoint in datapoints]))
+    assert [without_trip_distance(datapoint) for datapoint in datapoints[:-1]] == [
+        without_trip_distance(datapoint) for datapoint in expected[:-1]
+    ]
+    assert datapoints[-1] == expected[-1]
+    # Segments are emitted as the trip goes on, rather than all at the end
+    assert len(emitted[-1]) < len(expected)
+    assert segmenter.late_trail_points == segmenter.late_events == 0
+    # Only the trail of the last segment is retained
+    assert len(segmenter._trail) < len(parent_datapoint["trail"]) / 2
+
+
+def test_late_trail_points_are_counted_and_logged(caplog):
+    parent_datapoint, boundaries = make_trip(100, events_per_hour=0, count_segments=2, seed=0)
+    trail = parent_datapoint["trail"]
+    segmenter = LiveTripSegmenter(0.01, 1)
+
+    assert segmenter.update({"trip": parent_datapoint["trip"], "trail": trail[:45]}, boundaries) == []
+    assert len(segmenter.update({"trail": trail[45:80]})) == 1
+    with caplog.at_level(logging.WARNING, logger="fmlib.osm_handler.live_segmenter"):
+        # The first point is older than the retained trail, the other one within the first segment is still retained
+        segmenter.update({"trail": [dict(trail[0], timestamp=trail[0]["timestamp"] - 1),
+                                    dict(trail[49], timestamp=trail[49]["timestamp"] + 1)]})
+        segmenter.update({"trail": [dict(trail[79], timestamp=trail[79]["timestamp"] + 1)]})
+
+    assert segmenter.late_trail_points == 2
+    assert segmenter.late_events == 0
+    assert [record.getMessage() for record in caplog.records] == [
+        "2 trail points and 0 events of the trip arrived after their segment was emitted"
+    ]
+    assert len(segmenter.finish({"trail": trail[80:]})) == 1
+
+
+def test_late_events_are_counted_and_logged(caplog):
+    parent_datapoint, boundaries = make_trip(100, events_per_hour=0, count_segments=2, seed=0)
+    trail = parent_datapoint["trail"]
+    segment_end = boundaries[0][1]
+    late_event = {"timestamp": segment_end - 5000, "timestampEnd": segment_end - 4000, "eventType": 1}
+    spanning_event = {"timestamp": segment_end - 3000, "timestampEnd": segment_end + 10000, "eventType": 2}
+    pending_event = {"timestamp": segment_end + 1000, "timestampEnd": segment_end + 2000, "eventType": 3}
+    segmenter = LiveTripSegmenter(0.01, 1)
+    segmenter.update({"trip": parent_datapoint["trip"], "trail": trail[:80]}, boundaries)
+
+    with caplog.at_level(logging.WARNING, logger="fmlib.osm_handler.live_segmenter"):
+        segmenter.update({"events": [late_event, spanning_event, pending_event]})
+
+    assert segmenter.late_events == 2
+    assert segmenter.late_trail_points == 0
+    assert [record.getMessage() for record in caplog.records] == [
+        "0 trail points and 2 events of the trip arrived after their segment was emitted"
+    ]
+    # The late event spanning into the last segment is still part of it
+    events = segmenter.finish({"trail": trail[80:]})[0]["events"]
+    assert [event["eventType"] for event in events] == [2, 3]
+
+
+def test_finish_emits_the_remaining_segments():
+    parent_datapoint, boundaries = make_trip(100, events_per_hour=300, count_segments=3, seed=3)
+    expected = TripSegmenter(0.01, 1).split(parent_datapoint, boundaries)
+    segmenter = LiveTripSegmenter(0.01, 1)
+
+    # No trail point past the end of the first segment has arrived yet, and the last segment is only known on finish
+    assert segmenter.update({"trail": parent_datapoint["trail"][:10]}, boundaries[:2]) == []
+    datapoints = segmenter.finish(parent_datapoint, boundaries[2:])
+
+    assert json.loads(json.dumps(datapoints[-1])) == json.loads(json.dumps(expected[-1]))
+    assert len(datapoints) == len(expected) == segmenter.count_emitted_segments
+    with pytest.raises(ValueError):
+        segmenter.finish()
+    with pytest.raises(ValueError):
+        segmenter.update({"trail": parent_datapoint["trail"][-1:]})
+    with pytest.raises(ValueError):
+        segmenter.add_segment(*boundaries[-1])
@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+
+from fmlib.osm_handler import OSMUtils
+from fmlib.osm_handler.osm_utils import ANALYTIC_BACKEND, WEB_MERCATOR_RADIUS
+
+pyproj = pytest.importorskip("pyproj")
+
+TOLERANCE_M = 1e-3
+
+# Web Mercator is only defined up to about 85.05 degrees of latitude
+LATITUDES = np.concatenate([np.linspace(-85.0, 85.0, 69), [-85.05, -1e-9, 0.0, 1e-9, 37.7749, 85.05]])
+LONGITUDES = np.concatenate([np.linspace(-180.0, 180.0, 73), [-122.4194, 1e-9, 179.999999]])
+
+
+@pytest.fixture(autouse=True)
+def analytic_backend():
+    backend = OSMUtils.backend
+    OSMUtils.set_backend(ANALYTIC_BACKEND)
+    yield
+    OSMUtils.set_backend(backend)
+
+
+@pytest.fixture(scope="module")
+def grid():
+    latitudes, longitudes = np.meshgrid(LATITUDES, LONGITUDES)
+    return latitudes.ravel(), longitudes.ravel()
+
+
+def ground_deviation_m(latitudes, longitudes, expected_latitudes, expected_longitudes):
+    """
+    This method returns the distance on the ground, in metres, between points and their expected positions.
+    """
+    return WEB_MERCATOR_RADIUS * np.radians(np.hypot(
+        np.asarray(latitudes) - expected_latitudes,
+        (np.asarray(longitudes) - expected_longitudes) * np.cos(np.radians(expected_latitudes))
+    ))
+
+
+def test_forward_many_matches_pyproj(grid):
+    latitudes, longitudes = grid
+    expected_x, expected_y = pyproj.Transformer.from_crs(4326, 3857).transform(latitudes, longitudes)
+    x, y = OSMUtils.to_cartesian_many(latitudes, longitudes)
+    assert np.hypot(x - expected_x, y - expected_y).max() < TOLERANCE_M
+
+
+def test_inverse_many_matches_pyproj(grid):
+    x, y = pyproj.Transformer.from_crs(4326, 3857).transform(*grid)
+    expected_latitudes, expected_longitudes = pyproj.Transformer.from_crs(3857, 4326).transform(x, y)
+    latitudes, longitudes = OSMUtils.to_spherical_many(x, y)
+    assert ground_deviation_m(latitudes, longitudes, expected_latitudes, expected_longitudes).max() < TOLERANCE_M
+
+
+def test_scalar_conversions_match_pyproj():
+    forward = pyproj.Transformer.from_crs(4326, 3857)
+    inverse = pyproj.Transformer.from_crs(3857, 4326)
+    for latitude in LATITUDES[::4]:
+        for longitude in LONGITUDES[::4]:
+            expected_x, expected_y = forward.transform(latitude, longitude)
+            x, y = OSMUtils.get_cartesian_point(latitude=latitude, longitude=longitude)
+            assert np.hypot(x - expected_x, y - expected_y) < TOLERANCE_M
+
+            expected_latitude, expected_longitude = inverse.transform(expected_x, expected_y)
+            inverse_latitude, inverse_longitude = OSMUtils.get_spherical_point((expected_x, expected_y))
+            assert ground_deviation_m(
+                inverse_latitude, inverse_longitude, expected_latitude, expected_longitude
+            ) < TOLERANCE_M
+
+
+def test_scalar_and_vectorized_conversions_agree(grid):
+    latitudes, longitudes = grid
+    x, y = OSMUtils.to_cartesian_many(latitudes, longitudes)
+    round_trip_latitudes, round_trip_longitudes = OSMUtils.to_spherical_many(x, y)
+    for i in range(0, len(latitudes), 97):
+        assert OSMUtils.get_cartesian_point(latitude=latitudes[i], longitude=longitudes[i]) == pytest.approx(
+            (x[i], y[i]), rel=1e-12, abs=1e-6
+        )
+        assert OSMUtils.get_spherical_point((x[i], y[i])) == pytest.approx(
+            (round_trip_latitudes[i], round_trip_longitudes[i]), rel=1e-12, abs=1e-12
+        )
+    assert ground_deviation_m(round_trip_latitudes, round_trip_longitudes, latitudes, longitudes).max() < TOLERANCE_M
+
+
+def sampled_tiles(latitudes, longitudes, zoom, count_samples=100_000):
+    """
+    This method returns the tiles of points sampled densely along the legs of a trail, going the short way round.
+    """
+    tiles = set()
+    for i in range(len(latitudes) - 1):
+        delta = (longitudes[i + 1] - longitudes[i] + 180.0) % 360.0 - 180.0
+        x, y = OSMUtils.deg2num_fractional(
+            np.full(count_samples, latitudes[i]) + np.linspace(0.0, 1.0, count_samples) * (
+                latitudes[i + 1] - latitudes[i]),
+            (longitudes[i] + np.linspace(0.0, 1.0, count_samples) * delta + 180.0) % 360.0 - 180.0,
+            zoom
+        )
+        tiles.update(zip(np.floor(x).astype(int).tolist(), np.floor(y).astype(int).tolist()))
+    return tiles
+
+
+@pytest.mark.parametrize("longitudes", [(179.9, -179.9), (-179.9, 179.9), (179.99, -179.99, 179.98), (10.0, 10.02)])
+def test_tiles_for_trail_goes_the_short_way_round(longitudes):
+    zoom = 18
+    latitudes = np.linspace(37.0, 37.01, len(longitudes))
+    trail = [
+        {"timestamp": i, "location": {"latitude": latitude, "longitude": longitude}}
+        for i, (latitude, longitude) in enumerate(zip(latitudes, longitudes))
+    ]
+
+    tiles = OSMUtils.tiles_for_trail(trail, zoom)
+
+    assert len(tiles) < 200
+    # The samples can miss the corners a leg barely clips, so they are a subset of the tiles
+    assert sampled_tiles(latitudes, np.asarray(longitudes), zoom) <= set(map(tuple, tiles.tolist()))
+    if abs(longitudes[0]) > 179.0:
+        assert {0, 2 ** zoom - 1} <= set(tiles[:, 0].tolist())
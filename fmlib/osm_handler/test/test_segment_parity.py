@@ -0,0 +1,117 @@
+"""
+Parity of the segmentation with the segment datapoints recorded in segment_parity.json, produced segment by segment by
+BaseSegment before the trail was moved to columnar arrays. Values must keep their types, and floats may only differ by
+rounding, as interpolations are now computed with numpy.
+"""
+import copy
+import json
+import math
+import os
+import subprocess
+import sys
+
+import pytest
+
+from fmlib.osm_handler import BaseSegment, PreparedTrip, TripSegmenter, segment_core
+
+with open(os.path.join(os.path.dirname(__file__), "segment_parity.json")) as f:
+    FIXTURES = json.load(f)
+
+CORE_PATHS = [
+    False,
+    pytest.param(True, marks=pytest.mark.skipif(
+        not segment_core.ACCELERATED_CORE_AVAILABLE, reason="numba is not installed"
+    )),
+]
+
+
+# Distances are now differences of cumulative distances along the whole trip, which round differently from summing the
+# legs of the segment: they are compared up to a millionth of their unit
+DISTANCE_KEYS = ("distance", "averageSpeed")
+
+
+def assert_matches(value, expected, path="datapoint"):
+    """
+    This method asserts that a value matches the expected one, with the same types, and floats equal up to rounding.
+    """
+    assert type(value) is type(expected), path
+    if isinstance(expected, float):
+        abs_tol = 1e-6 if path.rsplit(".", 1)[-1] in DISTANCE_KEYS else 1e-12
+        assert math.isclose(value, expected, rel_tol=1e-9, abs_tol=abs_tol), path
+    elif isinstance(expected, dict):
+        assert list(value) == list(expected), path
+        for key in expected:
+            assert_matches(value[key], expected[key], f"{path}.{key}")
+    elif isinstance(expected, list):
+        assert len(value) == len(expected), path
+        for i, (item, expected_item) in enumerate(zip(value, expected)):
+            assert_matches(item, expected_item, f"{path}[{i}]")
+    else:
+        assert value == expected, path
+
+
+def case_id(case):
+    return (
+        f"trip{case['trip']}-{len(case['boundaries'])}segments-"
+        f"{case['minimum_distance_km_to_interpolate']}km-{case['minimum_seconds_to_interpolate']}s"
+    )
+
+
+def to_plain(value):
+    """
+    This method converts read-only datapoints back to plain dicts and lists.
+    """
+    return json.loads(json.dumps(value))
+
+
+@pytest.fixture
+def core_path(request):
+    enabled = segment_core.is_accelerated_core_enabled()
+    segment_core.set_accelerated_core(request.param)
+    yield request.param
+    segment_core.set_accelerated_core(enabled)
+
+
+@pytest.mark.parametrize("case", FIXTURES["cases"], ids=case_id)
+def test_base_segment_matches_recorded_datapoints(case):
+    parent_datapoint = copy.deepcopy(FIXTURES["trips"][case["trip"]])
+    boundaries = case["boundaries"]
+    for i, ((segment_timestamp, segment_timestamp_end), expected) in enumerate(zip(boundaries, case["segments"])):
+        segment = BaseSegment(
+            parent_datapoint, segment_timestamp, segment_timestamp_end, i == 0, i == len(boundaries) - 1,
+            case["minimum_distance_km_to_interpolate"], case["minimum_seconds_to_interpolate"]
+        )
+        if "error" in expected:
+            with pytest.raises(Exception, match=expected["error"]):
+                segment.get_updated_trip_datapoint()
+        else:
+            assert_matches(to_plain(segment.get_updated_trip_datapoint()), expected["datapoint"])
+    assert parent_datapoint == FIXTURES["trips"][case["trip"]]
+
+
+@pytest.mark.parametrize("core_path", CORE_PATHS, indirect=True, ids=["pure_python", "compiled"])
+@pytest.mark.parametrize("case", FIXTURES["cases"], ids=case_id)
+def test_trip_segmenter_matches_recorded_datapoints(case, core_path):
+    segmenter = TripSegmenter(case["minimum_distance_km_to_interpolate"], case["minimum_seconds_to_interpolate"])
+    prepared_trip = PreparedTrip(copy.deepcopy(FIXTURES["trips"][case["trip"]]))
+    errors = [expected["error"] for expected in case["segments"] if "error" in expected]
+    if errors:
+        # A trip fails on its first segment that cannot be located
+        with pytest.raises(Exception, match=errors[0]):
+            segmenter.split(prepared_trip, case["boundaries"])
+    else:
+        assert_matches(
+            to_plain(segmenter.split(prepared_trip, case["boundaries"])),
+            [expected["datapoint"] for expected in case["segments"]]
+        )
+
+
+def test_compiled_core_is_enabled_when_available_and_imported_lazily():
+    # A fresh interpreter, so the default is not changed by the other tests and numba is not already imported
+    code = (
+        "import sys\n"
+        "from fmlib.osm_handler import segment_core\n"
+        "assert segment_core.is_accelerated_core_enabled() is segment_core.ACCELERATED_CORE_AVAILABLE\n"
+        "assert 'numba' not in sys.modules\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=os.path.join(os.path.dirname(__file__), "../../.."))
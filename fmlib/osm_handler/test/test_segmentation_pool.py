@@ -0,0 +1,35 @@
+import json
+
+from fmlib.osm_handler import PreparedTrip, SegmentationPool, TripSegmenter
+from fmlib.osm_handler.benchmarks.synthetic import make_trip
+
+
+def make_uneven_trip(seed: int):
+    """
+    This method returns a synthetic trip whose trail points do not all have the same keys.
+    """
+    parent_datapoint, boundaries = make_trip(300, count_segments=5, seed=seed)
+    for i, point in enumerate(parent_datapoint["trail"]):
+        if i % 3 == 0:
+            del point["speed"]
+        if i % 4 == 0:
+            del point["location"]["accuracy"]
+        if i % 5 == 0:
+            point["provider"] = "gps"
+    return parent_datapoint, boundaries
+
+
+def test_pool_matches_segmenter_with_uneven_trail_keys():
+    trips = [make_uneven_trip(seed) for seed in range(4)]
+    segmenter = TripSegmenter(minimum_distance_km_to_interpolate=0.01, minimum_seconds_to_interpolate=1)
+    expected = [segmenter.split(PreparedTrip(parent_datapoint), boundaries) for parent_datapoint, boundaries in trips]
+
+    with SegmentationPool(0.01, 1, processes=2) as pool:
+        # Prepared trips are sent to the workers as pickled TrailArrays
+        results = list(pool.imap((PreparedTrip(parent_datapoint), boundaries) for parent_datapoint, boundaries in trips))
+
+    assert json.loads(json.dumps(results)) == json.loads(json.dumps(expected))
+    trail = [point for datapoints in results for datapoint in datapoints for point in datapoint["trail"]]
+    assert any("speed" not in point for point in trail)
+    assert any("accuracy" not in point["location"] for point in trail)
+    assert all(type(point.get("speed", 0.0)) is float for point in trail)
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from fmlib.osm_handler import TrailSpatialIndex
+from fmlib.osm_handler.haversine_distance import pairwise_haversine
+
+
+def make_points(center_longitude, count=2000, seed=0):
+    """
+    This method returns random points within about 10 km of a location at latitude 60, with their longitudes wrapped
+    into [-180, 180).
+    """
+    rng = np.random.default_rng(seed)
+    latitudes = 60.0 + rng.uniform(-0.1, 0.1, count)
+    longitudes = (center_longitude + rng.uniform(-0.2, 0.2, count) + 180.0) % 360.0 - 180.0
+    return latitudes, longitudes
+
+
+def brute_force_distances_m(latitudes, longitudes, latitude, longitude):
+    count = len(latitudes)
+    return pairwise_haversine(np.full(count, latitude), np.full(count, longitude), latitudes, longitudes) * 1000
+
+
+# Queries around a point of the Atlantic, and on either side of the antimeridian
+CASES = [(-30.0, -30.0), (180.0, 179.99), (180.0, -179.99), (180.0, 180.0), (180.0, -180.0)]
+
+
+@pytest.mark.parametrize("center_longitude, query_longitude", CASES)
+@pytest.mark.parametrize("cell_size_m", [50.0, 1000.0])
+def test_radius_matches_brute_force(center_longitude, query_longitude, cell_size_m):
+    latitudes, longitudes = make_points(center_longitude)
+    index = TrailSpatialIndex(latitudes, longitudes, cell_size_m=cell_size_m)
+    distances = brute_force_distances_m(latitudes, longitudes, 60.0, query_longitude)
+
+    for radius_m in (10.0, 300.0, 2000.0, 20000.0):
+        idx, idx_distances = index.radius(60.0, query_longitude, radius_m)
+        assert sorted(idx.tolist()) == np.flatnonzero(distances <= radius_m).tolist()
+        assert np.all(np.diff(idx_distances) >= 0)
+        assert idx_distances == pytest.approx(distances[idx])
+
+
+@pytest.mark.parametrize("center_longitude, query_longitude", CASES)
+def test_nearest_matches_brute_force(center_longitude, query_longitude):
+    latitudes, longitudes = make_points(center_longitude)
+    index = TrailSpatialIndex(latitudes, longitudes, cell_size_m=100.0)
+    distances = brute_force_distances_m(latitudes, longitudes, 60.0, query_longitude)
+
+    for k in (1, 5, 50):
+        idx, idx_distances = index.nearest(60.0, query_longitude, k=k)
+        assert idx.tolist() == np.argsort(distances, kind="stable")[:k].tolist()
+        assert idx_distances == pytest.approx(np.sort(distances)[:k])
+    # Far from every point
+    idx, _ = index.nearest(0.0, query_longitude + 90.0, k=3)
+    assert idx.tolist() == np.argsort(brute_force_distances_m(latitudes, longitudes, 0.0, query_longitude + 90.0),
+                                      kind="stable")[:3].tolist()
+
+
+def test_points_across_the_antimeridian_are_neighbours():
+    index = TrailSpatialIndex([60.0, 60.0, 60.0], [179.9999, -179.9999, 0.0], cell_size_m=10.0)
+
+    idx, distances = index.nearest(60.0, 179.9999, k=2)
+
+    assert idx.tolist() == [0, 1]
+    assert distances[1] < 15.0
+    assert index.radius(60.0, -179.9999, 15.0)[0].tolist() == [1, 0]
+
+
+@pytest.mark.parametrize("center_longitude, box", [
+    (-30.0, (59.95, -30.1, 60.05, -29.95)),
+    (180.0, (59.95, 179.9, 60.05, 180.0)),
+    (180.0, (59.95, -180.0, 60.05, -179.95)),
+    # Across the antimeridian, from 179.95 eastwards to -179.9
+    (180.0, (59.9, 179.95, 60.05, -179.9)),
+    (180.0, (-85.0, 0.0, 85.0, -0.01)),
+])
+def test_bbox_matches_brute_force(center_longitude, box):
+    latitudes, longitudes = make_points(center_longitude)
+    index = TrailSpatialIndex(latitudes, longitudes, cell_size_m=100.0)
+    min_latitude, min_longitude, max_latitude, max_longitude = box
+    if min_longitude <= max_longitude:
+        within_longitudes = (min_longitude <= longitudes) & (longitudes <= max_longitude)
+    else:
+        within_longitudes = (min_longitude <= longitudes) | (longitudes <= max_longitude)
+    expected = np.flatnonzero((min_latitude <= latitudes) & (latitudes <= max_latitude) & within_longitudes)
+
+    idx = index.bbox(*box)
+
+    assert len(expected) > 0
+    assert idx.tolist() == expected.tolist()
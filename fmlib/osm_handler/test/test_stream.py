@@ -0,0 +1,92 @@
+import io
+import json
+
+import pytest
+
+from fmlib.osm_handler import TripSegmenter, segment_ndjson
+from fmlib.osm_handler.benchmarks.synthetic import make_trip
+
+
+def make_stream(seeds=(0, 1)):
+    """
+    This method returns the NDJSON of synthetic trips, with their boundaries under "segments", and the segment
+    datapoints they are expected to be split into.
+    """
+    segmenter = TripSegmenter(minimum_distance_km_to_interpolate=0.01, minimum_seconds_to_interpolate=1,
+                              share_parent=True)
+    lines, expected = [], []
+    for seed in seeds:
+        parent_datapoint, boundaries = make_trip(200, count_segments=3, seed=seed)
+        parent_datapoint["segments"] = boundaries
+        lines.append(json.dumps(parent_datapoint))
+        expected.extend(segmenter.split(parent_datapoint, boundaries))
+    return lines, json.loads(json.dumps(expected))
+
+
+def get_boundaries(parent_datapoint):
+    return parent_datapoint["segments"]
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_segment_ndjson_skips_failing_trips(processes):
+    lines, expected = make_stream()
+    broken = [
+        "{not json",
+        json.dumps({"trail": []}),
+        json.dumps({"segments": [[0, 1]]}),
+    ]
+    source = io.BytesIO("\n".join([lines[0], *broken, "", lines[1]]).encode())
+    sink = io.BytesIO()
+
+    stats = segment_ndjson(source, sink, get_boundaries, 0.01, 1, processes=processes, skip_errors=True)
+
+    assert (stats.trips, stats.failed_trips, stats.segments) == (5, 3, len(expected))
+    assert [json.loads(line) for line in sink.getvalue().splitlines()] == expected
+
+
+@pytest.mark.parametrize("line", ["{not json", json.dumps({"trail": []}), json.dumps({"segments": [[0, 1]]})])
+def test_segment_ndjson_raises_without_skip_errors(line):
+    lines, _ = make_stream(seeds=(0,))
+    source = io.BytesIO("\n".join([lines[0], line]).encode())
+
+    with pytest.raises(Exception):
+        segment_ndjson(source, io.BytesIO(), get_boundaries, 0.01, 1)
+
+
+def test_segment_ndjson_reads_streams_without_readinto():
+    pytest.importorskip("boto3")
+
+    class Body:
+        """
+        A stream with only read and close, like a botocore StreamingBody.
+        """
+        def __init__(self, data: bytes):
+            self._stream = io.BytesIO(data)
+
+        def read(self, size=-1):
+            return self._stream.read(size)
+
+        def close(self):
+            self._stream.close()
+
+    lines, expected = make_stream()
+    sink = io.BytesIO()
+
+    stats = segment_ndjson(Body("\n".join(lines).encode()), sink, get_boundaries, 0.01, 1)
+
+    assert (stats.trips, stats.failed_trips) == (2, 0)
+    assert [json.loads(line) for line in sink.getvalue().splitlines()] == expected
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_segment_ndjson_reports_the_peak_rss_of_the_run_and_of_the_workers(processes):
+    lines, _ = make_stream()
+
+    stats = segment_ndjson(io.BytesIO("\n".join(lines).encode()), io.BytesIO(), get_boundaries, 0.01, 1,
+                           processes=processes)
+
+    assert stats.peak_rss_growth_mb >= 0.0
+    if processes > 1:
+        assert stats.worker_peak_rss_mb > 0.0
+    else:
+        assert stats.worker_peak_rss_mb == 0.0
@@ -0,0 +1,69 @@
+import pickle
+
+from fmlib.osm_handler import PreparedTrip, TrailArray, TripSegmenter
+from fmlib.osm_handler.benchmarks.synthetic import make_trip
+
+
+def assert_same_types(value, expected):
+    """
+    This method asserts that two trail points are equal, with every value of the same type.
+    """
+    assert type(value) is type(expected)
+    if isinstance(expected, dict):
+        assert list(value) == list(expected)
+        for key in expected:
+            assert_same_types(value[key], expected[key])
+    else:
+        assert value == expected
+
+
+def make_mixed_trail():
+    """
+    This method returns a trail mixing integers and floats in its timestamps, coordinates and other fields.
+    """
+    return [
+        {"timestamp": 1000, "location": {"latitude": 37, "longitude": -122.5, "accuracy": 5}, "speed": 0},
+        {"timestamp": 2000.0, "location": {"latitude": 37.001, "longitude": -122, "accuracy": 4.5}, "speed": 1.5},
+        {"timestamp": 3000, "location": {"latitude": 37.002, "longitude": -122.499}, "speed": 2, "provider": "gps"},
+    ]
+
+
+def test_to_dicts_keeps_value_types():
+    trail = make_mixed_trail()
+    trail_array = TrailArray.from_trail(trail)
+    for value, expected in zip(trail_array.to_dicts(), trail):
+        assert_same_types(value, expected)
+    for value, expected in zip(pickle.loads(pickle.dumps(trail_array)).to_dicts_at([2, 0]), [trail[2], trail[0]]):
+        assert_same_types(value, expected)
+
+
+def test_columns_are_typed_only_when_they_round_trip():
+    trail_array = TrailArray.from_trail(make_mixed_trail())
+    assert trail_array.timestamps.dtype.kind == "f"
+    assert trail_array.extras["speed"].dtype == object
+    assert set(trail_array.exact_values) == {"timestamp", "latitude", "longitude"}
+
+    parent_datapoint, _ = make_trip(10)
+    trail_array = TrailArray.from_trail(parent_datapoint["trail"])
+    assert trail_array.timestamps.dtype.kind == "i"
+    assert trail_array.extras["speed"].dtype.kind == "f"
+    assert trail_array.exact_values == {}
+
+
+def test_segment_trail_points_keep_value_types():
+    parent_datapoint, boundaries = make_trip(120, count_segments=3)
+    for i, point in enumerate(parent_datapoint["trail"]):
+        if i % 2 == 0:
+            point["speed"] = round(point["speed"])
+            point["location"]["accuracy"] = round(point["location"]["accuracy"])
+    trail_points = {point["timestamp"]: point for point in parent_datapoint["trail"]}
+
+    segmenter = TripSegmenter(minimum_distance_km_to_interpolate=0.0, minimum_seconds_to_interpolate=0.0)
+    datapoints = segmenter.split(PreparedTrip(parent_datapoint), boundaries)
+    count_checked = 0
+    for datapoint in datapoints:
+        for point in datapoint["trail"]:
+            if point["timestamp"] in trail_points:
+                assert_same_types(point, trail_points[point["timestamp"]])
+                count_checked += 1
+    assert count_checked >= len(trail_points) - len(boundaries)
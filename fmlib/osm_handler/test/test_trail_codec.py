@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from fmlib.osm_handler import TripSegmenter, decode_datapoint_trail, decode_trail, encode_trail
+from fmlib.osm_handler.benchmarks.synthetic import make_trip
+
+
+def typed(value):
+    """
+    This method returns a value with the type of every number spelled out, so that 1 and 1.0 compare different.
+    """
+    return json.loads(json.dumps(value), parse_int=lambda x: ("int", x), parse_float=lambda x: ("float", x))
+
+
+def make_mixed_trail():
+    return [
+        {"timestamp": 1000, "location": {"latitude": 37, "longitude": -122.4194155, "accuracy": 5}, "speed": 1},
+        {"timestamp": 2000.0, "location": {"latitude": 37.7749295, "longitude": -122}, "speed": 2.5},
+        {"timestamp": 3000, "location": {"latitude": 37.77493, "longitude": -122.41942, "accuracy": 4.5}},
+        {"timestamp": 4000, "location": {"latitude": 37.774931234567, "longitude": -122.419421234567},
+         "provider": "gps"},
+    ]
+
+
+def test_lossless_round_trip_keeps_types():
+    trail = make_mixed_trail()
+
+    assert typed(decode_trail(encode_trail(trail, precision=None)).to_dicts()) == typed(trail)
+
+
+def test_non_integer_timestamps_round_trip():
+    trail = [
+        {"timestamp": 1000.25, "location": {"latitude": 1.5, "longitude": 2.5}},
+        {"timestamp": 1000.5, "location": {"latitude": 1.6, "longitude": 2.6}},
+    ]
+
+    assert typed(decode_trail(encode_trail(trail)).to_dicts()) == typed(trail)
+
+
+def test_precision_rounds_coordinates_only():
+    trail = make_mixed_trail()
+
+    decoded = decode_trail(encode_trail(trail, precision=5)).to_dicts()
+
+    assert [point["timestamp"] for point in decoded] == [point["timestamp"] for point in trail]
+    assert [type(point["timestamp"]) for point in decoded] == [int, float, int, int]
+    assert decoded[3]["location"]["latitude"] == 37.77493
+    assert decoded[3]["location"]["longitude"] == -122.41942
+
+
+@pytest.mark.parametrize("precision", [-1, 16, 2.5, True, "7"])
+def test_invalid_precision_raises(precision):
+    with pytest.raises(ValueError):
+        encode_trail(make_mixed_trail(), precision=precision)
+    with pytest.raises(ValueError):
+        TripSegmenter(0.01, 1, encode_trail=True, trail_precision=precision)
+
+
+def test_segmenter_encodes_trails_losslessly():
+    parent_datapoint, boundaries = make_trip(300, count_segments=4, seed=3)
+    for i, point in enumerate(parent_datapoint["trail"]):
+        if i % 2 == 0:
+            point["timestamp"] = float(point["timestamp"])
+        if i % 3 == 0:
+            point["location"]["latitude"] = int(point["location"]["latitude"])
+
+    expected = TripSegmenter(0.01, 1).split(parent_datapoint, boundaries)
+    encoded = TripSegmenter(0.01, 1, encode_trail=True).split(parent_datapoint, boundaries)
+
+    assert all(isinstance(datapoint["trail"], str) for datapoint in encoded)
+    assert typed([decode_datapoint_trail(datapoint) for datapoint in encoded]) == typed(expected)
@@ -0,0 +1,235 @@
+from typing import Any, Dict, List, Optional, Sequence, Text, Tuple, Union
+
+import numpy as np
+
+from .haversine_distance import haversine_dist_array
+
+
+class _Missing:
+    """
+    Marker of a key missing from a trail point. It pickles by reference, so it is still _MISSING once a TrailArray is
+    sent to another process.
+    """
+    __slots__ = ()
+
+    def __reduce__(self) -> str:
+        return "_MISSING"
+
+    def __repr__(self) -> str:
+        return "_MISSING"
+
+
+_MISSING = _Missing()
+
+
+def _to_column(values: List[Any]) -> np.ndarray:
+    """
+    This method packs a list of values into the most compact array type that round trips them.
+    Integers are packed as int64, floats as float64, and anything else (mixed integers and floats, or missing values)
+    as objects, so that every value comes back with its type.
+    """
+    if all(type(v) is int for v in values):
+        try:
+            return np.array(values, dtype=np.int64)
+        except OverflowError:
+            pass
+    elif all(type(v) is float for v in values):
+        return np.array(values, dtype=np.float64)
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    return column
+
+
+def _to_numeric_column(values: List[Any], dtype: Optional[type] = None) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    This method packs a list of numbers into a numeric array, along with the values as objects when the array does
+    not round trip them (e.g. integers mixed with floats), or None.
+    param values: Numbers to pack
+    param dtype: Type of the numeric array, the most compact type that round trips the values if None
+    """
+    column = _to_column(values)
+    if dtype is not None and column.dtype != dtype:
+        return np.array(values, dtype=dtype), column
+    if column.dtype == object:
+        return np.array(values, dtype=np.float64), column
+    return column, None
+
+
+class TrailArray:
+    """
+    This class represents a trip trail in a columnar layout. Timestamps and coordinates are held in typed arrays,
+    every other field of the trail points is held in a column of its own. Trail points are sorted by timestamp.
+    Trail point dicts are only rebuilt on demand, when a trail is emitted.
+    """
+    __slots__ = (
+        "timestamps", "latitudes", "longitudes", "fields", "extras", "location_fields", "location_extras",
+        "exact_values", "_cumulative_distances", "_leg_distances"
+    )
+
+    def __init__(
+            self,
+            timestamps: np.ndarray,
+            latitudes: np.ndarray,
+            longitudes: np.ndarray,
+            fields: Optional[List[Text]] = None,
+            extras: Optional[Dict[Text, np.ndarray]] = None,
+            location_fields: Optional[List[Text]] = None,
+            location_extras: Optional[Dict[Text, np.ndarray]] = None,
+            cumulative_distances: Optional[np.ndarray] = None,
+            exact_values: Optional[Dict[Text, np.ndarray]] = None
+    ):
+        """
+        This method initializes the trail array.
+        param timestamps: Timestamps of the trail points, in ms, sorted ascending
+        param latitudes: Latitudes of the trail points
+        param longitudes: Longitudes of the trail points
+        param fields: Keys of a trail point, in the order they are emitted
+        param extras: Columns for the trail point keys other than timestamp and location
+        param location_fields: Keys of a trail point location, in the order they are emitted
+        param location_extras: Columns for the location keys other than latitude and longitude
+        param cumulative_distances: Cumulative haversine distances in kms of the trail points, if already known.
+        Computed on first use if not provided.
+        param exact_values: Object columns of the timestamps, latitudes or longitudes, by key, that the numeric arrays
+        do not round trip (e.g. integer latitudes). They are emitted instead of the numeric arrays.
+        """
+        self.timestamps = timestamps
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.fields = fields if fields is not None else ["timestamp", "location"]
+        self.extras = extras or {}
+        self.location_fields = location_fields if location_fields is not None else ["latitude", "longitude"]
+        self.location_extras = location_extras or {}
+        self.exact_values = exact_values or {}
+        self._cumulative_distances = cumulative_distances
+        self._leg_distances = None
+
+    @classmethod
+    def from_trail(cls, trail: Sequence[Dict[Text, Any]], cumulative_distances: Optional[Sequence[float]] = None
+                   ) -> "TrailArray":
+        """
+        This method builds the trail array from a list of trail point dicts. The points are stably sorted by timestamp.
+        param trail: Trail points
+        param cumulative_distances: Cumulative haversine distances in kms of the trail points, if already known. They
+        can only be provided for a trail already sorted by timestamp.
+        """
+        points = sorted(trail, key=lambda x: x["timestamp"])
+        fields = {}
+        location_fields = {}
+        for point in points:
+            fields.update(dict.fromkeys(point))
+            location_fields.update(dict.fromkeys(point["location"]))
+        extras = {
+            key: _to_column([point.get(key, _MISSING) for point in points])
+            for key in fields if key not in ("timestamp", "location")
+        }
+        location_extras = {
+            key: _to_column([point["location"].get(key, _MISSING) for point in points])
+            for key in location_fields if key not in ("latitude", "longitude")
+        }
+        timestamps, exact_timestamps = _to_numeric_column([point["timestamp"] for point in points])
+        latitudes, exact_latitudes = _to_numeric_column(
+            [point["location"]["latitude"] for point in points], dtype=np.float64
+        )
+        longitudes, exact_longitudes = _to_numeric_column(
+            [point["location"]["longitude"] for point in points], dtype=np.float64
+        )
+        exact_values = {
+            key: column for key, column in
+            (("timestamp", exact_timestamps), ("latitude", exact_latitudes), ("longitude", exact_longitudes))
+            if column is not None
+        }
+        return cls(
+            timestamps=timestamps,
+            latitudes=latitudes,
+            longitudes=longitudes,
+            fields=list(fields),
+            extras=extras,
+            location_fields=list(location_fields),
+            location_extras=location_extras,
+            cumulative_distances=(
+                None if cumulative_distances is None else np.asarray(cumulative_distances, dtype=np.float64)
+            ),
+            exact_values=exact_values
+        )
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @property
+    def cumulative_distances(self) -> np.ndarray:
+        """
+        Haversine distance in kms from the first trail point to every trail point. Computed once and cached.
+        The distances may be offset by a constant when provided for part of a longer trail, only their differences
+        are meaningful then.
+        """
+        if self._cumulative_distances is None:
+            self._leg_distances, self._cumulative_distances = haversine_dist_array(self.latitudes, self.longitudes)
+        return self._cumulative_distances
+
+    @property
+    def leg_distances(self) -> np.ndarray:
+        """
+        Haversine distance in kms of every leg, i.e. between every trail point and the next one. Computed once and
+        cached, along with the cumulative distances.
+        """
+        if self._leg_distances is None:
+            legs, cumulative_distances = haversine_dist_array(self.latitudes, self.longitudes)
+            self._leg_distances = legs
+            if self._cumulative_distances is None:
+                self._cumulative_distances = cumulative_distances
+        return self._leg_distances
+
+    @property
+    def distance_km(self) -> float:
+        """
+        Haversine distance in kms along the whole trail.
+        """
+        return float(self.cumulative_distances[-1] - self.cumulative_distances[0]) if len(self) > 0 else 0.0
+
+    def to_dicts(self, start: int = 0, end: Optional[int] = None) -> List[Dict[Text, Any]]:
+        """
+        This method rebuilds the trail point dicts for the points in [start, end).
+        """
+        end = len(self) if end is None else end
+        if end <= start:
+            return []
+        return self._rebuild(slice(start, end))
+
+    def to_dicts_at(self, indices: Sequence[int]) -> List[Dict[Text, Any]]:
+        """
+        This method rebuilds the trail point dicts for the points at the given indices, in that order.
+        """
+        if len(indices) == 0:
+            return []
+        return self._rebuild(np.asarray(indices, dtype=np.int64))
+
+    def _rebuild(self, selection: Union[slice, np.ndarray]) -> List[Dict[Text, Any]]:
+        """
+        This method rebuilds the trail point dicts for the points selected by a slice or an index array.
+        """
+        columns = {key: column[selection].tolist() for key, column in self.extras.items()}
+        columns["timestamp"] = self.exact_values.get("timestamp", self.timestamps)[selection].tolist()
+        location_columns = {key: column[selection].tolist() for key, column in self.location_extras.items()}
+        location_columns["latitude"] = self.exact_values.get("latitude", self.latitudes)[selection].tolist()
+        location_columns["longitude"] = self.exact_values.get("longitude", self.longitudes)[selection].tolist()
+
+        trail = []
+        for i in range(len(columns["timestamp"])):
+            location = {
+                key: location_columns[key][i] for key in self.location_fields
+                if location_columns[key][i] is not _MISSING
+            }
+            point = {}
+            for key in self.fields:
+                value = location if key == "location" else columns[key][i]
+                if value is not _MISSING:
+                    point[key] = value
+            trail.append(point)
+        return trail
+
+    def point(self, idx: int) -> Dict[Text, Any]:
+        """
+        This method rebuilds the trail point dict at the given index.
+        """
+        idx = idx + len(self) if idx < 0 else idx
+        return self.to_dicts(idx, idx + 1)[0]
@@ -0,0 +1,261 @@
+"""
+Compact binary encoding of trails: columnar, with the timestamps, coordinates and integer fields stored as zigzag
+varints of the deltas between consecutive trail points.
+
+Layout, after the magic bytes:
+    varints: count of trail points, flags, precision of the coordinates in decimal digits
+    timestamps: count zigzag varints of the deltas, in ms, or raw little-endian float64 when they are not integers
+    coordinates: count zigzag varints of the latitude deltas then of the longitude deltas, scaled by 10 ** precision,
+    or raw little-endian float64 latitudes then longitudes when lossless
+    metadata: varint length, then the JSON of the trail point keys and of the other columns
+    other columns, in metadata order: zigzag delta varints for integers, raw little-endian float64 for numbers, and
+    varint length then JSON for anything else
+    exact values, in metadata order: varint length then JSON of the timestamps or coordinates that the columns above
+    do not round trip (e.g. integers mixed with floats), so they are decoded with their types
+"""
+import base64
+import json
+from typing import Any, Dict, Optional, Sequence, Text, Tuple, Union
+
+import numpy as np
+
+from .trail_array import _MISSING, TrailArray
+
+MAGIC = b"FMT\x01"
+DATAPOINT_ENCODING = "fmtrail/1"
+DEFAULT_PRECISION = 7
+
+_FLAG_FLOAT_TIMESTAMPS = 1
+_FLAG_LOSSLESS_COORDINATES = 2
+_FLAG_RAW_TIMESTAMPS = 4
+_INT_COLUMN, _FLOAT_COLUMN, _OBJECT_COLUMN = "i", "f", "o"
+
+
+def _zigzag(values: np.ndarray) -> np.ndarray:
+    values = values.astype(np.int64)
+    return ((values << 1) ^ (values >> 63)).view(np.uint64)
+
+
+def _unzigzag(values: np.ndarray) -> np.ndarray:
+    return ((values >> np.uint64(1)).view(np.int64)) ^ -((values & np.uint64(1)).view(np.int64))
+
+
+def encode_varints(values: np.ndarray) -> bytes:
+    """
+    This method encodes unsigned integers as LEB128 varints, 7 bits per byte, in a pass per byte position.
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    count_bytes = np.ones(len(values), dtype=np.int64)
+    for k in range(1, 10):
+        count_bytes += values >= np.uint64(1 << (7 * k))
+    offsets = np.cumsum(count_bytes) - count_bytes
+    encoded = np.empty(int(count_bytes.sum()), dtype=np.uint8)
+    for k in range(int(count_bytes.max(initial=0))):
+        selected = count_bytes > k
+        chunk = (values[selected] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        chunk |= np.where(count_bytes[selected] > k + 1, np.uint64(0x80), np.uint64(0))
+        encoded[offsets[selected] + k] = chunk
+    return encoded.tobytes()
+
+
+def decode_varints(data: np.ndarray, count: int) -> Tuple[np.ndarray, int]:
+    """
+    This method decodes count LEB128 varints from the start of a uint8 array, and returns them along with the number
+    of bytes they took.
+    """
+    if count == 0:
+        return np.empty(0, dtype=np.uint64), 0
+    ends = np.flatnonzero(data < 0x80)[:count]
+    if len(ends) < count:
+        raise ValueError("Truncated trail encoding")
+    size = int(ends[-1]) + 1
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    positions = np.arange(size) - np.repeat(starts, ends - starts + 1)
+    chunks = (data[:size] & 0x7F).astype(np.uint64) << (7 * positions).astype(np.uint64)
+    return np.add.reduceat(chunks, starts), size
+
+
+def _encode_deltas(values: np.ndarray) -> bytes:
+    return encode_varints(_zigzag(np.diff(values.astype(np.int64), prepend=np.int64(0))))
+
+
+class _Reader:
+    """
+    Cursor over the bytes of an encoded trail.
+    """
+    def __init__(self, data: bytes):
+        self.data = np.frombuffer(data, dtype=np.uint8)
+        self.position = 0
+
+    def varints(self, count: int) -> np.ndarray:
+        values, size = decode_varints(self.data[self.position:], count)
+        self.position += size
+        return values
+
+    def varint(self) -> int:
+        return int(self.varints(1)[0])
+
+    def deltas(self, count: int) -> np.ndarray:
+        return np.cumsum(_unzigzag(self.varints(count)))
+
+    def raw(self, size: int) -> bytes:
+        if self.position + size > len(self.data):
+            raise ValueError("Truncated trail encoding")
+        chunk = self.data[self.position:self.position + size].tobytes()
+        self.position += size
+        return chunk
+
+
+def _encode_column(column: np.ndarray) -> Tuple[Text, bytes]:
+    if column.dtype == np.int64:
+        return _INT_COLUMN, _encode_deltas(column)
+    if column.dtype == np.float64:
+        return _FLOAT_COLUMN, column.astype("<f8").tobytes()
+    missing = [i for i, value in enumerate(column.tolist()) if value is _MISSING]
+    values = [None if value is _MISSING else value for value in column.tolist()]
+    payload = json.dumps({"values": values, "missing": missing}, separators=(",", ":")).encode()
+    return _OBJECT_COLUMN, encode_varints([len(payload)]) + payload
+
+
+def _decode_column(reader: _Reader, kind: Text, count: int) -> np.ndarray:
+    if kind == _INT_COLUMN:
+        return reader.deltas(count)
+    if kind == _FLOAT_COLUMN:
+        return np.frombuffer(reader.raw(8 * count), dtype="<f8").astype(np.float64)
+    payload = json.loads(reader.raw(reader.varint()))
+    column = np.empty(count, dtype=object)
+    column[:] = payload["values"]
+    column[payload["missing"]] = _MISSING
+    return column
+
+
+def validate_precision(precision: Optional[int]) -> None:
+    """
+    This method raises a ValueError if precision is not None nor a number of decimal digits the coordinates can be
+    rounded to.
+    """
+    if precision is not None and (isinstance(precision, bool) or not isinstance(precision, int)
+                                  or not 0 <= precision <= 15):
+        raise ValueError(f"Trail precision must be None or an integer from 0 to 15, not {precision!r}")
+
+
+def encode_trail(trail: Union[TrailArray, Sequence[Dict[Text, Any]]], precision: Optional[int] = DEFAULT_PRECISION
+                 ) -> bytes:
+    """
+    This method encodes a trail in the compact binary format.
+    param trail: Trail, as a TrailArray or a list of trail point dicts
+    param precision: Decimal digits the coordinates are rounded to, 7 by default (about a centimetre). None keeps the
+    coordinates as is, so the trail is decoded exactly as it was encoded.
+    """
+    validate_precision(precision)
+    trail_array = trail if isinstance(trail, TrailArray) else TrailArray.from_trail(trail)
+    count = len(trail_array)
+    timestamps = trail_array.timestamps
+    if timestamps.dtype not in (np.int64, np.float64):
+        raise ValueError("Only trails with numeric timestamps can be encoded")
+    # Integer timestamps are encoded as deltas, anything else (fractions, NaN, beyond float64 integers) as is
+    raw_timestamps = timestamps.dtype == np.float64 and not np.all(
+        (timestamps == np.round(timestamps)) & (np.abs(timestamps) <= 2.0 ** 53)
+    )
+    flags = (_FLAG_FLOAT_TIMESTAMPS if timestamps.dtype == np.float64 else 0) | (
+        _FLAG_LOSSLESS_COORDINATES if precision is None else 0
+    ) | (_FLAG_RAW_TIMESTAMPS if raw_timestamps else 0)
+    chunks = [
+        MAGIC,
+        encode_varints([count, flags, precision or 0]),
+        timestamps.astype("<f8").tobytes() if raw_timestamps else _encode_deltas(timestamps),
+    ]
+    if precision is None:
+        chunks += [trail_array.latitudes.astype("<f8").tobytes(), trail_array.longitudes.astype("<f8").tobytes()]
+    else:
+        scale = 10.0 ** precision
+        chunks += [
+            _encode_deltas(np.round(trail_array.latitudes * scale)),
+            _encode_deltas(np.round(trail_array.longitudes * scale)),
+        ]
+
+    columns, column_chunks = [], []
+    for is_location, extras in ((False, trail_array.extras), (True, trail_array.location_extras)):
+        for key, column in extras.items():
+            kind, chunk = _encode_column(column)
+            columns.append([key, is_location, kind])
+            column_chunks.append(chunk)
+    # Exact coordinates are dropped along with the digits the coordinates are rounded to
+    exact = [
+        key for key in ("timestamp", "latitude", "longitude")
+        if key in trail_array.exact_values and (precision is None or key == "timestamp")
+    ]
+    column_chunks += [_encode_column(trail_array.exact_values[key])[1] for key in exact]
+    metadata = json.dumps(
+        {
+            "fields": trail_array.fields, "location_fields": trail_array.location_fields, "columns": columns,
+            "exact": exact
+        },
+        separators=(",", ":")
+    ).encode()
+    chunks += [encode_varints([len(metadata)]), metadata] + column_chunks
+    return b"".join(chunks)
+
+
+def decode_trail(data: bytes) -> TrailArray:
+    """
+    This method decodes a trail encoded by encode_trail. Call to_dicts on the result for the trail point dicts.
+    """
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a trail encoding")
+    reader = _Reader(data)
+    reader.position = len(MAGIC)
+    count, flags, precision = reader.varints(3).tolist()
+    if flags & _FLAG_RAW_TIMESTAMPS:
+        timestamps = np.frombuffer(reader.raw(8 * count), dtype="<f8").astype(np.float64)
+    else:
+        timestamps = reader.deltas(count)
+    if flags & _FLAG_FLOAT_TIMESTAMPS:
+        timestamps = timestamps.astype(np.float64)
+    if flags & _FLAG_LOSSLESS_COORDINATES:
+        latitudes = np.frombuffer(reader.raw(8 * count), dtype="<f8").astype(np.float64)
+        longitudes = np.frombuffer(reader.raw(8 * count), dtype="<f8").astype(np.float64)
+    else:
+        scale = 10.0 ** precision
+        latitudes = reader.deltas(count) / scale
+        longitudes = reader.deltas(count) / scale
+
+    metadata = json.loads(reader.raw(reader.varint()))
+    extras, location_extras = {}, {}
+    for key, is_location, kind in metadata["columns"]:
+        (location_extras if is_location else extras)[key] = _decode_column(reader, kind, count)
+    exact_values = {key: _decode_column(reader, _OBJECT_COLUMN, count) for key in metadata.get("exact", [])}
+    return TrailArray(
+        timestamps=timestamps,
+        latitudes=latitudes,
+        longitudes=longitudes,
+        fields=metadata["fields"],
+        extras=extras,
+        location_fields=metadata["location_fields"],
+        location_extras=location_extras,
+        exact_values=exact_values,
+    )
+
+
+def encode_datapoint_trail(datapoint: Dict[Text, Any], precision: Optional[int] = DEFAULT_PRECISION
+                           ) -> Dict[Text, Any]:
+    """
+    This method returns a copy of a datapoint with its trail encoded, as base64 text so the datapoint is still JSON.
+    The encoding is recorded in trailEncoding.
+    """
+    return dict(
+        datapoint,
+        trail=base64.b64encode(encode_trail(datapoint["trail"], precision=precision)).decode("ascii"),
+        trailEncoding=DATAPOINT_ENCODING,
+    )
+
+
+def decode_datapoint_trail(datapoint: Dict[Text, Any]) -> Dict[Text, Any]:
+    """
+    This method returns a copy of a datapoint with its trail decoded to trail point dicts, if it is encoded.
+    """
+    if datapoint.get("trailEncoding") != DATAPOINT_ENCODING:
+        return datapoint
+    decoded = {key: value for key, value in datapoint.items() if key != "trailEncoding"}
+    decoded["trail"] = decode_trail(base64.b64decode(datapoint["trail"])).to_dicts()
+    return decoded
@@ -1,8 +1,27 @@
-from .haversine_distance import haversine_dist_wsgi_points
+from .haversine_distance import haversine_distance, pairwise_haversine
+from . import segment_core
 from .osm_utils import OSMUtils
-from typing import Tuple, Dict, Any, Text, List
+from .frozen import freeze
+from .prepared_trip import PreparedTrip
+from .simplify import simplify_trail
+from .trail_codec import encode_datapoint_trail, validate_precision
+from .trail_array import TrailArray
+from typing import Tuple, Dict, Any, Text, List, NamedTuple, Optional, Sequence, Union
 from copy import deepcopy
 
+import numpy as np
+
+
+class InterpolatedPoint(NamedTuple):
+    """
+    An interpolated trail point at a segment boundary, between the parent trail points
+    previous_idx and previous_idx + 1.
+    """
+    previous_idx: int
+    timestamp: float
+    latitude: float
+    longitude: float
+
 
 class BaseSegment:
     """
@@ -17,7 +36,13 @@ class BaseSegment:
             is_first_segment: bool,
             is_last_segment: bool,
             minimum_distance_km_to_interpolate: float,
-            minimum_seconds_to_interpolate: float
+            minimum_seconds_to_interpolate: float,
+            prepared_trip: Optional[PreparedTrip] = None,
+            share_parent: bool = False,
+            read_only: bool = False,
+            simplify_tolerance_m: Optional[float] = None,
+            encode_trail: bool = False,
+            trail_precision: Optional[int] = None
     ):
         """
         This method initializes the segment.
@@ -28,31 +53,58 @@ class BaseSegment:
         param is_last_segment: True if the segment is the last segment of the trip
         param minimum_distance_km_to_interpolate: Minimum distance in kms between two trail points to interpolate
         param minimum_seconds_to_interpolate: Minimum duration in seconds between two trail points to interpolate
+        param prepared_trip: Parent datapoint prepared for segmentation, to share between the segments of a trip.
+        Prepared from the parent datapoint if not provided
+        param share_parent: If True, the segment datapoint shares all the sub-objects it does not change with the
+        parent datapoint, instead of deep copying them
+        param read_only: If True, the segment datapoint is returned as a read-only view
+        param simplify_tolerance_m: If set, the segment trail is simplified with this tolerance in metres. The segment
+        distance is still computed from the full trail
+        param encode_trail: If True, the segment trail is returned in the compact trail encoding (see trail_codec)
+        param trail_precision: Decimal digits the coordinates of the encoded segment trail are rounded to, for a more
+        compact encoding (7 is about a centimetre). None, the default, encodes the trail losslessly
         """
+        validate_precision(trail_precision)
         self.parent_datapoint = parent_datapoint
         self.segment_timestamp = segment_timestamp
         self.segment_timestamp_end = segment_timestamp_end
-        self.count_events = len(self.parent_datapoint["events"])
-        self.count_trail_points = len(self.parent_datapoint["trail"])
+        self.prepared_trip = prepared_trip if prepared_trip is not None else PreparedTrip(parent_datapoint)
+        self.event_index = self.prepared_trip.event_index
+        self.count_events = len(self.event_index)
+        self.trail_array = self.prepared_trip.trail_array
+        self.count_trail_points = len(self.trail_array)
         self.is_first_segment = is_first_segment
         self.is_last_segment = is_last_segment
         self.minimum_distance_km_to_interpolate = minimum_distance_km_to_interpolate
         self.minimum_seconds_to_interpolate = minimum_seconds_to_interpolate
+        self.share_parent = share_parent
+        self.read_only = read_only
+        self.simplify_tolerance_m = simplify_tolerance_m
+        self.encode_trail = encode_trail
+        self.trail_precision = trail_precision
 
         self.is_start_interpolated = False
         self.is_end_interpolated = False
 
+        # Lookups that TripSegmenter precomputes for all the segments of a trip at once
+        self.trail_window: Optional[Tuple[int, int]] = None
+        self.event_window: Optional[Tuple[int, int]] = None
+        self.trail_bounds: Optional[Tuple[int, int, Optional[InterpolatedPoint], Optional[InterpolatedPoint]]] = None
+
         # Readjust the start timestamp
         self.segment_timestamp = segment_timestamp - 1 if is_first_segment else self.segment_timestamp
 
     @staticmethod
     def interpolate_lat_long(timestamp: int, previous_point_ts: int, next_point_ts: int, prev_lat: float,
-                             prev_lon: float, next_lat: float, next_lon: float) -> Tuple[float, float, float]:
+                             prev_lon: float, next_lat: float, next_lon: float,
+                             total_distance: Optional[float] = None) -> Tuple[float, float, float]:
         """
         This method interpolates the latitude and longitude of a point between two points, given the timestamp the point
         could have occurred.
+        param total_distance: Haversine distance in kms between the two points, if already known
         """
-        total_distance = haversine_dist_wsgi_points([(prev_lat, prev_lon), (next_lat, next_lon)])
+        if total_distance is None:
+            total_distance = haversine_distance(lat1=prev_lat, lon1=prev_lon, lat2=next_lat, lon2=next_lon)
         total_duration_s = (next_point_ts - previous_point_ts) / 1000
         intermediate_duration_s = (timestamp - previous_point_ts) / 1000
         x0, y0 = OSMUtils.get_cartesian_point(latitude=prev_lat, longitude=prev_lon)
@@ -64,6 +116,32 @@ class BaseSegment:
         intermediate_lat, intermediate_lon = OSMUtils.get_spherical_point((intermediate_x, intermediate_y))
         return intermediate_lat, intermediate_lon, straight_line_dist
 
+    @staticmethod
+    def interpolate_lat_long_many(timestamps: np.ndarray, previous_point_ts: np.ndarray, next_point_ts: np.ndarray,
+                                  prev_lat: np.ndarray, prev_lon: np.ndarray, next_lat: np.ndarray,
+                                  next_lon: np.ndarray, total_distance: Optional[np.ndarray] = None
+                                  ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        This method is the vectorized interpolate_lat_long: it interpolates any number of points at once, with a single
+        projection call in each direction.
+        param total_distance: Haversine distances in kms between the pairs of points, if already known
+        """
+        if total_distance is None:
+            total_distance = pairwise_haversine(prev_lat, prev_lon, next_lat, next_lon)
+        total_duration_s = (np.asarray(next_point_ts, dtype=np.float64) - previous_point_ts) / 1000
+        if np.any(total_duration_s == 0):
+            raise ZeroDivisionError("float division by zero")
+        intermediate_duration_s = (np.asarray(timestamps, dtype=np.float64) - previous_point_ts) / 1000
+        count = len(total_distance)
+        x, y = OSMUtils.to_cartesian_many(np.concatenate([prev_lat, next_lat]), np.concatenate([prev_lon, next_lon]))
+        x0, y0, x1, y1 = x[:count], y[:count], x[count:], y[count:]
+        speed = total_distance / total_duration_s
+        straight_line_dist = speed * intermediate_duration_s
+        intermediate_x = ((straight_line_dist / total_distance) * (x1 - x0)) + x0
+        intermediate_y = ((straight_line_dist / total_distance) * (y1 - y0)) + y0
+        intermediate_lat, intermediate_lon = OSMUtils.to_spherical_many(intermediate_x, intermediate_y)
+        return intermediate_lat, intermediate_lon, straight_line_dist
+
     @staticmethod
     def get_interpolated_trail_point(previous_trail_point: Dict[Text, Any], next_trail_point: Dict[Text, Any],
                                      intermediate_timestamp: int) -> Dict[Text, Any]:
@@ -91,41 +169,50 @@ class BaseSegment:
             timestamp=float(intermediate_timestamp)
         )
 
+    def copy_event(self, event: Dict[Text, Any]) -> Dict[Text, Any]:
+        """
+        This method copies a parent event, to update its timestamp. Only the top level is copied when sharing the parent.
+        """
+        return dict(event) if self.share_parent else deepcopy(event)
+
+    def get_event_window(self) -> Tuple[int, int]:
+        """
+        This method returns the indices of the first and the last parent events within the segment timestamps.
+        The window is empty (first > last) if no event lies within the segment.
+        """
+        if self.event_window is not None:
+            return self.event_window
+        return self.event_index.window(self.segment_timestamp, self.segment_timestamp_end)
+
     def get_segment_events(self) -> List[Dict[Text, Any]]:
         """
         This method returns the events in the segment, from the parent events
         """
         events = []
-        event_idx = [
-            i for i, t in enumerate(self.parent_datapoint["events"])
-            if (self.segment_timestamp <= t["timestamp"] <= self.segment_timestamp_end)
-        ]
-        if len(event_idx) > 0:
-            event_start_idx = 0 if self.is_first_segment else event_idx[0]
-            event_end_idx = self.count_events - 1 if self.is_last_segment else event_idx[-1]
-            events = self.parent_datapoint["events"][event_start_idx:event_end_idx + 1]
-        for event in self.parent_datapoint["events"]:
-            if event["timestamp"] < self.segment_timestamp < event["timestampEnd"]:
-                copied_event = deepcopy(event)
-                copied_event["timestamp"] = self.segment_timestamp
-                events.insert(0, copied_event)
-            elif event["timestamp"] < self.segment_timestamp_end < event["timestampEnd"]:
-                copied_event = deepcopy(event)
-                copied_event["timestamp"] = self.segment_timestamp_end
-                events.append(copied_event)
+        first_event_idx, last_event_idx = self.get_event_window()
+        if first_event_idx <= last_event_idx:
+            event_start_idx = 0 if self.is_first_segment else first_event_idx
+            event_end_idx = self.count_events - 1 if self.is_last_segment else last_event_idx
+            events = self.prepared_trip.events[event_start_idx:event_end_idx + 1]
+        # Events spanning the start are prepended in reverse order, events spanning only the end are appended
+        spanning_start_idx = self.event_index.spanning(self.segment_timestamp)
+        for i in spanning_start_idx:
+            copied_event = self.copy_event(self.prepared_trip.events[i])
+            copied_event["timestamp"] = self.segment_timestamp
+            events.insert(0, copied_event)
+        for i in self.event_index.spanning(self.segment_timestamp_end):
+            if i in spanning_start_idx:
+                continue
+            copied_event = self.copy_event(self.prepared_trip.events[i])
+            copied_event["timestamp"] = self.segment_timestamp_end
+            events.append(copied_event)
         return events
 
     def requires_interpolation_with_next_trail(self, trail_start_idx: int, duration_s: int) -> bool:
         """
         This method returns True if the trail point needs to be interpolated with the next trail point.
         """
-        previous_trail_point = self.parent_datapoint["trail"][trail_start_idx]
-        next_trail_point = self.parent_datapoint["trail"][trail_start_idx + 1]
-        prev_lat = previous_trail_point["location"]["latitude"]
-        prev_lon = previous_trail_point["location"]["longitude"]
-        next_lat = next_trail_point["location"]["latitude"]
-        next_lon = next_trail_point["location"]["longitude"]
-        distance = haversine_dist_wsgi_points([(prev_lat, prev_lon), (next_lat, next_lon)])
+        distance = self.prepared_trip.leg_distances[trail_start_idx]
         return(
             True if (
                     (distance > self.minimum_distance_km_to_interpolate) and
@@ -133,86 +220,246 @@ class BaseSegment:
             ) else False
         )
 
-    def augment_trail_with_interpolation(self, trail_start_idx: int, trail_end_idx: int, trail: List[Dict[Text, Any]]
-                                         ) -> List[Dict[Text, Any]]:
+    def interpolate_with_next_trail(self, previous_idx: int, intermediate_timestamp: int) -> InterpolatedPoint:
         """
-        This method augments the trail with interpolated points.
+        This method interpolates a point between the parent trail points previous_idx and previous_idx + 1.
+        """
+        latitude, longitude, _ = self.interpolate_lat_long(
+            timestamp=intermediate_timestamp,
+            previous_point_ts=self.trail_array.timestamps[previous_idx].item(),
+            next_point_ts=self.trail_array.timestamps[previous_idx + 1].item(),
+            prev_lat=self.trail_array.latitudes[previous_idx].item(),
+            prev_lon=self.trail_array.longitudes[previous_idx].item(),
+            next_lat=self.trail_array.latitudes[previous_idx + 1].item(),
+            next_lon=self.trail_array.longitudes[previous_idx + 1].item(),
+            total_distance=self.prepared_trip.leg_distances[previous_idx].item()
+        )
+        return InterpolatedPoint(previous_idx, float(intermediate_timestamp), latitude, longitude)
+
+    def get_boundary_interpolation_requests(self, trail_start_idx: int, trail_end_idx: int
+                                            ) -> Tuple[Optional[Tuple[int, int]], Optional[Tuple[int, int]]]:
+        """
+        This method returns the (previous trail point index, timestamp) of the points to interpolate, if any, at the start
+        and the end of the segment.
         param trail_start_idx: Index of the first trail point in the segment, wrt parent trail
         param trail_end_idx: Index of the last trail point in the segment, wrt parent trail
-        param trail: Trail points in the segment
         """
+        start_request = end_request = None
         duration_from_start_ts_to_first_tp = (
-                (self.parent_datapoint["trail"][trail_start_idx]["timestamp"] - self.segment_timestamp) / 1000
+                (self.trail_array.timestamps[trail_start_idx].item() - self.segment_timestamp) / 1000
         )
         if (
                 trail_start_idx > 0 and
                 self.requires_interpolation_with_next_trail(trail_start_idx - 1, duration_from_start_ts_to_first_tp)
         ):
-            interpolated_point = self.get_interpolated_trail_point(
-                previous_trail_point=self.parent_datapoint["trail"][trail_start_idx - 1],
-                next_trail_point=self.parent_datapoint["trail"][trail_start_idx],
-                intermediate_timestamp=self.segment_timestamp,
-            )
-            trail = [interpolated_point] + trail
+            start_request = (trail_start_idx - 1, self.segment_timestamp)
             self.is_start_interpolated = True
         duration_from_end_ts_to_last_tp = (
-                (self.segment_timestamp_end - self.parent_datapoint["trail"][trail_end_idx]["timestamp"]) / 1000
+                (self.segment_timestamp_end - self.trail_array.timestamps[trail_end_idx].item()) / 1000
         )
         if (
                 trail_end_idx < self.count_trail_points - 1 and
                 self.requires_interpolation_with_next_trail(trail_end_idx, duration_from_end_ts_to_last_tp)
         ):
-            interpolated_point = self.get_interpolated_trail_point(
-                previous_trail_point=self.parent_datapoint["trail"][trail_end_idx],
-                next_trail_point=self.parent_datapoint["trail"][trail_end_idx + 1],
-                intermediate_timestamp=self.segment_timestamp_end
-            )
-            trail = trail + [interpolated_point]
+            end_request = (trail_end_idx, self.segment_timestamp_end)
             self.is_end_interpolated = True
+        return start_request, end_request
+
+    def get_boundary_interpolation(self, trail_start_idx: int, trail_end_idx: int
+                                   ) -> Tuple[Optional[InterpolatedPoint], Optional[InterpolatedPoint]]:
+        """
+        This method returns the interpolated points, if any, at the start and the end of the segment.
+        param trail_start_idx: Index of the first trail point in the segment, wrt parent trail
+        param trail_end_idx: Index of the last trail point in the segment, wrt parent trail
+        """
+        requests = self.get_boundary_interpolation_requests(trail_start_idx, trail_end_idx)
+        start_point, end_point = (
+            None if request is None else self.interpolate_with_next_trail(*request) for request in requests
+        )
+        return start_point, end_point
+
+    def to_trail_point(self, point: InterpolatedPoint) -> Dict[Text, Any]:
+        """
+        This method returns the trail point dict for an interpolated point.
+        """
+        return dict(
+            self.trail_array.point(point.previous_idx),
+            location={"latitude": point.latitude, "longitude": point.longitude},
+            timestamp=point.timestamp
+        )
+
+    def augment_trail_with_interpolation(self, trail_start_idx: int, trail_end_idx: int, trail: List[Dict[Text, Any]]
+                                         ) -> List[Dict[Text, Any]]:
+        """
+        This method augments the trail with interpolated points.
+        param trail_start_idx: Index of the first trail point in the segment, wrt parent trail
+        param trail_end_idx: Index of the last trail point in the segment, wrt parent trail
+        param trail: Trail points in the segment
+        """
+        start_point, end_point = self.get_boundary_interpolation(trail_start_idx, trail_end_idx)
+        if start_point is not None:
+            trail = [self.to_trail_point(start_point)] + trail
+        if end_point is not None:
+            trail = trail + [self.to_trail_point(end_point)]
         return trail
 
-    def get_segment_trail(self) -> List[Dict[Text, Any]]:
+    def get_trail_window(self) -> Tuple[int, int]:
         """
-        This method returns the trail points in the segment. It also augments the trail with interpolated points.
-        If the segment lies between two trail points, then it returns the interpolated trail points.
+        This method returns the indices of the first and the last parent trail points within the segment timestamps.
+        The window is empty (first > last) if no trail point lies within the segment.
         """
-        trail = []
-        self.parent_datapoint["trail"].sort(key=lambda x: x["timestamp"])
-        trail_idx = [
-            i for i, t in enumerate(self.parent_datapoint["trail"])
-            if (self.segment_timestamp <= t["timestamp"] <= self.segment_timestamp_end)
-        ]
-        if len(trail_idx) > 0:
-            trail_start_idx = 0 if self.is_first_segment else trail_idx[0]
-            trail_end_idx = self.count_trail_points - 1 if self.is_last_segment else trail_idx[-1]
-            trail = self.parent_datapoint["trail"][trail_start_idx:trail_end_idx + 1]
-            trail = self.augment_trail_with_interpolation(trail_start_idx, trail_end_idx, trail)
+        if self.trail_window is not None:
+            return self.trail_window
+        first = int(np.searchsorted(self.trail_array.timestamps, self.segment_timestamp, side="left"))
+        last = int(np.searchsorted(self.trail_array.timestamps, self.segment_timestamp_end, side="right")) - 1
+        return first, last
+
+    def locate_segment_trail(self) -> Tuple[int, int, Optional[Tuple[int, int]], Optional[Tuple[int, int]]]:
+        """
+        This method locates the segment in the parent trail. It returns the indices of the first and the last parent
+        trail points in the segment, along with the (previous trail point index, timestamp) of the start and end points
+        to interpolate, if any.
+        If the segment lies between two trail points, the returned slice is empty and only interpolated points remain.
+        """
+        trail_start_idx, trail_end_idx = 0, -1
+        start_request = end_request = None
+        first_trail_idx, last_trail_idx = self.get_trail_window()
+        if first_trail_idx <= last_trail_idx:
+            trail_start_idx = 0 if self.is_first_segment else first_trail_idx
+            trail_end_idx = self.count_trail_points - 1 if self.is_last_segment else last_trail_idx
+            start_request, end_request = self.get_boundary_interpolation_requests(trail_start_idx, trail_end_idx)
         else:
             # This means that trail points lie between two trail points.
-            start_trail_point_idx = max(
-                i for i, t in enumerate(self.parent_datapoint["trail"])
-                if self.segment_timestamp >= t["timestamp"]
-            )
-            if start_trail_point_idx < self.count_trail_points - 1:
-                trail = self.augment_trail_with_interpolation(start_trail_point_idx + 1, start_trail_point_idx, trail)
-        if len(trail) < 2:
+            start_trail_point_idx = int(
+                np.searchsorted(self.trail_array.timestamps, self.segment_timestamp, side="right")
+            ) - 1
+            if 0 <= start_trail_point_idx < self.count_trail_points - 1:
+                trail_start_idx, trail_end_idx = start_trail_point_idx + 1, start_trail_point_idx
+                start_request, end_request = self.get_boundary_interpolation_requests(trail_start_idx, trail_end_idx)
+        count_points = (trail_end_idx - trail_start_idx + 1) + (start_request is not None) + (end_request is not None)
+        if count_points < 2:
             # We would need atleast two trail points in the segmented trail
             raise Exception(f"Unable to segment trail for {self.segment_timestamp}")
+        return trail_start_idx, trail_end_idx, start_request, end_request
+
+    def get_segment_trail_bounds(self) -> Tuple[int, int, Optional[InterpolatedPoint], Optional[InterpolatedPoint]]:
+        """
+        This method returns the indices of the first and the last parent trail points in the segment, along with the
+        interpolated start and end points, if any.
+        """
+        if self.trail_bounds is not None:
+            return self.trail_bounds
+        trail_start_idx, trail_end_idx, start_request, end_request = self.locate_segment_trail()
+        start_point, end_point = (
+            None if request is None else self.interpolate_with_next_trail(*request)
+            for request in (start_request, end_request)
+        )
+        return trail_start_idx, trail_end_idx, start_point, end_point
+
+    def build_segment_trail(self, trail_start_idx: int, trail_end_idx: int, start_point: Optional[InterpolatedPoint],
+                            end_point: Optional[InterpolatedPoint]) -> List[Dict[Text, Any]]:
+        """
+        This method emits the trail point dicts for the segment located by get_segment_trail_bounds.
+        """
+        if self.simplify_tolerance_m is None:
+            trail = self.trail_array.to_dicts(trail_start_idx, trail_end_idx + 1)
+        else:
+            trail = self.trail_array.to_dicts_at(
+                self.get_simplified_trail_indices(trail_start_idx, trail_end_idx, start_point, end_point)
+            )
+        if start_point is not None:
+            trail.insert(0, self.to_trail_point(start_point))
+        if end_point is not None:
+            trail.append(self.to_trail_point(end_point))
         return trail
 
+    def get_simplified_trail_indices(self, trail_start_idx: int, trail_end_idx: int,
+                                     start_point: Optional[InterpolatedPoint], end_point: Optional[InterpolatedPoint]
+                                     ) -> np.ndarray:
+        """
+        This method returns the indices of the parent trail points the simplified segment trail keeps. The interpolated
+        points and the trail points right before and after every event are always kept.
+        """
+        if trail_end_idx < trail_start_idx:
+            return np.empty(0, dtype=np.int64)
+        timestamps = self.trail_array.timestamps[trail_start_idx:trail_end_idx + 1]
+        latitudes = [self.trail_array.latitudes[trail_start_idx:trail_end_idx + 1]]
+        longitudes = [self.trail_array.longitudes[trail_start_idx:trail_end_idx + 1]]
+        if start_point is not None:
+            latitudes.insert(0, [start_point.latitude])
+            longitudes.insert(0, [start_point.longitude])
+        if end_point is not None:
+            latitudes.append([end_point.latitude])
+            longitudes.append([end_point.longitude])
+
+        first_event_idx, last_event_idx = self.event_index.window(timestamps[0], timestamps[-1])
+        event_timestamps = self.event_index.timestamps[first_event_idx:last_event_idx + 1]
+        event_timestamps = event_timestamps[(timestamps[0] <= event_timestamps) & (event_timestamps <= timestamps[-1])]
+        latitudes, longitudes = np.concatenate(latitudes), np.concatenate(longitudes)
+        # The interpolated points are the first and the last points, which are always kept
+        offset = 1 if start_point is not None else 0
+        next_idx = np.searchsorted(timestamps, event_timestamps, side="left")
+        keep = np.zeros(len(latitudes), dtype=bool)
+        keep[offset + np.concatenate([next_idx, np.maximum(next_idx - 1, 0)])] = True
+
+        mask = simplify_trail(latitudes, longitudes, self.simplify_tolerance_m, keep)
+        return np.flatnonzero(mask[offset:offset + len(timestamps)]) + trail_start_idx
+
+    def get_segment_trail(self) -> List[Dict[Text, Any]]:
+        """
+        This method returns the trail points in the segment. It also augments the trail with interpolated points.
+        If the segment lies between two trail points, then it returns the interpolated trail points.
+        """
+        return self.build_segment_trail(*self.get_segment_trail_bounds())
+
+    def get_segment_distance(self, trail_start_idx: int, trail_end_idx: int, start_point: Optional[InterpolatedPoint],
+                             end_point: Optional[InterpolatedPoint]) -> float:
+        """
+        This method returns the haversine distance in kms along the segment trail, including interpolated points.
+        The distance between the parent trail points is read from the cumulative distances of the prepared trip, so only
+        the legs to the interpolated points are computed.
+        """
+        if trail_end_idx < trail_start_idx:
+            # The segment lies between two trail points, only the interpolated points remain
+            return float(pairwise_haversine(
+                [start_point.latitude], [start_point.longitude], [end_point.latitude], [end_point.longitude]
+            )[0])
+        cumulative_distances = self.prepared_trip.cumulative_distances
+        distance_km = float(cumulative_distances[trail_end_idx] - cumulative_distances[trail_start_idx])
+        # Legs from the start point to the first trail point, and from the last trail point to the end point
+        legs = [
+            (point.latitude, point.longitude, self.trail_array.latitudes[idx], self.trail_array.longitudes[idx])
+            for point, idx in ((start_point, trail_start_idx), (end_point, trail_end_idx)) if point is not None
+        ]
+        if len(legs) > 0:
+            distance_km += float(np.sum(pairwise_haversine(*np.array(legs, dtype=np.float64).T)))
+        return distance_km
+
+    def copy_parent_datapoint(self) -> Dict[Text, Any]:
+        """
+        This method copies the parent datapoint for the segment. The trail and events are not copied, since the segment
+        replaces them. When sharing the parent, only the trip is copied, and only its top level.
+        """
+        if self.share_parent:
+            datapoint = dict(self.parent_datapoint)
+            datapoint["trip"] = dict(self.parent_datapoint["trip"])
+            return datapoint
+        memo = {}
+        return {
+            key: None if key in ("trail", "events") else deepcopy(value, memo)
+            for key, value in self.parent_datapoint.items()
+        }
+
     def get_updated_trip_datapoint(self) -> Dict[Text, Any]:
         """
         This method returns the updated trip datapoint for the segment, given the parent datapoint.
         """
-        datapoint = deepcopy(self.parent_datapoint)
+        datapoint = self.copy_parent_datapoint()
         events = self.get_segment_events()
-        trail = self.get_segment_trail()
-        distance_km = haversine_dist_wsgi_points(
-            [(t["location"]["latitude"], t["location"]["longitude"]) for t in trail]
-        )
-        distance_km_parent = float(haversine_dist_wsgi_points(
-            [(t["location"]["latitude"], t["location"]["longitude"]) for t in self.parent_datapoint['trail']]
-        ))
+        bounds = self.get_segment_trail_bounds()
+        trail = self.build_segment_trail(*bounds)
+        distance_km = self.get_segment_distance(*bounds)
+        distance_km_parent = self.prepared_trip.distance_km
         adjustment_factor = (
             (float(self.parent_datapoint["trip"]["distance"]) / 1000) /
             (1 if distance_km_parent == 0 else distance_km_parent)
@@ -229,4 +476,161 @@ class BaseSegment:
             datapoint["trip"]["endLocation"] = trail[-1]["location"]
         datapoint["trail"] = trail
         datapoint["events"] = events
-        return datapoint
+        if self.encode_trail:
+            datapoint = encode_datapoint_trail(datapoint, precision=self.trail_precision)
+        return freeze(datapoint) if self.read_only else datapoint
+
+
+class TripSegmenter:
+    """
+    This class splits a trip into all of its segments at once. The parent trail is sorted, the segment boundaries are
+    located and the parent trail distance is computed once per trip, instead of once per segment.
+    """
+    def __init__(self, minimum_distance_km_to_interpolate: float, minimum_seconds_to_interpolate: float,
+                 share_parent: bool = False, read_only: bool = False, simplify_tolerance_m: Optional[float] = None,
+                 encode_trail: bool = False, trail_precision: Optional[int] = None):
+        """
+        This method initializes the segmenter.
+        param minimum_distance_km_to_interpolate: Minimum distance in kms between two trail points to interpolate
+        param minimum_seconds_to_interpolate: Minimum duration in seconds between two trail points to interpolate
+        param share_parent: If True, the segment datapoints share their unchanged sub-objects with the parent datapoint
+        param read_only: If True, the segment datapoints are returned as read-only views
+        param simplify_tolerance_m: If set, the segment trails are simplified with this tolerance in metres
+        param encode_trail: If True, the segment trails are returned in the compact trail encoding
+        param trail_precision: Decimal digits the coordinates of the encoded segment trails are rounded to. None, the
+        default, encodes the trails losslessly
+        """
+        validate_precision(trail_precision)
+        self.minimum_distance_km_to_interpolate = minimum_distance_km_to_interpolate
+        self.minimum_seconds_to_interpolate = minimum_seconds_to_interpolate
+        self.share_parent = share_parent
+        self.read_only = read_only
+        self.simplify_tolerance_m = simplify_tolerance_m
+        self.encode_trail = encode_trail
+        self.trail_precision = trail_precision
+
+    def get_segments(self, parent_datapoint: Union[Dict[Text, Any], PreparedTrip],
+                     boundaries: Sequence[Tuple[int, int]]) -> List[BaseSegment]:
+        """
+        This method builds the segments of the trip, with their trail and event windows located in a single pass.
+        param parent_datapoint: Parent datapoint of the segments, or the prepared trip for it
+        param boundaries: (segment_timestamp, segment_timestamp_end) of every segment, in trip order
+        """
+        prepared_trip = (
+            parent_datapoint if isinstance(parent_datapoint, PreparedTrip) else PreparedTrip(parent_datapoint)
+        )
+        trail_array = prepared_trip.trail_array
+        event_index = prepared_trip.event_index
+        segments = [
+            BaseSegment(
+                parent_datapoint=prepared_trip.parent_datapoint,
+                segment_timestamp=segment_timestamp,
+                segment_timestamp_end=segment_timestamp_end,
+                is_first_segment=i == 0,
+                is_last_segment=i == len(boundaries) - 1,
+                minimum_distance_km_to_interpolate=self.minimum_distance_km_to_interpolate,
+                minimum_seconds_to_interpolate=self.minimum_seconds_to_interpolate,
+                prepared_trip=prepared_trip,
+                share_parent=self.share_parent,
+                read_only=self.read_only,
+                simplify_tolerance_m=self.simplify_tolerance_m,
+                encode_trail=self.encode_trail,
+                trail_precision=self.trail_precision
+            )
+            for i, (segment_timestamp, segment_timestamp_end) in enumerate(boundaries)
+        ]
+        if len(segments) == 0:
+            return segments
+
+        starts = np.array([segment.segment_timestamp for segment in segments])
+        ends = np.array([segment.segment_timestamp_end for segment in segments])
+        first_trail_idx = np.searchsorted(trail_array.timestamps, starts, side="left")
+        last_trail_idx = np.searchsorted(trail_array.timestamps, ends, side="right") - 1
+        first_event_idx = np.searchsorted(event_index.timestamps, starts, side="left")
+        last_event_idx = np.searchsorted(event_index.timestamps, ends, side="right") - 1
+
+        for i, segment in enumerate(segments):
+            segment.trail_window = (int(first_trail_idx[i]), int(last_trail_idx[i]))
+            segment.event_window = (int(first_event_idx[i]), int(last_event_idx[i]))
+
+        if segment_core.is_accelerated_core_enabled():
+            located = self.locate_segments(prepared_trip, segments, starts, ends, first_trail_idx, last_trail_idx)
+        else:
+            located = [segment.locate_segment_trail() for segment in segments]
+        # All the boundary interpolations of the trip are computed at once
+        requests = [request for bounds in located for request in bounds[2:] if request is not None]
+        points = iter(self.interpolate_boundaries(trail_array, requests))
+        for segment, (trail_start_idx, trail_end_idx, start_request, end_request) in zip(segments, located):
+            start_point = None if start_request is None else next(points)
+            end_point = None if end_request is None else next(points)
+            segment.trail_bounds = (trail_start_idx, trail_end_idx, start_point, end_point)
+        return segments
+
+    def locate_segments(self, prepared_trip: PreparedTrip, segments: List[BaseSegment], starts: np.ndarray,
+                        ends: np.ndarray, first_trail_idx: np.ndarray, last_trail_idx: np.ndarray
+                        ) -> List[Tuple[int, int, Optional[Tuple[int, int]], Optional[Tuple[int, int]]]]:
+        """
+        This method is BaseSegment.locate_segment_trail for all the segments of the trip, run by the compiled core.
+        """
+        trail_start_idx, trail_end_idx, start_request_idx, end_request_idx, is_located = segment_core.locate_segments(
+            timestamps=prepared_trip.timestamps,
+            leg_distances=prepared_trip.leg_distances,
+            starts=starts,
+            ends=ends,
+            first_trail_idx=first_trail_idx,
+            last_trail_idx=last_trail_idx,
+            is_first=[segment.is_first_segment for segment in segments],
+            is_last=[segment.is_last_segment for segment in segments],
+            minimum_distance_km_to_interpolate=self.minimum_distance_km_to_interpolate,
+            minimum_seconds_to_interpolate=self.minimum_seconds_to_interpolate
+        )
+        located = []
+        for segment, start_idx, end_idx, start_request_at, end_request_at, is_segment_located in zip(
+            segments, trail_start_idx.tolist(), trail_end_idx.tolist(), start_request_idx.tolist(),
+            end_request_idx.tolist(), is_located.tolist()
+        ):
+            if not is_segment_located:
+                raise Exception(f"Unable to segment trail for {segment.segment_timestamp}")
+            start_request = None if start_request_at < 0 else (start_request_at, segment.segment_timestamp)
+            end_request = None if end_request_at < 0 else (end_request_at, segment.segment_timestamp_end)
+            segment.is_start_interpolated = start_request is not None
+            segment.is_end_interpolated = end_request is not None
+            located.append((start_idx, end_idx, start_request, end_request))
+        return located
+
+    @staticmethod
+    def interpolate_boundaries(trail_array: TrailArray, requests: Sequence[Tuple[int, int]]
+                               ) -> List[InterpolatedPoint]:
+        """
+        This method interpolates the given (previous trail point index, timestamp) boundary points in a single pass.
+        """
+        if len(requests) == 0:
+            return []
+        previous_idx = np.array([request[0] for request in requests], dtype=np.int64)
+        timestamps = np.array([request[1] for request in requests], dtype=np.float64)
+        latitudes, longitudes, _ = BaseSegment.interpolate_lat_long_many(
+            timestamps=timestamps,
+            previous_point_ts=trail_array.timestamps[previous_idx].astype(np.float64),
+            next_point_ts=trail_array.timestamps[previous_idx + 1].astype(np.float64),
+            prev_lat=trail_array.latitudes[previous_idx],
+            prev_lon=trail_array.longitudes[previous_idx],
+            next_lat=trail_array.latitudes[previous_idx + 1],
+            next_lon=trail_array.longitudes[previous_idx + 1],
+            total_distance=trail_array.leg_distances[previous_idx]
+        )
+        return [
+            InterpolatedPoint(int(idx), float(request[1]), latitude, longitude)
+            for idx, request, latitude, longitude in zip(
+                previous_idx, requests, latitudes.tolist(), longitudes.tolist()
+            )
+        ]
+
+    def split(self, parent_datapoint: Union[Dict[Text, Any], PreparedTrip], boundaries: Sequence[Tuple[int, int]]
+              ) -> List[Dict[Text, Any]]:
+        """
+        This method returns the updated trip datapoints of all the segments of the trip. Every datapoint matches the one
+        returned by BaseSegment.get_updated_trip_datapoint for the same segment.
+        param parent_datapoint: Parent datapoint of the segments, or the prepared trip for it
+        param boundaries: (segment_timestamp, segment_timestamp_end) of every segment, in trip order
+        """
+        return [segment.get_updated_trip_datapoint() for segment in self.get_segments(parent_datapoint, boundaries)]
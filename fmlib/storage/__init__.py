@@ -1,11 +1,31 @@
 # S3 utility functions
 
+import time
+from typing import Optional
+
 import boto3
 from botocore.client import Config
 
 
 # Create an S3 client
 _S3 = None
+# S3 resource, for the Bucket and Object interfaces
+_S3_RESOURCE = None
+# Maximum number of concurrent requests of the transfers
+_MAX_CONCURRENT_REQUESTS = 10
+
+
+def _get_s3_config(region_name: str, timeout: int, retries: int, max_pool_connections: int,
+                   config_class: type = Config) -> Config:
+    """
+    Build the botocore configuration of the S3 client and resource, or of the async client with config_class.
+    """
+    return config_class(
+        connect_timeout=timeout,
+        retries={"max_attempts": retries},
+        max_pool_connections=max_pool_connections,
+        region_name=region_name,
+    )
 
 
 def _initialize_s3(region_name: str, endpoint_url: str, timeout: int = 30, retries: int = 3, max_pool_connections: int = 25) -> boto3.client:
@@ -14,22 +34,29 @@ def _initialize_s3(region_name: str, endpoint_url: str, timeout: int = 30, retri
     """
     try:
         # Create the S3 configuration
-        s3_config = Config(
-            connect_timeout=timeout,
-            retries=retries,
-            max_pool_connections=max_pool_connections,
-            region_name=region_name,
-            endpoint_url=endpoint_url,
-        )
+        s3_config = _get_s3_config(region_name, timeout, retries, max_pool_connections)
 
         # Create the S3 client
-        s3 = boto3.client("s3", config=s3_config)
+        s3 = boto3.client("s3", endpoint_url=endpoint_url, config=s3_config)
         return s3
     except Exception as e:
         # Raise an exception
         raise SystemError(f"Error initializing S3 client: {str(e)}")
 
-def init_s3(region_name: str, endpoint_url: str, timeout: int = 30, retries: int = 3, max_pool_connections: int = 25) -> None:
+
+def _initialize_s3_resource(region_name: str, endpoint_url: str, timeout: int = 30, retries: int = 3, max_pool_connections: int = 25) -> boto3.resource:
+    """
+    Initialize the S3 resource for the application.
+    """
+    try:
+        s3_config = _get_s3_config(region_name, timeout, retries, max_pool_connections)
+        return boto3.resource("s3", endpoint_url=endpoint_url, config=s3_config)
+    except Exception as e:
+        raise SystemError(f"Error initializing S3 resource: {str(e)}")
+
+
+def init_s3(region_name: str, endpoint_url: str, timeout: int = 30, retries: int = 3, max_pool_connections: int = 25,
+            max_concurrent_requests: int = 10) -> None:
     """
     Initialize the S3 client for the application.
 
@@ -39,6 +66,7 @@ def init_s3(region_name: str, endpoint_url: str, timeout: int = 30, retries: int
         timeout (int, optional): The maximum amount of time (in seconds) to wait for a response from the S3 service. Defaults to 30 seconds.
         retries (int, optional): The maximum number of times to retry a request to the S3 service. Defaults to 3 retries.
         max_pool_connections (int, optional): The maximum number of connections to pool for reuse when making requests to the S3 service. Defaults to 25 connections.
+        max_concurrent_requests (int, optional): The maximum number of concurrent requests of the transfers, e.g. S3_MAX_CONCURRENT_REQUESTS. Capped to max_pool_connections. Defaults to 10 requests.
 
     Returns:
         None
@@ -48,9 +76,12 @@ def init_s3(region_name: str, endpoint_url: str, timeout: int = 30, retries: int
         init_s3(region_name="us-east-1", endpoint_url="https://s3.us-east-1.amazonaws.com")
     """
 
-    global _S3
+    global _S3, _S3_RESOURCE, _MAX_CONCURRENT_REQUESTS
     if _S3 is None:
         _S3 = _initialize_s3(region_name, endpoint_url, timeout, retries, max_pool_connections)
+        _S3_RESOURCE = _initialize_s3_resource(region_name, endpoint_url, timeout, retries, max_pool_connections)
+        # Transfers beyond the connection pool size would wait for a connection anyway
+        _MAX_CONCURRENT_REQUESTS = max(1, min(max_concurrent_requests, max_pool_connections))
 
 def get_s3_client() -> boto3.client:
     """
@@ -68,6 +99,28 @@ def get_s3_client() -> boto3.client:
     return _S3
 
 
+def get_s3_resource() -> boto3.resource:
+    """
+    Returns the `boto3.resource` instance to interact with the Amazon S3 service through its Bucket and Object interfaces.
+
+    Args:
+        None
+    Returns:
+        boto3.resource: The S3 resource, sharing the configuration of the S3 client.
+    """
+    global _S3_RESOURCE
+    if _S3_RESOURCE is None:
+        raise SystemError("S3 client has not been initialized")
+    return _S3_RESOURCE
+
+
+def get_max_concurrent_requests() -> int:
+    """
+    Returns the maximum number of concurrent requests of the transfers, as set by init_s3.
+    """
+    return _MAX_CONCURRENT_REQUESTS
+
+
 def get_s3_bucket(bucket_name: str) -> boto3.resource:
     """
     Get an S3 bucket for the application.
@@ -79,7 +132,7 @@ def get_s3_bucket(bucket_name: str) -> boto3.resource:
         boto3.resource: The S3 bucket for the application.
     """
     # Get the S3 resource
-    s3_resource = get_s3_client()
+    s3_resource = get_s3_resource()
 
     # Get the bucket
     bucket = s3_resource.Bucket(bucket_name)
@@ -98,7 +151,7 @@ def get_s3_object(bucket_name: str, key: str) -> boto3.resource:
         boto3.resource: The S3 object for the application.
     """
     # Get the S3 resource
-    s3_resource = get_s3_client()
+    s3_resource = get_s3_resource()
 
     # Get the object
     obj = s3_resource.Object(bucket_name, key)
@@ -109,6 +162,8 @@ def get_s3_object_url(bucket_name: str, key: str, presigned_expiry: int) -> str:
     """
     Get a pre-signed URL for an object in an S3 bucket.
 
+    URLs are reused from the presigned URL cache while they are valid for long enough, see set_presigned_url_cache.
+
     Args:
         bucket_name (str): The name of the S3 bucket.
         key (str): The key of the object in the S3 bucket.
@@ -117,10 +172,80 @@ def get_s3_object_url(bucket_name: str, key: str, presigned_expiry: int) -> str:
     Returns:
         str: The generated pre-signed URL for the specified object in the specified bucket.
     """
+    cache = get_presigned_url_cache()
+    if cache is not None:
+        obj_url = cache.get(bucket_name, key, presigned_expiry)
+        if obj_url is not None:
+            return obj_url
+
+    signed_at = time.time()
     s3_client = get_s3_client()  # Get the S3 client
     obj_url = s3_client.generate_presigned_url(
         "get_object",
         Params={"Bucket": bucket_name, "Key": key},
         ExpiresIn=presigned_expiry,
     )  # Generate the pre-signed URL
+    if cache is not None:
+        cache.set(bucket_name, key, presigned_expiry, obj_url, signed_at=signed_at)
     return obj_url
+
+
+TRAIL_CONTENT_TYPE = "application/vnd.fm.trail"
+
+
+def put_s3_trail(bucket_name: str, key: str, trail: list, precision: Optional[int] = None) -> None:
+    """
+    Upload a trail to S3 in the compact trail encoding of fmlib.osm_handler.
+
+    Requires the fmlib/osm_handler requirements.
+
+    Args:
+        bucket_name (str): The name of the S3 bucket.
+        key (str): The key of the object in the S3 bucket.
+        trail (list): The trail point dicts, or a TrailArray.
+        precision (int, optional): Decimal digits the coordinates are rounded to, for a smaller object (7 is about
+            a centimetre). Defaults to None, which stores the trail losslessly.
+
+    Returns:
+        None
+
+    Example Usage:
+        put_s3_trail(bucket_name="trips", key=f"{trip_id}/trail", trail=datapoint["trail"])
+    """
+    from ..osm_handler.trail_codec import encode_trail
+
+    get_s3_client().put_object(
+        Bucket=bucket_name,
+        Key=key,
+        Body=encode_trail(trail, precision=precision),
+        ContentType=TRAIL_CONTENT_TYPE,
+    )
+
+
+def get_s3_trail(bucket_name: str, key: str) -> list:
+    """
+    Download a trail uploaded by put_s3_trail.
+
+    Requires the fmlib/osm_handler requirements.
+
+    Args:
+        bucket_name (str): The name of the S3 bucket.
+        key (str): The key of the object in the S3 bucket.
+
+    Returns:
+        list: The trail point dicts.
+    """
+    from ..osm_handler.trail_codec import decode_trail
+
+    response = get_s3_client().get_object(Bucket=bucket_name, Key=key)
+    return decode_trail(response["Body"].read()).to_dicts()
+
+
+from .transfer import (  # noqa: E402
+    download_s3_bytes, download_s3_file, download_s3_files, get_transfer_config, upload_s3_bytes, upload_s3_file,
+    upload_s3_files
+)
+from .streaming import iter_s3_chunks, iter_s3_into, iter_s3_lines, open_s3_stream, readinto_s3  # noqa: E402
+from .cache import S3DiskCache  # noqa: E402
+from .presigned import PresignedUrlCache, get_presigned_url_cache, set_presigned_url_cache  # noqa: E402
+from .async_client import AsyncS3, gather_limited  # noqa: E402
@@ -0,0 +1,201 @@
+# Async S3 functions: asyncio-native S3 client, with batch helpers bounded in concurrency
+
+import asyncio
+from typing import Any, Awaitable, Dict, Iterable, List, Mapping, Optional
+
+from . import _get_s3_config
+
+try:
+    from aiobotocore.config import AioConfig
+    from aiobotocore.session import get_session
+except ImportError:  # pragma: no cover
+    AioConfig = get_session = None
+
+
+async def gather_limited(awaitables: Iterable[Awaitable], limit: int, return_exceptions: bool = False) -> List[Any]:
+    """
+    Await awaitables, like asyncio.gather, with at most limit of them running at once.
+
+    Args:
+        awaitables (Iterable[Awaitable]): The awaitables, e.g. coroutines. Coroutines only start once a slot is free.
+        limit (int): The maximum number of awaitables running at once.
+        return_exceptions (bool, optional): Whether to return the exceptions raised in place of the results, or to raise the first one. Defaults to False.
+
+    Returns:
+        List[Any]: The results, in the order of the awaitables.
+    """
+    if limit <= 0:
+        raise ValueError("limit must be positive")
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(awaitable: Awaitable) -> Any:
+        async with semaphore:
+            return await awaitable
+
+    return await asyncio.gather(*(run(awaitable) for awaitable in awaitables), return_exceptions=return_exceptions)
+
+
+class AsyncS3:
+    """
+    Async S3 client, built on aiobotocore, with the configuration knobs of init_s3. Requests are sent on the event
+    loop, without a thread per request, so a single process can keep hundreds of them in flight: raise
+    max_pool_connections along with max_concurrent_requests, as requests beyond the connection pool wait for a
+    connection. Use it as an async context manager, which opens and closes the connection pool.
+
+    Requires aiobotocore.
+
+    Example Usage:
+        async with AsyncS3(region_name="us-east-1", endpoint_url="https://s3.us-east-1.amazonaws.com") as s3:
+            contents = await s3.get_objects(bucket_name="trips", keys=keys)
+    """
+
+    def __init__(self, region_name: str, endpoint_url: str, timeout: int = 30, retries: int = 3,
+                 max_pool_connections: int = 25, max_concurrent_requests: int = 10):
+        """
+        Args:
+            region_name (str): The name of the AWS region where the S3 bucket is located.
+            endpoint_url (str): The URL of the S3 service endpoint.
+            timeout (int, optional): The maximum amount of time (in seconds) to wait for a response from the S3 service. Defaults to 30 seconds.
+            retries (int, optional): The maximum number of times to retry a request to the S3 service. Defaults to 3 retries.
+            max_pool_connections (int, optional): The maximum number of connections to pool for reuse when making requests to the S3 service. Defaults to 25 connections.
+            max_concurrent_requests (int, optional): The maximum number of concurrent requests of the batch methods, e.g. S3_MAX_CONCURRENT_REQUESTS. Defaults to 10 requests.
+        """
+        if get_session is None:
+            raise SystemError("The async S3 client requires aiobotocore")
+        self.region_name = region_name
+        self.endpoint_url = endpoint_url
+        self.config = _get_s3_config(region_name, timeout, retries, max_pool_connections, config_class=AioConfig)
+        self.max_concurrent_requests = max(1, max_concurrent_requests)
+        self._client_context = None
+        self._client = None
+
+    async def __aenter__(self) -> "AsyncS3":
+        self._client_context = get_session().create_client(
+            "s3", region_name=self.region_name, endpoint_url=self.endpoint_url, config=self.config
+        )
+        self._client = await self._client_context.__aenter__()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        await self._client_context.__aexit__(exc_type, exc_value, traceback)
+        self._client_context = self._client = None
+
+    @property
+    def client(self):
+        """
+        The aiobotocore S3 client, for the operations without a method here.
+        """
+        if self._client is None:
+            raise SystemError("Async S3 client has not been opened, use it as an async context manager")
+        return self._client
+
+    async def get_object(self, bucket_name: str, key: str) -> bytes:
+        """
+        Get the content of an S3 object.
+
+        Args:
+            bucket_name (str): The name of the S3 bucket.
+            key (str): The key of the object in the S3 bucket.
+
+        Returns:
+            bytes: The content of the object.
+        """
+        response = await self.client.get_object(Bucket=bucket_name, Key=key)
+        async with response["Body"] as body:
+            return await body.read()
+
+    async def list_keys(self, bucket_name: str, prefix: str = "") -> List[str]:
+        """
+        List the keys of the objects of an S3 bucket, over as many list_objects_v2 pages as needed.
+
+        Args:
+            bucket_name (str): The name of the S3 bucket.
+            prefix (str, optional): The prefix of the keys to list. Defaults to all the keys.
+
+        Returns:
+            List[str]: The keys, in the order S3 lists them.
+        """
+        keys = []
+        async for page in self.client.get_paginator("list_objects_v2").paginate(Bucket=bucket_name, Prefix=prefix):
+            keys.extend(item["Key"] for item in page.get("Contents", []))
+        return keys
+
+    async def head_object(self, bucket_name: str, key: str) -> Dict[str, Any]:
+        """
+        Get the metadata of an S3 object.
+
+        Args:
+            bucket_name (str): The name of the S3 bucket.
+            key (str): The key of the object in the S3 bucket.
+
+        Returns:
+            Dict[str, Any]: The head_object response, e.g. ContentLength and ETag.
+        """
+        return await self.client.head_object(Bucket=bucket_name, Key=key)
+
+    async def put_object(self, bucket_name: str, key: str, body: bytes, extra_args: Optional[dict] = None) -> None:
+        """
+        Upload the content of an S3 object.
+
+        Args:
+            bucket_name (str): The name of the S3 bucket.
+            key (str): The key of the object in the S3 bucket.
+            body (bytes): The content of the object.
+            extra_args (dict, optional): Extra arguments of put_object, e.g. {"ContentType": "application/json"}.
+
+        Returns:
+            None
+        """
+        await self.client.put_object(Bucket=bucket_name, Key=key, Body=body, **(extra_args or {}))
+
+    async def gather(self, awaitables: Iterable[Awaitable], return_exceptions: bool = False) -> List[Any]:
+        """
+        Await awaitables with at most max_concurrent_requests of them running at once, see gather_limited.
+        """
+        return await gather_limited(awaitables, self.max_concurrent_requests, return_exceptions=return_exceptions)
+
+    async def get_objects(self, bucket_name: str, keys: Iterable[str], return_exceptions: bool = False) -> List[Any]:
+        """
+        Get the content of many S3 objects, with at most max_concurrent_requests requests in flight.
+
+        Args:
+            bucket_name (str): The name of the S3 bucket.
+            keys (Iterable[str]): The keys of the objects in the S3 bucket.
+            return_exceptions (bool, optional): Whether to return the exceptions raised in place of the contents, or to raise the first one. Defaults to False.
+
+        Returns:
+            List[Any]: The contents, in the order of the keys.
+        """
+        return await self.gather((self.get_object(bucket_name, key) for key in keys), return_exceptions)
+
+    async def head_objects(self, bucket_name: str, keys: Iterable[str], return_exceptions: bool = False) -> List[Any]:
+        """
+        Get the metadata of many S3 objects, with at most max_concurrent_requests requests in flight.
+
+        Args:
+            bucket_name (str): The name of the S3 bucket.
+            keys (Iterable[str]): The keys of the objects in the S3 bucket.
+            return_exceptions (bool, optional): Whether to return the exceptions raised in place of the responses, or to raise the first one. Defaults to False.
+
+        Returns:
+            List[Any]: The head_object responses, in the order of the keys.
+        """
+        return await self.gather((self.head_object(bucket_name, key) for key in keys), return_exceptions)
+
+    async def put_objects(self, bucket_name: str, bodies: Mapping[str, bytes], extra_args: Optional[dict] = None,
+                          return_exceptions: bool = False) -> List[Any]:
+        """
+        Upload many S3 objects, with at most max_concurrent_requests requests in flight.
+
+        Args:
+            bucket_name (str): The name of the S3 bucket.
+            bodies (Mapping[str, bytes]): The contents of the objects, by key of the object in the S3 bucket.
+            extra_args (dict, optional): Extra arguments of every put_object, e.g. {"ContentType": "application/json"}.
+            return_exceptions (bool, optional): Whether to return the exceptions raised, or to raise the first one. Defaults to False.
+
+        Returns:
+            List[Any]: None for every object uploaded, or the exception raised, in the order of the keys.
+        """
+        return await self.gather(
+            (self.put_object(bucket_name, key, body, extra_args) for key, body in bodies.items()), return_exceptions
+        )
@@ -0,0 +1,181 @@
+# S3 disk cache: local copies of S3 objects, shared by the processes of a host
+
+import hashlib
+import mmap
+import os
+import shutil
+import tempfile
+import time
+from typing import Optional, Union
+
+from ..fmlogger import FMLogger
+from . import get_s3_client
+
+log = FMLogger.logger(__name__)
+
+# Prefix of the files being downloaded, never served nor evicted until they are stale
+_TEMPORARY_PREFIX = ".tmp-"
+# Age in seconds after which a temporary file is left over from a killed process
+_STALE_TEMPORARY_AGE_S = 3600
+_COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class S3DiskCache:
+    """
+    Local disk cache of S3 objects, keyed by bucket, key and ETag, so an object updated in S3 is downloaded again.
+
+    Files are written to a temporary file then renamed into place, so the processes of a host, e.g. gunicorn workers,
+    can share a directory. The least recently used objects are evicted once the cache grows over max_bytes, with the
+    modification time of a file as its last use. Objects are read through mmap, so they are shared through the page
+    cache rather than copied into every process.
+
+    Hits and misses are counted in hits and misses, and sent to FMStatsd as <metric_prefix>.hit and
+    <metric_prefix>.miss when an FMStatsd is given.
+
+    Example Usage:
+        cache = S3DiskCache(directory="/var/cache/s3", max_bytes=2 * 1024 ** 3, fmstatsd=fmstatsd)
+        data = cache.get(bucket_name="fairmatic-data", key="fairmatic/v1/reference/zones.json")
+    """
+
+    def __init__(self, directory: str, max_bytes: int, fmstatsd=None, metric_prefix: str = "s3_cache"):
+        """
+        Args:
+            directory (str): The directory of the cache. It is created if it does not exist.
+            max_bytes (int): The size in bytes the cache is evicted down to.
+            fmstatsd (FMStatsd, optional): The FMStatsd to send the hit and miss counters to. Defaults to None.
+            metric_prefix (str, optional): The prefix of the metrics. Defaults to "s3_cache".
+        """
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be positive")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.fmstatsd = fmstatsd
+        self.metric_prefix = metric_prefix
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def get_path(self, bucket_name: str, key: str, etag: Optional[str] = None) -> str:
+        """
+        Get the path of the local copy of an S3 object, downloading it on a miss.
+
+        Args:
+            bucket_name (str): The name of the S3 bucket.
+            key (str): The key of the object in the S3 bucket.
+            etag (str, optional): The ETag of the object, if known. Defaults to None, to get it with a HEAD request.
+
+        Returns:
+            str: The path of the local copy. It may be evicted by another process, open it right away.
+        """
+        if etag is None:
+            etag = get_s3_client().head_object(Bucket=bucket_name, Key=key)["ETag"]
+        path = os.path.join(self.directory, self._get_filename(bucket_name, key, etag))
+        try:
+            # Mark the object as recently used
+            os.utime(path)
+            self._count("hit", bucket_name)
+            return path
+        except FileNotFoundError:
+            pass
+
+        self._count("miss", bucket_name)
+        fd, temporary_path = tempfile.mkstemp(dir=self.directory, prefix=_TEMPORARY_PREFIX)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                # IfMatch fails the download, rather than caching another version of the object under this ETag
+                response = get_s3_client().get_object(Bucket=bucket_name, Key=key, IfMatch=etag)
+                shutil.copyfileobj(response["Body"], f, _COPY_BUFFER_SIZE)
+            os.replace(temporary_path, path)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+        self.evict()
+        return path
+
+    def get(self, bucket_name: str, key: str, etag: Optional[str] = None) -> Union[mmap.mmap, bytes]:
+        """
+        Get the content of an S3 object from the cache, downloading it on a miss.
+
+        Args:
+            bucket_name (str): The name of the S3 bucket.
+            key (str): The key of the object in the S3 bucket.
+            etag (str, optional): The ETag of the object, if known. Defaults to None, to get it with a HEAD request.
+
+        Returns:
+            Union[mmap.mmap, bytes]: A read-only memory map of the local copy, or b"" for an empty object. It stays
+            valid after the local copy is evicted.
+        """
+        try:
+            f = open(self.get_path(bucket_name, key, etag=etag), "rb")
+        except FileNotFoundError:
+            # Evicted by another process between get_path and open, downloaded again
+            f = open(self.get_path(bucket_name, key, etag=etag), "rb")
+        with f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def evict(self) -> int:
+        """
+        Delete the least recently used objects until the cache fits in max_bytes, along with stale temporary files.
+
+        Returns:
+            int: The number of bytes freed.
+        """
+        entries, total_bytes = [], 0
+        now = time.time()
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    # Evicted by another process
+                    continue
+                if entry.name.startswith(_TEMPORARY_PREFIX):
+                    if now - stat.st_mtime > _STALE_TEMPORARY_AGE_S:
+                        self._remove(entry.path)
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_bytes += stat.st_size
+
+        freed_bytes = 0
+        for _, size, path in sorted(entries):
+            if total_bytes - freed_bytes <= self.max_bytes:
+                break
+            if self._remove(path):
+                freed_bytes += size
+        return freed_bytes
+
+    def clear(self) -> None:
+        """
+        Delete all the objects of the cache.
+        """
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.startswith(_TEMPORARY_PREFIX):
+                    self._remove(entry.path)
+
+    @staticmethod
+    def _get_filename(bucket_name: str, key: str, etag: str) -> str:
+        return hashlib.sha256("\0".join((bucket_name, key, etag)).encode()).hexdigest()
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _count(self, result: str, bucket_name: str) -> None:
+        if result == "hit":
+            self.hits += 1
+        else:
+            self.misses += 1
+        if self.fmstatsd is None:
+            return
+        try:
+            self.fmstatsd.increment(f"{self.metric_prefix}.{result}", tags={"bucket": bucket_name})
+        except Exception:
+            log.error(f"Statsd Error :: S3 cache {result}")
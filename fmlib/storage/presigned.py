@@ -0,0 +1,172 @@
+# Presigned URL cache: reuse of the presigned URLs still valid, instead of signing a new one on every call
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from ..fmlogger import FMLogger
+
+log = FMLogger.logger(__name__)
+
+DEFAULT_MAX_SIZE = 10000
+DEFAULT_SAFETY_MARGIN_S = 300
+DEFAULT_REDIS_PREFIX = "fmlib:s3:presigned:"
+
+
+class PresignedUrlCache:
+    """
+    LRU cache of presigned URLs, keyed by bucket, key and expiry. A URL is reused until safety_margin_s seconds
+    before it expires, so every URL returned is valid for at least safety_margin_s seconds.
+
+    With a Redis client, URLs are also shared across processes: a URL missing in the process is looked up in Redis
+    before a new one is signed, and new URLs are stored in Redis until they stop being reusable. Redis errors are
+    logged and the cache falls back to signing.
+
+    Example Usage:
+        set_presigned_url_cache(PresignedUrlCache(max_size=50000, redis_client=redis.Redis.from_url(redis_url)))
+    """
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, safety_margin_s: int = DEFAULT_SAFETY_MARGIN_S,
+                 redis_client=None, redis_prefix: str = DEFAULT_REDIS_PREFIX):
+        """
+        Args:
+            max_size (int, optional): The maximum number of URLs kept in the process. Defaults to 10000.
+            safety_margin_s (int, optional): The minimum validity in seconds left of the URLs returned. Defaults to 300 seconds.
+            redis_client (redis.Redis, optional): The Redis client to share the URLs across processes with. Defaults to None.
+            redis_prefix (str, optional): The prefix of the Redis keys. Defaults to "fmlib:s3:presigned:".
+        """
+        if max_size <= 0:
+            raise ValueError("max_size must be positive")
+        if safety_margin_s < 0:
+            raise ValueError("safety_margin_s must not be negative")
+        self.max_size = max_size
+        self.safety_margin_s = safety_margin_s
+        self.redis_client = redis_client
+        self.redis_prefix = redis_prefix
+        self._urls = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, bucket_name: str, key: str, presigned_expiry: int) -> Optional[str]:
+        """
+        Get a URL presigned for an object with the given expiry, if one is still reusable.
+
+        Args:
+            bucket_name (str): The name of the S3 bucket.
+            key (str): The key of the object in the S3 bucket.
+            presigned_expiry (int): The expiry time in seconds the URL was presigned with.
+
+        Returns:
+            Optional[str]: The presigned URL, or None.
+        """
+        cache_key = (bucket_name, key, presigned_expiry)
+        now = time.time()
+        with self._lock:
+            entry = self._urls.get(cache_key)
+            if entry is not None:
+                url, expires_at = entry
+                if now < expires_at - self.safety_margin_s:
+                    self._urls.move_to_end(cache_key)
+                    return url
+                del self._urls[cache_key]
+
+        if self.redis_client is None:
+            return None
+        try:
+            value = self.redis_client.get(self._get_redis_key(cache_key))
+        except Exception:
+            log.error("Presigned URL cache :: Redis get failed", exc_info=True)
+            return None
+        if value is None:
+            return None
+        try:
+            url, expires_at = json.loads(value)
+            if not isinstance(url, str):
+                raise TypeError(f"URL is a {type(url).__name__}")
+            expired = now >= float(expires_at) - self.safety_margin_s
+        except (TypeError, ValueError):
+            # Not written by this cache, or corrupted: treated as a miss, and dropped so the next set replaces it
+            log.error("Presigned URL cache :: Invalid Redis value", exc_info=True)
+            self._delete_redis_key(cache_key)
+            return None
+        if expired:
+            return None
+        self._put(cache_key, (url, expires_at))
+        return url
+
+    def set(self, bucket_name: str, key: str, presigned_expiry: int, url: str, signed_at: Optional[float] = None) -> None:
+        """
+        Cache a URL presigned for an object.
+
+        Args:
+            bucket_name (str): The name of the S3 bucket.
+            key (str): The key of the object in the S3 bucket.
+            presigned_expiry (int): The expiry time in seconds the URL was presigned with.
+            url (str): The presigned URL.
+            signed_at (float, optional): The time the URL was presigned at, as a Unix timestamp. Defaults to now.
+
+        Returns:
+            None
+        """
+        expires_at = (time.time() if signed_at is None else signed_at) + presigned_expiry
+        reusable_s = int(expires_at - self.safety_margin_s - time.time())
+        if reusable_s <= 0:
+            # The URL is never reusable
+            return
+        cache_key = (bucket_name, key, presigned_expiry)
+        self._put(cache_key, (url, expires_at))
+        if self.redis_client is None:
+            return
+        try:
+            self.redis_client.set(self._get_redis_key(cache_key), json.dumps([url, expires_at]), ex=reusable_s)
+        except Exception:
+            log.error("Presigned URL cache :: Redis set failed", exc_info=True)
+
+    def clear(self) -> None:
+        """
+        Drop the URLs cached in the process.
+        """
+        with self._lock:
+            self._urls.clear()
+
+    def _put(self, cache_key: Tuple[str, str, int], entry: Tuple[str, float]) -> None:
+        with self._lock:
+            self._urls[cache_key] = entry
+            self._urls.move_to_end(cache_key)
+            while len(self._urls) > self.max_size:
+                self._urls.popitem(last=False)
+
+    def _delete_redis_key(self, cache_key: Tuple[str, str, int]) -> None:
+        try:
+            self.redis_client.delete(self._get_redis_key(cache_key))
+        except Exception:
+            log.error("Presigned URL cache :: Redis delete failed", exc_info=True)
+
+    def _get_redis_key(self, cache_key: Tuple[str, str, int]) -> str:
+        return self.redis_prefix + hashlib.sha256(json.dumps(cache_key).encode()).hexdigest()
+
+
+_PRESIGNED_URL_CACHE = PresignedUrlCache()
+
+
+def get_presigned_url_cache() -> Optional[PresignedUrlCache]:
+    """
+    Returns the presigned URL cache of get_s3_object_url, None if disabled.
+    """
+    return _PRESIGNED_URL_CACHE
+
+
+def set_presigned_url_cache(cache: Optional[PresignedUrlCache]) -> None:
+    """
+    Set the presigned URL cache of get_s3_object_url. By default, a PresignedUrlCache local to the process.
+
+    Args:
+        cache (PresignedUrlCache, optional): The cache, or None to sign a new URL on every call.
+
+    Returns:
+        None
+    """
+    global _PRESIGNED_URL_CACHE
+    _PRESIGNED_URL_CACHE = cache
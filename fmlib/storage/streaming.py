@@ -0,0 +1,194 @@
+# S3 streaming functions: constant memory reads of large objects, in chunks, lines or preallocated buffers
+
+import gzip
+import io
+from typing import Any, BinaryIO, Iterator, Optional, Union
+
+from . import get_s3_client
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# Values of the compression argument
+AUTO, GZIP, ZSTD = "auto", "gzip", "zstd"
+
+
+class _S3BodyStream(io.RawIOBase):
+    """
+    Raw binary stream over the Body of an S3 get_object response, read straight into the caller's buffers.
+    """
+    def __init__(self, body: Any):
+        self._body = body
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._body.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self) -> None:
+        self._body.close()
+        super().close()
+
+
+def _detect_compression(stream: io.BufferedReader, content_encoding: Optional[str]) -> Optional[str]:
+    if content_encoding in (GZIP, ZSTD):
+        return content_encoding
+    magic = stream.peek(len(ZSTD_MAGIC))
+    if magic[:len(GZIP_MAGIC)] == GZIP_MAGIC:
+        return GZIP
+    if magic[:len(ZSTD_MAGIC)] == ZSTD_MAGIC:
+        return ZSTD
+    return None
+
+
+def open_s3_stream(bucket_name: str, key: str, compression: Optional[str] = AUTO, byte_range: Optional[str] = None,
+                   buffer_size: int = DEFAULT_CHUNK_SIZE) -> BinaryIO:
+    """
+    Open a binary stream over an S3 object, without loading it into memory.
+
+    Args:
+        bucket_name (str): The name of the S3 bucket.
+        key (str): The key of the object in the S3 bucket.
+        compression (str, optional): "gzip", "zstd", None for no decompression, or "auto" to detect it from the
+            ContentEncoding of the object or its first bytes. Defaults to "auto". zstd requires the zstandard package.
+        byte_range (str, optional): The HTTP range of the object to read, e.g. "bytes=0-1023". Defaults to the whole object.
+        buffer_size (int, optional): The size in bytes of the read buffer. Defaults to 1 MB.
+
+    Returns:
+        BinaryIO: The stream of the, possibly decompressed, content of the object. Close it when done, or use it as a context manager.
+
+    Example Usage:
+        with open_s3_stream(bucket_name="trips", key="archives/2023-11.ndjson.gz") as stream:
+            for line in stream:
+                ...
+    """
+    if compression not in (AUTO, GZIP, ZSTD, None):
+        raise ValueError(f"Unsupported compression: {compression}")
+    if compression == ZSTD and zstandard is None:
+        raise ValueError("zstd decompression requires zstandard")
+
+    params = {"Bucket": bucket_name, "Key": key}
+    if byte_range is not None:
+        params["Range"] = byte_range
+    response = get_s3_client().get_object(**params)
+    stream = io.BufferedReader(_S3BodyStream(response["Body"]), buffer_size=buffer_size)
+
+    if compression == AUTO:
+        compression = _detect_compression(stream, response.get("ContentEncoding"))
+    if compression == GZIP:
+        return io.BufferedReader(gzip.GzipFile(fileobj=stream, mode="rb"), buffer_size=buffer_size)
+    if compression == ZSTD:
+        if zstandard is None:
+            stream.close()
+            raise ValueError("zstd decompression requires zstandard")
+        return io.BufferedReader(
+            zstandard.ZstdDecompressor().stream_reader(stream, read_size=buffer_size), buffer_size=buffer_size
+        )
+    return stream
+
+
+def iter_s3_chunks(bucket_name: str, key: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                   compression: Optional[str] = AUTO) -> Iterator[bytes]:
+    """
+    Iterate over the content of an S3 object in chunks.
+
+    Args:
+        bucket_name (str): The name of the S3 bucket.
+        key (str): The key of the object in the S3 bucket.
+        chunk_size (int, optional): The size in bytes of the chunks, all but the last one. Defaults to 1 MB.
+        compression (str, optional): The decompression of the content, as in open_s3_stream. Defaults to "auto".
+
+    Returns:
+        Iterator[bytes]: The chunks of the content.
+    """
+    with open_s3_stream(bucket_name, key, compression=compression, buffer_size=chunk_size) as stream:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def iter_s3_lines(bucket_name: str, key: str, compression: Optional[str] = AUTO,
+                  encoding: Optional[str] = None) -> Iterator[Union[bytes, str]]:
+    """
+    Iterate over the lines of an S3 object, e.g. an NDJSON trip dump.
+
+    Args:
+        bucket_name (str): The name of the S3 bucket.
+        key (str): The key of the object in the S3 bucket.
+        compression (str, optional): The decompression of the content, as in open_s3_stream. Defaults to "auto".
+        encoding (str, optional): The encoding to decode the lines with, e.g. "utf-8". Defaults to None, for bytes.
+
+    Returns:
+        Iterator[Union[bytes, str]]: The lines, with their line endings.
+    """
+    with open_s3_stream(bucket_name, key, compression=compression) as stream:
+        if encoding is None:
+            yield from stream
+        else:
+            yield from io.TextIOWrapper(stream, encoding=encoding, newline="")
+
+
+def readinto_s3(stream: BinaryIO, buffer: Union[bytearray, memoryview]) -> int:
+    """
+    Fill a preallocated buffer from a stream opened by open_s3_stream, reading until it is full or the stream ends.
+
+    Args:
+        stream (BinaryIO): The stream to read.
+        buffer (Union[bytearray, memoryview]): The writable buffer to fill.
+
+    Returns:
+        int: The number of bytes read, less than the size of the buffer only at the end of the stream.
+    """
+    view = memoryview(buffer).cast("B")
+    filled = 0
+    while filled < len(view):
+        count = stream.readinto(view[filled:])
+        if not count:
+            break
+        filled += count
+    return filled
+
+
+def iter_s3_into(bucket_name: str, key: str, buffer: Union[bytearray, memoryview],
+                 compression: Optional[str] = AUTO) -> Iterator[memoryview]:
+    """
+    Iterate over the content of an S3 object through a single preallocated buffer, so no chunk is allocated per read.
+
+    Each view yielded is over the buffer, and is overwritten by the next one: copy what must outlive the iteration.
+
+    Args:
+        bucket_name (str): The name of the S3 bucket.
+        key (str): The key of the object in the S3 bucket.
+        buffer (Union[bytearray, memoryview]): The writable buffer to read into.
+        compression (str, optional): The decompression of the content, as in open_s3_stream. Defaults to "auto".
+
+    Returns:
+        Iterator[memoryview]: Views of the filled part of the buffer.
+
+    Example Usage:
+        buffer = bytearray(8 * 1024 * 1024)
+        for view in iter_s3_into(bucket_name="trips", key="archives/2023-11.bin", buffer=buffer):
+            digest.update(view)
+    """
+    view = memoryview(buffer).cast("B")
+    if len(view) == 0:
+        raise ValueError("The buffer must not be empty")
+    with open_s3_stream(bucket_name, key, compression=compression, buffer_size=len(view)) as stream:
+        while True:
+            count = readinto_s3(stream, view)
+            if count == 0:
+                return
+            yield view[:count]
+            if count < len(view):
+                return
@@ -0,0 +1,32 @@
+import pytest
+
+import fmlib.storage as storage
+
+BUCKET_NAME = "fmlib-test-bucket"
+
+
+@pytest.fixture(autouse=True)
+def aws_credentials(monkeypatch):
+    """
+    Fake AWS credentials, so that no test can reach AWS.
+    """
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+
+
+@pytest.fixture
+def s3_client(monkeypatch):
+    """
+    The S3 client of fmlib.storage, initialised against moto, with an empty bucket named BUCKET_NAME.
+    """
+    moto = pytest.importorskip("moto")
+
+    with moto.mock_s3():
+        monkeypatch.setattr(storage, "_S3", None)
+        monkeypatch.setattr(storage, "_S3_RESOURCE", None)
+        monkeypatch.setattr(storage, "_MAX_CONCURRENT_REQUESTS", storage._MAX_CONCURRENT_REQUESTS)
+        storage.init_s3(region_name="us-east-1", endpoint_url=None, max_concurrent_requests=4)
+        client = storage.get_s3_client()
+        client.create_bucket(Bucket=BUCKET_NAME)
+        yield client
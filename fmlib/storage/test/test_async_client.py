@@ -0,0 +1,136 @@
+import asyncio
+import socket
+
+import pytest
+
+from fmlib.storage import AsyncS3, gather_limited
+
+pytest.importorskip("aiobotocore")
+
+BUCKET_NAME = "fmlib-async-test-bucket"
+
+
+@pytest.fixture(scope="module")
+def endpoint_url():
+    """
+    The URL of a moto server, as aiobotocore requests are not intercepted by moto's in-process mock.
+    """
+    server_module = pytest.importorskip("moto.server")
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = server_module.ThreadedMotoServer(ip_address="127.0.0.1", port=port, verbose=False)
+    server.start()
+    yield f"http://127.0.0.1:{port}"
+    server.stop()
+
+
+def run(endpoint_url, test, **kwargs):
+    """
+    This method runs a test coroutine with an AsyncS3 opened on the moto server and a fresh bucket.
+    """
+    async def main():
+        async with AsyncS3(region_name="us-east-1", endpoint_url=endpoint_url, **kwargs) as s3:
+            await s3.client.create_bucket(Bucket=BUCKET_NAME)
+            try:
+                return await test(s3)
+            finally:
+                for key in await s3.list_keys(BUCKET_NAME):
+                    await s3.client.delete_object(Bucket=BUCKET_NAME, Key=key)
+                await s3.client.delete_bucket(Bucket=BUCKET_NAME)
+
+    return asyncio.run(main())
+
+
+def test_put_get_and_head(endpoint_url):
+    async def test(s3):
+        await s3.put_object(BUCKET_NAME, "a.json", b'{"a": 1}', extra_args={"ContentType": "application/json"})
+        head = await s3.head_object(BUCKET_NAME, "a.json")
+        return await s3.get_object(BUCKET_NAME, "a.json"), head["ContentLength"], head["ContentType"]
+
+    assert run(endpoint_url, test) == (b'{"a": 1}', 8, "application/json")
+
+
+def test_list_keys_over_pages(endpoint_url):
+    keys = [f"trips/{i:04d}" for i in range(1005)]
+
+    async def test(s3):
+        await s3.put_objects(BUCKET_NAME, {key: b"x" for key in keys})
+        await s3.put_object(BUCKET_NAME, "other", b"x")
+        return await s3.list_keys(BUCKET_NAME, prefix="trips/")
+
+    assert run(endpoint_url, test, max_pool_connections=50, max_concurrent_requests=50) == keys
+
+
+def test_batch_methods_keep_the_order_and_return_exceptions(endpoint_url):
+    bodies = {f"k{i}": str(i).encode() for i in range(40)}
+
+    async def test(s3):
+        assert await s3.put_objects(BUCKET_NAME, bodies) == [None] * len(bodies)
+        contents = await s3.get_objects(BUCKET_NAME, list(bodies))
+        heads = await s3.head_objects(BUCKET_NAME, ["k1", "missing"], return_exceptions=True)
+        with pytest.raises(Exception):
+            await s3.get_objects(BUCKET_NAME, ["k1", "missing"])
+        return contents, heads
+
+    contents, heads = run(endpoint_url, test)
+
+    assert contents == list(bodies.values())
+    assert heads[0]["ContentLength"] == 1
+    assert isinstance(heads[1], Exception)
+
+
+def test_gather_bounds_the_requests_in_flight(endpoint_url):
+    in_flight, peaks = 0, []
+
+    async def test(s3):
+        await s3.put_objects(BUCKET_NAME, {f"k{i}": b"x" for i in range(30)})
+
+        async def get(key):
+            nonlocal in_flight
+            in_flight += 1
+            peaks.append(in_flight)
+            try:
+                return await s3.get_object(BUCKET_NAME, key)
+            finally:
+                in_flight -= 1
+
+        return await s3.gather(get(f"k{i}") for i in range(30))
+
+    assert run(endpoint_url, test, max_concurrent_requests=5) == [b"x"] * 30
+    assert max(peaks) == 5
+
+
+def test_gather_limited():
+    async def main():
+        running, peak = 0, 0
+
+        async def work(i):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.001)
+            running -= 1
+            return i
+
+        return await gather_limited((work(i) for i in range(20)), limit=3), peak
+
+    assert asyncio.run(main()) == (list(range(20)), 3)
+    with pytest.raises(ValueError):
+        asyncio.run(gather_limited([], limit=0))
+
+
+def test_context_manager_closes_the_client(endpoint_url):
+    async def main():
+        s3 = AsyncS3(region_name="us-east-1", endpoint_url=endpoint_url)
+        with pytest.raises(SystemError):
+            s3.client
+        async with s3:
+            await s3.client.list_buckets()
+            http_session = s3.client._endpoint.http_session
+        with pytest.raises(SystemError):
+            s3.client
+        return http_session
+
+    http_session = asyncio.run(main())
+    assert http_session._session is None or http_session._session.closed
@@ -0,0 +1,132 @@
+import os
+import time
+from unittest import mock
+
+import pytest
+from botocore.exceptions import ClientError
+
+from fmlib.storage import cache
+from fmlib.storage.cache import S3DiskCache
+
+from .conftest import BUCKET_NAME
+
+
+def cached_files(directory):
+    return sorted(os.listdir(directory))
+
+
+def test_hits_and_misses(s3_client, tmp_path):
+    fmstatsd = mock.Mock()
+    s3_cache = S3DiskCache(str(tmp_path), max_bytes=1024, fmstatsd=fmstatsd, metric_prefix="test_cache")
+    s3_client.put_object(Bucket=BUCKET_NAME, Key="a", Body=b"version 1")
+
+    assert s3_cache.get(BUCKET_NAME, "a")[:] == b"version 1"
+    assert s3_cache.get(BUCKET_NAME, "a")[:] == b"version 1"
+    s3_client.put_object(Bucket=BUCKET_NAME, Key="a", Body=b"version 2")
+    # A new ETag is another object of the cache
+    assert s3_cache.get(BUCKET_NAME, "a")[:] == b"version 2"
+
+    assert (s3_cache.hits, s3_cache.misses) == (1, 2)
+    assert len(cached_files(tmp_path)) == 2
+    assert fmstatsd.increment.call_args_list == [
+        mock.call(f"test_cache.{result}", tags={"bucket": BUCKET_NAME}) for result in ("miss", "hit", "miss")
+    ]
+
+
+def test_statsd_errors_are_not_raised(s3_client, tmp_path):
+    fmstatsd = mock.Mock()
+    fmstatsd.increment.side_effect = OSError("statsd is down")
+    s3_cache = S3DiskCache(str(tmp_path), max_bytes=1024, fmstatsd=fmstatsd)
+    s3_client.put_object(Bucket=BUCKET_NAME, Key="a", Body=b"a")
+
+    assert s3_cache.get(BUCKET_NAME, "a")[:] == b"a"
+    assert s3_cache.misses == 1
+
+
+def test_least_recently_used_objects_are_evicted_over_max_bytes(s3_client, tmp_path):
+    s3_cache = S3DiskCache(str(tmp_path), max_bytes=250)
+    for key in ("a", "b", "c"):
+        s3_client.put_object(Bucket=BUCKET_NAME, Key=key, Body=key.encode() * 100)
+    path_a, path_b = s3_cache.get_path(BUCKET_NAME, "a"), s3_cache.get_path(BUCKET_NAME, "b")
+    # a is older than b, until it is read again
+    now = time.time()
+    os.utime(path_a, (now - 20, now - 20))
+    os.utime(path_b, (now - 10, now - 10))
+    s3_cache.get_path(BUCKET_NAME, "a")
+
+    path_c = s3_cache.get_path(BUCKET_NAME, "c")
+
+    assert os.path.exists(path_a) and os.path.exists(path_c)
+    assert not os.path.exists(path_b)
+    assert s3_cache.evict() == 0
+    s3_cache.max_bytes = 100
+    assert s3_cache.evict() == 100
+    assert cached_files(tmp_path) == [os.path.basename(path_c)]
+
+
+def test_stale_temporary_files_are_evicted(s3_client, tmp_path):
+    s3_cache = S3DiskCache(str(tmp_path), max_bytes=1024)
+    stale, fresh = tmp_path / ".tmp-stale", tmp_path / ".tmp-fresh"
+    stale.write_bytes(b"x" * 2048)
+    fresh.write_bytes(b"x" * 2048)
+    old = time.time() - 2 * cache._STALE_TEMPORARY_AGE_S
+    os.utime(stale, (old, old))
+
+    s3_cache.evict()
+    s3_cache.clear()
+
+    assert cached_files(tmp_path) == [".tmp-fresh"]
+
+
+def test_failed_downloads_leave_no_file(s3_client, tmp_path):
+    s3_cache = S3DiskCache(str(tmp_path), max_bytes=1024)
+    s3_client.put_object(Bucket=BUCKET_NAME, Key="a", Body=b"a" * 100)
+
+    class Body:
+        """
+        A body failing after its first read, as a connection reset mid-download would.
+        """
+        def __init__(self):
+            self.count_reads = 0
+
+        def read(self, size=-1):
+            self.count_reads += 1
+            if self.count_reads > 1:
+                raise ConnectionResetError()
+            return b"partial"
+
+    client = mock.Mock(wraps=s3_client)
+    client.get_object.side_effect = lambda **kwargs: {"Body": Body()}
+    with mock.patch.object(cache, "get_s3_client", return_value=client):
+        with pytest.raises(ConnectionResetError):
+            s3_cache.get(BUCKET_NAME, "a")
+    assert cached_files(tmp_path) == []
+
+    # The object changed since its ETag was read
+    with pytest.raises(ClientError):
+        s3_cache.get(BUCKET_NAME, "a", etag='"stale"')
+    assert cached_files(tmp_path) == []
+
+    assert s3_cache.get(BUCKET_NAME, "a")[:] == b"a" * 100
+
+
+def test_objects_evicted_before_they_are_opened_are_downloaded_again(s3_client, tmp_path):
+    s3_cache = S3DiskCache(str(tmp_path), max_bytes=1024)
+    s3_client.put_object(Bucket=BUCKET_NAME, Key="a", Body=b"a" * 100)
+    get_path = s3_cache.get_path
+    count_calls = 0
+
+    def get_path_evicted_once(*args, **kwargs):
+        nonlocal count_calls
+        count_calls += 1
+        path = get_path(*args, **kwargs)
+        if count_calls == 1:
+            # Evicted by another process
+            os.remove(path)
+        return path
+
+    with mock.patch.object(s3_cache, "get_path", side_effect=get_path_evicted_once):
+        assert s3_cache.get(BUCKET_NAME, "a")[:] == b"a" * 100
+
+    assert count_calls == 2
+    assert s3_cache.misses == 2
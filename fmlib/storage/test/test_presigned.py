@@ -0,0 +1,162 @@
+import json
+import time
+from unittest import mock
+
+import pytest
+
+import fmlib.storage as storage
+from fmlib.storage import PresignedUrlCache, get_s3_object_url, presigned, set_presigned_url_cache
+
+from .conftest import BUCKET_NAME
+
+
+class FakeRedis:
+    """
+    The subset of redis.Redis the cache uses, over a dict, recording the expiry of the keys set.
+    """
+    def __init__(self):
+        self.values = {}
+        self.expiries = {}
+
+    def get(self, name):
+        return self.values.get(name)
+
+    def set(self, name, value, ex=None):
+        self.values[name] = value.encode() if isinstance(value, str) else value
+        self.expiries[name] = ex
+
+    def delete(self, name):
+        self.values.pop(name, None)
+
+
+class DownRedis:
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise ConnectionError("Redis is down")
+        return fail
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    A settable time.time, starting now.
+    """
+    now = [time.time()]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def signer(s3_client, monkeypatch):
+    """
+    The S3 client of get_s3_object_url, counting the URLs it signs in generate_presigned_url.call_count.
+    """
+    client = mock.Mock(wraps=s3_client)
+    monkeypatch.setattr(storage, "get_s3_client", lambda: client)
+    monkeypatch.setattr(presigned, "_PRESIGNED_URL_CACHE", presigned._PRESIGNED_URL_CACHE)
+    return client
+
+
+def test_urls_are_reused_until_the_safety_margin_before_they_expire(signer, clock):
+    set_presigned_url_cache(PresignedUrlCache(safety_margin_s=300))
+    start = clock[0]
+
+    url = get_s3_object_url(BUCKET_NAME, "a", 3600)
+    clock[0] = start + 3299
+    assert get_s3_object_url(BUCKET_NAME, "a", 3600) == url
+    assert signer.generate_presigned_url.call_count == 1
+
+    clock[0] = start + 3300
+    get_s3_object_url(BUCKET_NAME, "a", 3600)
+    assert signer.generate_presigned_url.call_count == 2
+    # Another expiry is another URL
+    get_s3_object_url(BUCKET_NAME, "a", 7200)
+    assert signer.generate_presigned_url.call_count == 3
+
+
+def test_urls_expiring_within_the_safety_margin_are_not_cached(signer, clock):
+    set_presigned_url_cache(PresignedUrlCache(safety_margin_s=300))
+
+    get_s3_object_url(BUCKET_NAME, "a", 300)
+    get_s3_object_url(BUCKET_NAME, "a", 300)
+
+    assert signer.generate_presigned_url.call_count == 2
+
+
+def test_no_cache_signs_every_url(signer):
+    set_presigned_url_cache(None)
+
+    get_s3_object_url(BUCKET_NAME, "a", 3600)
+    get_s3_object_url(BUCKET_NAME, "a", 3600)
+
+    assert signer.generate_presigned_url.call_count == 2
+
+
+def test_the_least_recently_used_urls_are_dropped_over_max_size(signer, clock):
+    cache = PresignedUrlCache(max_size=2)
+    set_presigned_url_cache(cache)
+
+    for key in ("a", "b", "a", "c"):
+        get_s3_object_url(BUCKET_NAME, key, 3600)
+    assert len(cache._urls) == 2
+    assert signer.generate_presigned_url.call_count == 3
+
+    get_s3_object_url(BUCKET_NAME, "a", 3600)
+    get_s3_object_url(BUCKET_NAME, "c", 3600)
+    assert signer.generate_presigned_url.call_count == 3
+    get_s3_object_url(BUCKET_NAME, "b", 3600)
+    assert signer.generate_presigned_url.call_count == 4
+
+    with pytest.raises(ValueError):
+        PresignedUrlCache(max_size=0)
+
+
+def test_urls_are_shared_through_redis(signer, clock):
+    redis_client = FakeRedis()
+    set_presigned_url_cache(PresignedUrlCache(safety_margin_s=300, redis_client=redis_client))
+    url = get_s3_object_url(BUCKET_NAME, "a", 3600)
+    assert list(redis_client.expiries.values()) == [3300]
+
+    # Another process, whose own cache is empty
+    other_cache = PresignedUrlCache(safety_margin_s=300, redis_client=redis_client)
+    set_presigned_url_cache(other_cache)
+    clock[0] += 1000
+    assert get_s3_object_url(BUCKET_NAME, "a", 3600) == url
+    assert signer.generate_presigned_url.call_count == 1
+    assert len(other_cache._urls) == 1
+
+    # Redis expires the key on its own, but a value past the safety margin is not reused either
+    clock[0] += 2300
+    other_cache.clear()
+    get_s3_object_url(BUCKET_NAME, "a", 3600)
+    assert signer.generate_presigned_url.call_count == 2
+
+
+def test_urls_are_signed_when_redis_is_down(signer, clock):
+    cache = PresignedUrlCache(redis_client=DownRedis())
+    set_presigned_url_cache(cache)
+
+    url = get_s3_object_url(BUCKET_NAME, "a", 3600)
+
+    assert url.startswith("https://")
+    assert get_s3_object_url(BUCKET_NAME, "a", 3600) == url
+    assert signer.generate_presigned_url.call_count == 1
+    # Nothing is cached in the process, so Redis is read and fails again
+    cache.clear()
+    assert get_s3_object_url(BUCKET_NAME, "a", 3600).startswith("https://")
+    assert signer.generate_presigned_url.call_count == 2
+
+
+@pytest.mark.parametrize("value", [b"\xff\xfe", b"not json", b"null", b"5", b'[1, 2]', b'["url", "never"]', b"[1]"])
+def test_undecodable_redis_values_are_misses(signer, clock, value):
+    redis_client = FakeRedis()
+    cache = PresignedUrlCache(redis_client=redis_client)
+    set_presigned_url_cache(cache)
+    redis_key = cache._get_redis_key((BUCKET_NAME, "a", 3600))
+    redis_client.values[redis_key] = value
+
+    url = get_s3_object_url(BUCKET_NAME, "a", 3600)
+
+    assert signer.generate_presigned_url.call_count == 1
+    # The value is replaced by the URL signed
+    assert json.loads(redis_client.values[redis_key])[0] == url
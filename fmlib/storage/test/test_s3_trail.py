@@ -0,0 +1,27 @@
+import pytest
+
+from fmlib.osm_handler.benchmarks.synthetic import make_trip
+from fmlib.storage import TRAIL_CONTENT_TYPE, get_s3_trail, put_s3_trail
+
+from .conftest import BUCKET_NAME
+
+
+def test_trails_are_stored_losslessly_by_default(s3_client):
+    trail = make_trip(50, seed=0)[0]["trail"]
+
+    put_s3_trail(BUCKET_NAME, "trail", trail)
+
+    assert get_s3_trail(BUCKET_NAME, "trail") == trail
+    assert s3_client.head_object(Bucket=BUCKET_NAME, Key="trail")["ContentType"] == TRAIL_CONTENT_TYPE
+
+
+def test_precision_rounds_the_coordinates(s3_client):
+    trail = make_trip(50, seed=0)[0]["trail"]
+
+    put_s3_trail(BUCKET_NAME, "trail", trail, precision=5)
+
+    decoded = get_s3_trail(BUCKET_NAME, "trail")
+    assert [point["timestamp"] for point in decoded] == [point["timestamp"] for point in trail]
+    for point, expected in zip(decoded, trail):
+        assert point["location"]["latitude"] == pytest.approx(round(expected["location"]["latitude"], 5), abs=1e-12)
+    assert decoded != trail
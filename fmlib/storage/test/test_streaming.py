@@ -0,0 +1,93 @@
+import gzip
+import json
+
+import pytest
+
+from fmlib.storage import streaming
+from fmlib.storage.streaming import DEFAULT_CHUNK_SIZE, iter_s3_chunks, iter_s3_into, iter_s3_lines, open_s3_stream
+
+from .conftest import BUCKET_NAME
+
+# About 3 MB of NDJSON lines of varying length, so that lines straddle the boundaries of the 1 MB reads
+LINES = [
+    json.dumps({"id": i, "trail": "x" * (i * 7919 % 3000)}).encode() + b"\n" for i in range(2000)
+]
+DATA = b"".join(LINES)
+
+
+def crosses_a_chunk_boundary(lines, chunk_size):
+    offset = 0
+    for line in lines:
+        if offset // chunk_size != (offset + len(line) - 1) // chunk_size:
+            return True
+        offset += len(line)
+    return False
+
+
+def test_data_has_lines_across_the_chunk_boundaries():
+    assert len(DATA) > 2 * DEFAULT_CHUNK_SIZE
+    assert crosses_a_chunk_boundary(LINES, DEFAULT_CHUNK_SIZE)
+
+
+@pytest.mark.parametrize("content_encoding", [None, "gzip"])
+def test_gzip_object_line_by_line(s3_client, content_encoding):
+    extra_args = {} if content_encoding is None else {"ContentEncoding": content_encoding}
+    s3_client.put_object(Bucket=BUCKET_NAME, Key="trips.ndjson.gz", Body=gzip.compress(DATA), **extra_args)
+
+    assert list(iter_s3_lines(BUCKET_NAME, "trips.ndjson.gz")) == LINES
+    assert list(iter_s3_lines(BUCKET_NAME, "trips.ndjson.gz", encoding="utf-8")) == [
+        line.decode() for line in LINES
+    ]
+
+
+def test_zstd_object_line_by_line(s3_client):
+    zstandard = pytest.importorskip("zstandard")
+    s3_client.put_object(Bucket=BUCKET_NAME, Key="trips.ndjson.zst", Body=zstandard.ZstdCompressor().compress(DATA))
+
+    assert list(iter_s3_lines(BUCKET_NAME, "trips.ndjson.zst")) == LINES
+    assert b"".join(iter_s3_chunks(BUCKET_NAME, "trips.ndjson.zst", compression="zstd")) == DATA
+
+
+def test_lines_split_across_small_reads(s3_client):
+    lines = LINES[:10]
+    s3_client.put_object(Bucket=BUCKET_NAME, Key="trips.ndjson", Body=b"".join(lines))
+    assert crosses_a_chunk_boundary(lines, 7)
+
+    with open_s3_stream(BUCKET_NAME, "trips.ndjson", buffer_size=7) as stream:
+        assert list(stream) == lines
+
+
+def test_chunks_and_buffers_of_uncompressed_objects(s3_client):
+    s3_client.put_object(Bucket=BUCKET_NAME, Key="trips.ndjson", Body=DATA)
+
+    chunks = list(iter_s3_chunks(BUCKET_NAME, "trips.ndjson", chunk_size=DEFAULT_CHUNK_SIZE))
+    assert [len(chunk) for chunk in chunks[:-1]] == [DEFAULT_CHUNK_SIZE] * (len(chunks) - 1)
+    assert b"".join(chunks) == DATA
+
+    buffer = bytearray(100_000)
+    assert b"".join(bytes(view) for view in iter_s3_into(BUCKET_NAME, "trips.ndjson", buffer)) == DATA
+    with open_s3_stream(BUCKET_NAME, "trips.ndjson", byte_range="bytes=10-19") as stream:
+        assert stream.read() == DATA[10:20]
+
+
+def test_missing_zstandard(s3_client, monkeypatch):
+    zstandard = pytest.importorskip("zstandard")
+    s3_client.put_object(Bucket=BUCKET_NAME, Key="trips.ndjson.zst", Body=zstandard.ZstdCompressor().compress(DATA))
+    monkeypatch.setattr(streaming, "zstandard", None)
+
+    with pytest.raises(ValueError, match="zstandard"):
+        open_s3_stream(BUCKET_NAME, "trips.ndjson.zst", compression="zstd")
+    # Detected from the first bytes of the object
+    with pytest.raises(ValueError, match="zstandard"):
+        list(iter_s3_lines(BUCKET_NAME, "trips.ndjson.zst"))
+    # Not decompressing does not need it
+    assert b"".join(iter_s3_chunks(BUCKET_NAME, "trips.ndjson.zst", compression=None)).startswith(
+        streaming.ZSTD_MAGIC
+    )
+
+
+def test_unsupported_compression(s3_client):
+    with pytest.raises(ValueError):
+        open_s3_stream(BUCKET_NAME, "trips.ndjson", compression="bz2")
+    with pytest.raises(ValueError):
+        list(iter_s3_into(BUCKET_NAME, "trips.ndjson", bytearray()))
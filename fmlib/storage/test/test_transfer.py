@@ -0,0 +1,114 @@
+import os
+from unittest import mock
+
+import pytest
+from botocore.exceptions import ClientError
+
+from fmlib.storage import transfer
+from fmlib.storage.transfer import (
+    MB, download_s3_bytes, download_s3_file, download_s3_files, get_transfer_config, upload_s3_bytes, upload_s3_file,
+    upload_s3_files
+)
+
+from .conftest import BUCKET_NAME
+
+# Parts of 5 MB, the smallest S3 accepts, so that a 12 MB object is transferred in 3 parts
+CONFIG = get_transfer_config(multipart_threshold=5 * MB, multipart_chunksize=5 * MB, max_concurrency=3)
+DATA = os.urandom(12 * MB)
+
+
+def test_get_transfer_config_defaults_to_the_max_concurrent_requests(s3_client):
+    config = get_transfer_config()
+
+    assert config.max_request_concurrency == 4
+    assert config.multipart_threshold == transfer.DEFAULT_MULTIPART_THRESHOLD
+
+
+def test_multipart_file_round_trip(s3_client, tmp_path):
+    source, destination = tmp_path / "source", tmp_path / "destination"
+    source.write_bytes(DATA)
+
+    upload_s3_file(BUCKET_NAME, "big", str(source), extra_args={"ContentType": "application/octet-stream"},
+                   config=CONFIG)
+    download_s3_file(BUCKET_NAME, "big", str(destination), CONFIG)
+
+    head = s3_client.head_object(Bucket=BUCKET_NAME, Key="big")
+    # Multipart uploads have an ETag of the MD5 of the part MD5s, suffixed with the count of parts
+    assert head["ETag"].strip('"').endswith("-3")
+    assert head["ContentType"] == "application/octet-stream"
+    assert destination.read_bytes() == DATA
+
+
+def test_multipart_bytes_round_trip(s3_client):
+    upload_s3_bytes(BUCKET_NAME, "big", DATA, config=CONFIG)
+
+    assert s3_client.head_object(Bucket=BUCKET_NAME, Key="big")["ETag"].strip('"').endswith("-3")
+    assert download_s3_bytes(BUCKET_NAME, "big", config=CONFIG) == DATA
+
+
+def test_small_objects_are_uploaded_in_one_part(s3_client):
+    upload_s3_bytes(BUCKET_NAME, "small", b"small", config=CONFIG)
+
+    assert "-" not in s3_client.head_object(Bucket=BUCKET_NAME, Key="small")["ETag"]
+    assert download_s3_bytes(BUCKET_NAME, "small") == b"small"
+
+
+def test_transfer_config_is_passed_through(s3_client, tmp_path):
+    source = tmp_path / "source"
+    source.write_bytes(b"data")
+    client = mock.Mock(wraps=s3_client)
+
+    with mock.patch.object(transfer, "get_s3_client", return_value=client):
+        upload_s3_file(BUCKET_NAME, "key", str(source), config=CONFIG)
+        download_s3_file(BUCKET_NAME, "key", str(tmp_path / "destination"), config=CONFIG)
+        upload_s3_bytes(BUCKET_NAME, "key", b"data", config=CONFIG)
+        download_s3_bytes(BUCKET_NAME, "key", config=CONFIG)
+
+    for method in (client.upload_file, client.download_file, client.upload_fileobj, client.download_fileobj):
+        assert method.call_args.kwargs["Config"] is CONFIG
+
+
+def test_batches_share_one_transfer_manager_with_the_config(s3_client, tmp_path):
+    files = {}
+    for i in range(5):
+        files[f"batch/{i}"] = str(tmp_path / f"source{i}")
+        with open(files[f"batch/{i}"], "wb") as f:
+            f.write(str(i).encode())
+
+    with mock.patch.object(transfer, "create_transfer_manager", wraps=transfer.create_transfer_manager) as create:
+        assert upload_s3_files(BUCKET_NAME, files, config=CONFIG) == dict.fromkeys(files)
+        destinations = {key: str(tmp_path / f"destination{i}") for i, key in enumerate(files)}
+        assert download_s3_files(BUCKET_NAME, destinations, config=CONFIG) == dict.fromkeys(files)
+
+    assert [call.args[1] for call in create.call_args_list] == [CONFIG, CONFIG]
+    for i, filename in enumerate(destinations.values()):
+        with open(filename, "rb") as f:
+            assert f.read() == str(i).encode()
+
+
+def test_batch_download_partial_failure(s3_client, tmp_path):
+    s3_client.put_object(Bucket=BUCKET_NAME, Key="present", Body=b"present")
+    files = {"present": str(tmp_path / "present"), "missing": str(tmp_path / "missing")}
+
+    errors = download_s3_files(BUCKET_NAME, files, config=CONFIG, raise_errors=False)
+
+    assert errors["present"] is None
+    assert isinstance(errors["missing"], ClientError)
+    with open(files["present"], "rb") as f:
+        assert f.read() == b"present"
+    with pytest.raises(ClientError):
+        download_s3_files(BUCKET_NAME, files, config=CONFIG)
+
+
+def test_batch_upload_partial_failure(s3_client, tmp_path):
+    present = tmp_path / "present"
+    present.write_bytes(b"present")
+    files = {"present": str(present), "missing": str(tmp_path / "missing")}
+
+    errors = upload_s3_files(BUCKET_NAME, files, config=CONFIG, raise_errors=False)
+
+    assert errors["present"] is None
+    assert isinstance(errors["missing"], FileNotFoundError)
+    assert s3_client.get_object(Bucket=BUCKET_NAME, Key="present")["Body"].read() == b"present"
+    with pytest.raises(FileNotFoundError):
+        upload_s3_files(BUCKET_NAME, files, config=CONFIG)
@@ -0,0 +1,175 @@
+# S3 transfer functions: multipart and concurrent ranged transfers, and batches of keys
+
+import io
+from typing import Dict, Mapping, Optional
+
+from boto3.s3.transfer import TransferConfig, create_transfer_manager
+
+from . import get_max_concurrent_requests, get_s3_client
+
+MB = 1024 * 1024
+# Objects from this size on are transferred in parts, concurrently
+DEFAULT_MULTIPART_THRESHOLD = 16 * MB
+DEFAULT_MULTIPART_CHUNKSIZE = 16 * MB
+
+
+def get_transfer_config(multipart_threshold: int = DEFAULT_MULTIPART_THRESHOLD,
+                        multipart_chunksize: int = DEFAULT_MULTIPART_CHUNKSIZE,
+                        max_concurrency: Optional[int] = None) -> TransferConfig:
+    """
+    Get the transfer configuration of the S3 transfers.
+
+    Objects of multipart_threshold bytes or more are uploaded as multipart uploads, and downloaded with ranged GETs,
+    in parts of multipart_chunksize bytes transferred concurrently.
+
+    Args:
+        multipart_threshold (int, optional): The size in bytes from which objects are transferred in parts. Defaults to 16 MB.
+        multipart_chunksize (int, optional): The size in bytes of the parts. Defaults to 16 MB.
+        max_concurrency (int, optional): The maximum number of concurrent requests. Defaults to the max_concurrent_requests of init_s3.
+
+    Returns:
+        TransferConfig: The transfer configuration.
+    """
+    return TransferConfig(
+        multipart_threshold=multipart_threshold,
+        multipart_chunksize=multipart_chunksize,
+        max_concurrency=max_concurrency or get_max_concurrent_requests(),
+        use_threads=True,
+    )
+
+
+def upload_s3_file(bucket_name: str, key: str, filename: str, extra_args: Optional[dict] = None,
+                   config: Optional[TransferConfig] = None) -> None:
+    """
+    Upload a file to S3, in concurrent parts if it is large.
+
+    Args:
+        bucket_name (str): The name of the S3 bucket.
+        key (str): The key of the object in the S3 bucket.
+        filename (str): The path of the file to upload.
+        extra_args (dict, optional): Extra arguments of the upload, e.g. {"ContentType": "application/gzip"}.
+        config (TransferConfig, optional): The transfer configuration. Defaults to get_transfer_config().
+
+    Returns:
+        None
+
+    Example Usage:
+        upload_s3_file(bucket_name="trips", key="archives/2023-11.ndjson.gz", filename="/tmp/2023-11.ndjson.gz")
+    """
+    get_s3_client().upload_file(filename, bucket_name, key, ExtraArgs=extra_args, Config=config or get_transfer_config())
+
+
+def download_s3_file(bucket_name: str, key: str, filename: str, config: Optional[TransferConfig] = None) -> None:
+    """
+    Download an S3 object to a file, with concurrent ranged GETs if it is large.
+
+    Args:
+        bucket_name (str): The name of the S3 bucket.
+        key (str): The key of the object in the S3 bucket.
+        filename (str): The path of the file to download to.
+        config (TransferConfig, optional): The transfer configuration. Defaults to get_transfer_config().
+
+    Returns:
+        None
+    """
+    get_s3_client().download_file(bucket_name, key, filename, Config=config or get_transfer_config())
+
+
+def upload_s3_bytes(bucket_name: str, key: str, data: bytes, extra_args: Optional[dict] = None,
+                    config: Optional[TransferConfig] = None) -> None:
+    """
+    Upload bytes to S3, in concurrent parts if they are large.
+
+    Args:
+        bucket_name (str): The name of the S3 bucket.
+        key (str): The key of the object in the S3 bucket.
+        data (bytes): The content of the object.
+        extra_args (dict, optional): Extra arguments of the upload, e.g. {"ContentType": "application/gzip"}.
+        config (TransferConfig, optional): The transfer configuration. Defaults to get_transfer_config().
+
+    Returns:
+        None
+    """
+    get_s3_client().upload_fileobj(
+        io.BytesIO(data), bucket_name, key, ExtraArgs=extra_args, Config=config or get_transfer_config()
+    )
+
+
+def download_s3_bytes(bucket_name: str, key: str, config: Optional[TransferConfig] = None) -> bytes:
+    """
+    Download an S3 object to memory, with concurrent ranged GETs if it is large.
+
+    Args:
+        bucket_name (str): The name of the S3 bucket.
+        key (str): The key of the object in the S3 bucket.
+        config (TransferConfig, optional): The transfer configuration. Defaults to get_transfer_config().
+
+    Returns:
+        bytes: The content of the object.
+    """
+    buffer = io.BytesIO()
+    get_s3_client().download_fileobj(bucket_name, key, buffer, Config=config or get_transfer_config())
+    return buffer.getvalue()
+
+
+def _run_batch(direction: str, bucket_name: str, files: Mapping[str, str], extra_args: Optional[dict],
+               config: Optional[TransferConfig], raise_errors: bool) -> Dict[str, Optional[Exception]]:
+    # A single transfer manager bounds the concurrent requests of all the transfers together, parts included
+    with create_transfer_manager(get_s3_client(), config or get_transfer_config()) as manager:
+        if direction == "upload":
+            futures = {
+                key: manager.upload(filename, bucket_name, key, extra_args=extra_args)
+                for key, filename in files.items()
+            }
+        else:
+            futures = {key: manager.download(bucket_name, key, filename) for key, filename in files.items()}
+
+        errors = {}
+        for key, future in futures.items():
+            try:
+                future.result()
+                errors[key] = None
+            except Exception as e:
+                if raise_errors:
+                    # Leaving the manager cancels the transfers still running
+                    raise
+                errors[key] = e
+    return errors
+
+
+def upload_s3_files(bucket_name: str, files: Mapping[str, str], extra_args: Optional[dict] = None,
+                    config: Optional[TransferConfig] = None, raise_errors: bool = True) -> Dict[str, Optional[Exception]]:
+    """
+    Upload many files to S3, with at most max_concurrency requests in flight over all the files.
+
+    Args:
+        bucket_name (str): The name of the S3 bucket.
+        files (Mapping[str, str]): The paths of the files to upload, by key of the object in the S3 bucket.
+        extra_args (dict, optional): Extra arguments of every upload, e.g. {"ContentType": "application/gzip"}.
+        config (TransferConfig, optional): The transfer configuration. Defaults to get_transfer_config().
+        raise_errors (bool, optional): Whether to raise the first error, or to return the errors by key. Defaults to True.
+
+    Returns:
+        Dict[str, Optional[Exception]]: The error of every key, None for the keys uploaded.
+
+    Example Usage:
+        upload_s3_files(bucket_name="trips", files={f"archives/{name}": f"/tmp/{name}" for name in names})
+    """
+    return _run_batch("upload", bucket_name, files, extra_args, config, raise_errors)
+
+
+def download_s3_files(bucket_name: str, files: Mapping[str, str], config: Optional[TransferConfig] = None,
+                      raise_errors: bool = True) -> Dict[str, Optional[Exception]]:
+    """
+    Download many S3 objects to files, with at most max_concurrency requests in flight over all the objects.
+
+    Args:
+        bucket_name (str): The name of the S3 bucket.
+        files (Mapping[str, str]): The paths of the files to download to, by key of the object in the S3 bucket.
+        config (TransferConfig, optional): The transfer configuration. Defaults to get_transfer_config().
+        raise_errors (bool, optional): Whether to raise the first error, or to return the errors by key. Defaults to True.
+
+    Returns:
+        Dict[str, Optional[Exception]]: The error of every key, None for the keys downloaded.
+    """
+    return _run_batch("download", bucket_name, files, None, config, raise_errors)